@@ -1,63 +1,48 @@
+import os
+import time
 import streamlit as st
-import tempfile
-from parser import PDFExtractor, TextExtractor, DOCXExtractor
-from processor import Preprocessor
-from skill import SkillDynamicMatcher
-from similarity import SentenceTransformerSimilarity
-from recommendation import AiRecommendation
+from resources import BackgroundLoader
+from instrumentation import start_http_server
 
-@st.cache_resource
-def get_pdf_extractor():
-    return PDFExtractor()
 
-@st.cache_resource
-def get_docx_extractor():
-    return DOCXExtractor()
+def build_pipeline():
+    # The model libraries are imported here, on the loader thread, so the page renders right away.
+    from processor import Preprocessor
+    from skill import SkillDynamicMatcher
+    from similarity import SentenceTransformerSimilarity
+    from recommendation import AiRecommendation
+    from pipeline import ResumeAnalysisPipeline, StageCache
 
-@st.cache_resource
-def get_text_extractor():
-    return TextExtractor()
+    return ResumeAnalysisPipeline(
+        preprocessor=Preprocessor(),
+        skill_matcher=SkillDynamicMatcher(),
+        similarity=SentenceTransformerSimilarity("mixedbread-ai/mxbai-embed-large-v1"),
+        recommendation=AiRecommendation(draft_model_name=os.environ.get("DRAFT_MODEL")),
+        cache=StageCache(directory=os.environ.get("STAGE_CACHE_DIR")),
+    )
 
-@st.cache_resource
-def get_preprocessor():
-    return Preprocessor()
 
 @st.cache_resource
-def get_skill_matcher():
-    return SkillDynamicMatcher()
+def get_loader():
+    # Prometheus metrics on METRICS_PORT when set, started once per process like the pipeline.
+    if os.environ.get("METRICS_PORT"):
+        start_http_server(int(os.environ["METRICS_PORT"]))
 
-@st.cache_resource
-def get_sentence_transformer():
-    return SentenceTransformerSimilarity("mixedbread-ai/mxbai-embed-large-v1")
+    return BackgroundLoader(build_pipeline, lambda pipeline: pipeline.warm_up()).start()
 
-@st.cache_resource
-def get_ai_recommendation():
-    return AiRecommendation()
-
-pdf_extractor = get_pdf_extractor()
-docx_extractor = get_docx_extractor()
-text_extractor = get_text_extractor()
-preprocessor = get_preprocessor()
-skill_matcher = get_skill_matcher()
-sentence_transformer = get_sentence_transformer()
-recommendation = get_ai_recommendation()
-
-def extract(file):
-    if file.type == "application/pdf":
-        return pdf_extractor.extract(file)
-    elif file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-        return docx_extractor.extract(file)
-    elif file.type == "text/plain":
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".txt") as tmp:
-            tmp.write(file.read())
-            tmp_path = tmp.name
-        return text_extractor.extract(tmp_path)
-    else:
-        return "Unsupported file type."
+loader = get_loader()
+PROFILE_DIR = os.environ.get("PROFILE_DIR")
+if PROFILE_DIR:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
 
 st.set_page_config(page_title="Smart Resume Analyzer", layout="wide")
 st.title("🧠 Smart Resume Analyzer")
 
+if loader.state == BackgroundLoader.FAILED:
+    st.error(f"The models failed to load: {loader.error}")
+elif not loader.ready:
+    st.info(f"⏳ The models are {loader.state}, the analysis starts once they are ready.")
+
 st.subheader("📁 Upload Files")
 col1, col2 = st.columns(2)
 with col1:
@@ -69,17 +54,19 @@ if "skills" not in st.session_state:
     st.session_state.skills = []
 
 if st.button("🔍 Analyze") and resume_file and job_description_file:
-    with st.spinner("Processing..."):
-        resume_text = extract(resume_file)
-        jd_text = extract(job_description_file)
+    with st.spinner("Loading the models..." if not loader.ready else "Processing..."):
+        pipeline = loader.wait()
+        result = pipeline.analyze(resume_file, job_description_file, profile=PROFILE_DIR is not None)
+        if result.profiler is not None:
+            result.profiler.write_collapsed(os.path.join(PROFILE_DIR, f"analyze-{time.time_ns()}.folded"))
 
-        preprocess_resume = preprocessor.preprocess(resume_text)
-        preprocess_jd= preprocessor.preprocess(jd_text)
+        resume_text = result.resume_text
+        jd_text = result.job_description_text
 
-        matched_jd_skills = skill_matcher.extract(jd_text)
-        matched_resume_skills = skill_matcher.extract(resume_text)
+        matched_jd_skills = result.job_description_skills
+        matched_resume_skills = result.resume_skills
 
-        matched_result = skill_matcher.match(matched_jd_skills, matched_resume_skills)
+        matched_result = (result.match_ratio, result.match_string)
 
 
         st.subheader("📄 Extracted Text")
@@ -106,11 +93,8 @@ if st.button("🔍 Analyze") and resume_file and job_description_file:
             st.warning("No matching skills found.")
 
         st.subheader("📊 Resume-JD Similarity")
-        score = sentence_transformer.similarity(preprocess_resume, preprocess_jd)
-        st.metric("SentenceTransformer Similarity Score", f"{score:.2f}")
+        st.metric("SentenceTransformer Similarity Score", f"{result.similarity:.2f}")
 
         st.subheader("🤖 AI-Based Recommendation")
 
-        with st.spinner("Generating recommendation..."):
-            ai_output = recommendation.recommend(resume_text, jd_text)
-            st.info(ai_output)
\ No newline at end of file
+        st.write_stream(pipeline.stream_recommend(resume_file, job_description_file))
\ No newline at end of file
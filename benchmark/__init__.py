@@ -0,0 +1,4 @@
+from .corpus import Corpus, build_corpus
+from .runner import run_benchmarks, compare
+
+__all__ = ["Corpus", "build_corpus", "run_benchmarks", "compare"]
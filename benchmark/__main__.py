@@ -0,0 +1,99 @@
+"""
+Benchmarks the analysis stages on a synthetic corpus built from sample_data.
+
+    python -m benchmark --resumes 200 --batch-sizes 1,8,32 -o results.json --baseline baseline.json
+
+The run exits with status 1 when a stage regresses past the baseline. --update-baseline stores the
+results as the new baseline instead.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+from .corpus import build_corpus
+from .runner import run_benchmarks, compare
+from .stages import STAGES
+
+# Stages run by default, the model heavy ones are opted into with --stages.
+DEFAULT_STAGES = ["extract_pdf", "extract_txt", "extract_docx", "preprocess", "skill_list", "similarity_tfidf"]
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmark the resume analysis stages.")
+    parser.add_argument("--stages", default=",".join(DEFAULT_STAGES),
+                        help=f"Comma separated stages, or all. Available: {', '.join(STAGES)}.")
+    parser.add_argument("--batch-sizes", default="1,8,32", help="Comma separated batch sizes.")
+    parser.add_argument("--resumes", type=int, default=100)
+    parser.add_argument("--job-descriptions", type=int, default=4)
+    parser.add_argument("--resume-words", type=int, default=600)
+    parser.add_argument("--pdf-files", type=int, default=8)
+    parser.add_argument("--docx-files", type=int, default=8)
+    parser.add_argument("--docx-words", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=1, help="Passes over the corpus per batch size.")
+    parser.add_argument("--warmup", type=int, default=1, help="Batches run before timing.")
+    parser.add_argument("--precision", choices=["float32", "bfloat16", "int8"], default="float32")
+    parser.add_argument("--sentence-transformer", default="mixedbread-ai/mxbai-embed-large-v1")
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--recommendation-items", type=int, default=4)
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="Run every stage in this process, peak memory then carries over between measurements.")
+    parser.add_argument("--corpus-dir", default=None, help="Directory of the generated files, temporary when unset.")
+    parser.add_argument("-o", "--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None, help="Baseline JSON file the results are compared with.")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to the baseline file.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative slowdown allowed.")
+    parser.add_argument("--memory-tolerance", type=float, default=0.1, help="Relative peak memory growth allowed.")
+    args = parser.parse_args(arguments)
+
+    stages = list(STAGES) if args.stages == "all" else [name.strip() for name in args.stages.split(",") if name.strip()]
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = build_corpus(
+            args.corpus_dir or directory,
+            resumes=args.resumes,
+            job_descriptions=args.job_descriptions,
+            resume_words=args.resume_words,
+            pdf_files=args.pdf_files,
+            docx_files=args.docx_files,
+            docx_words=args.docx_words,
+            seed=args.seed,
+        )
+        results = run_benchmarks(stages, corpus, batch_sizes, args, isolate=not args.no_isolate)
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    for entry in results["results"]:
+        if entry.get("skipped"):
+            print(f"{entry['stage']:<32} batch {entry['batch_size']:>4}  skipped, no items")
+            continue
+        print(
+            f"{entry['stage']:<32} batch {entry['batch_size']:>4}  p50 {entry['p50_ms']:9.2f} ms  "
+            f"p90 {entry['p90_ms']:9.2f} ms  p99 {entry['p99_ms']:9.2f} ms  "
+            f"{entry['throughput']:9.2f} items/s  peak {entry['peak_rss_mb'] or 0:8.1f} MB"
+        )
+
+    if args.baseline is None:
+        return 0
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+
+    regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}", file=sys.stderr)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
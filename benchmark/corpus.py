@@ -0,0 +1,171 @@
+import os
+import re
+import random
+import shutil
+import zipfile
+from xml.sax.saxutils import escape
+
+SAMPLE_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_data")
+
+# Skills mixed into the synthetic documents, so the skill matchers have something to find.
+SKILLS = [
+    "python", "machine learning", "deep learning", "natural language processing", "tensorflow", "pytorch",
+    "scikit-learn", "pandas", "numpy", "spark", "kafka", "elasticsearch", "sql", "docker", "kubernetes", "git",
+    "data visualization", "problem solving", "team collaboration", "communication skills", "leadership",
+    "computer vision", "sentiment analysis", "big data", "rest api", "aws", "linux", "statistics",
+]
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# The smallest package parts of a DOCX document readable by Word and python-docx.
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_DOCX_RELATIONSHIPS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="word/document.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+
+
+class Corpus:
+    """
+    Synthetic resumes and job descriptions of a configurable size, built from the sentences of the sample data.
+    """
+    def __init__(self, resumes, job_descriptions, directory):
+        """
+        Holds the generated documents.
+        :param resumes: List of resume texts.
+        :param job_descriptions: List of job description texts.
+        :param directory: Directory of the generated resume files.
+        """
+        self.resumes = resumes
+        self.job_descriptions = job_descriptions
+        self.directory = directory
+
+
+    def files(self, extension):
+        """
+        Lists the generated resume files of a type.
+        :param extension: The file extension, e.g. ".pdf".
+        :return: Sorted list of file paths.
+        """
+        return sorted(
+            os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(extension)
+        )
+
+
+def _sentences(directory):
+    """
+    Collects the sentences of the sample resume and job descriptions.
+    :param directory: The sample data directory.
+    :return: List of sentences.
+    """
+    from parser import PDFExtractor, TextExtractor
+
+    texts = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith(".pdf"):
+            texts.append(PDFExtractor().extract(path))
+        elif name.endswith(".txt"):
+            texts.append(TextExtractor().extract(path))
+
+    return [sentence.strip() for text in texts for sentence in _SENTENCE_SPLIT.split(text) if sentence.strip()]
+
+
+def _document(sentences, words, rng):
+    """
+    Draws sentences and skills until a document reaches a number of words.
+    :param sentences: List of sentences to draw from.
+    :param words: Target number of words.
+    :param rng: The random generator.
+    :return: The document text.
+    """
+    lines, count = [], 0
+    while count < words:
+        line = rng.choice(sentences)
+        if rng.random() < 0.3:
+            line = f"{line} {', '.join(rng.sample(SKILLS, 3))}."
+        lines.append(line)
+        count += len(line.split())
+
+    return "\n".join(lines)
+
+
+def _write_docx(path, text, rng, table_rows=10):
+    """
+    Writes a text as a DOCX document, one paragraph per line, followed by a skill table as resumes often have.
+    :param path: The document path.
+    :param text: The document text.
+    :param rng: The random generator drawing the table skills.
+    :param table_rows: Number of rows of the skill table.
+    """
+    def paragraph(line):
+        return f'<w:p><w:pPr><w:tabs><w:tab w:val="left" w:pos="720"/></w:tabs></w:pPr>' \
+               f'<w:r><w:t xml:space="preserve">{escape(line)}</w:t></w:r></w:p>'
+
+    def cell(line):
+        return f"<w:tc>{paragraph(line)}</w:tc>"
+
+    rows = "".join(
+        f"<w:tr>{''.join(cell(skill) for skill in rng.sample(SKILLS, 3))}</w:tr>" for _ in range(table_rows)
+    )
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+        + "".join(paragraph(line) for line in text.split("\n"))
+        + f"<w:tbl>{rows}</w:tbl><w:sectPr/></w:body></w:document>"
+    )
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _DOCX_RELATIONSHIPS)
+        archive.writestr("word/document.xml", document)
+
+
+def build_corpus(directory, resumes=100, job_descriptions=4, resume_words=600, job_description_words=250,
+                 pdf_files=8, docx_files=8, docx_words=20000, seed=0, sample_data=SAMPLE_DATA):
+    """
+    Builds a synthetic corpus and writes its resumes as text files, next to copies of the sample PDF
+    and large DOCX documents.
+    :param directory: Directory receiving the generated files, created when missing.
+    :param resumes: Number of resumes.
+    :param job_descriptions: Number of job descriptions.
+    :param resume_words: Approximate number of words per resume.
+    :param job_description_words: Approximate number of words per job description.
+    :param pdf_files: Number of copies of the sample PDF for the PDF extractor.
+    :param docx_files: Number of DOCX documents for the DOCX extractor.
+    :param docx_words: Approximate number of words per DOCX document.
+    :param seed: Seed of the random generator, the same seed gives the same corpus.
+    :param sample_data: The sample data directory.
+    :return: The Corpus.
+    """
+    rng = random.Random(seed)
+    sentences = _sentences(sample_data)
+
+    resume_texts = [_document(sentences, resume_words, rng) for _ in range(resumes)]
+    job_description_texts = [_document(sentences, job_description_words, rng) for _ in range(job_descriptions)]
+
+    os.makedirs(directory, exist_ok=True)
+    for number, text in enumerate(resume_texts):
+        with open(os.path.join(directory, f"resume_{number:05d}.txt"), "w") as file:
+            file.write(text)
+
+    pdfs = [os.path.join(sample_data, name) for name in sorted(os.listdir(sample_data)) if name.endswith(".pdf")]
+    for number in range(pdf_files if pdfs else 0):
+        shutil.copyfile(pdfs[number % len(pdfs)], os.path.join(directory, f"resume_{number:05d}.pdf"))
+
+    for number in range(docx_files):
+        text = _document(sentences, docx_words, rng)
+        _write_docx(os.path.join(directory, f"resume_{number:05d}.docx"), text, rng)
+
+    return Corpus(resume_texts, job_description_texts, directory)
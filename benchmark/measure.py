@@ -0,0 +1,96 @@
+import time
+import threading
+import numpy as np
+from instrumentation import current_rss
+
+
+class PeakMemory:
+    """
+    Context manager sampling the resident memory on a background thread and keeping its peak.
+    """
+    def __init__(self, interval=0.005):
+        """
+        Initializes the sampler.
+        :param interval: Seconds between two samples.
+        """
+        self.interval = interval
+        self.start = None
+        self.peak = None
+        self.__stop = threading.Event()
+        self.__thread = None
+
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__sample, daemon=True)
+        self.__thread.start()
+        return self
+
+
+    def __exit__(self, *exception):
+        self.__stop.set()
+        self.__thread.join()
+        self.__update()
+        return False
+
+
+    def __sample(self):
+        """
+        Samples the resident memory until the context exits.
+        """
+        while not self.__stop.wait(self.interval):
+            self.__update()
+
+
+    def __update(self):
+        """
+        Takes one sample and keeps it when it is the highest so far.
+        """
+        rss = current_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+
+def measure(run, items, batch_size, repeats=1, warmup=1):
+    """
+    Times a stage over batches of items.
+    :param run: Function processing a list of items.
+    :param items: List of items.
+    :param batch_size: Number of items per call.
+    :param repeats: Number of passes over the items.
+    :param warmup: Number of batches run before timing, to exclude first call costs.
+    :return: Dictionary of the latency percentiles per batch, the throughput and the memory, marked skipped
+        with empty measurements when there is no item.
+    """
+    batches = [items[start:start + batch_size] for start in range(0, len(items), batch_size)]
+    if not batches:
+        empty = ("p50_ms", "p90_ms", "p99_ms", "mean_ms", "throughput", "rss_start_mb", "peak_rss_mb")
+        return {"batch_size": batch_size, "items": 0, "batches": 0, "skipped": True, **dict.fromkeys(empty)}
+
+    for batch in batches[:warmup]:
+        run(batch)
+
+    latencies = []
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for batch in batches:
+                batch_start = time.perf_counter()
+                run(batch)
+                latencies.append(time.perf_counter() - batch_start)
+        elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "batch_size": batch_size,
+        "items": len(items) * repeats,
+        "batches": len(latencies),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p90_ms": float(np.percentile(latencies, 90)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+        "throughput": len(items) * repeats / elapsed if elapsed > 0 else None,
+        "rss_start_mb": memory.start / 2 ** 20 if memory.start is not None else None,
+        "peak_rss_mb": memory.peak / 2 ** 20 if memory.peak is not None else None,
+    }
@@ -0,0 +1,105 @@
+import time
+import platform
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from .measure import measure
+from .stages import STAGES, SINGLE_ITEM_STAGES
+
+# Result fields compared with the baseline, and whether a higher value is a regression.
+COMPARED = {"p50_ms": True, "p90_ms": True, "throughput": False, "peak_rss_mb": True}
+
+
+def run_stage(name, corpus, batch_sizes, options):
+    """
+    Builds a stage and measures it at every batch size.
+    :param name: The stage name.
+    :param corpus: The Corpus.
+    :param batch_sizes: List of batch sizes.
+    :param options: The benchmark options.
+    :return: List of result dictionaries, one per batch size.
+    """
+    start = time.perf_counter()
+    run, items = STAGES[name](corpus, options)
+    setup_seconds = time.perf_counter() - start
+
+    if name in SINGLE_ITEM_STAGES:
+        batch_sizes = [1]
+
+    results = []
+    for batch_size in batch_sizes:
+        result = measure(run, items, batch_size, repeats=options.repeats, warmup=options.warmup)
+        results.append({"stage": name, "setup_seconds": setup_seconds, **result})
+
+    return results
+
+
+def run_benchmarks(stages, corpus, batch_sizes, options, isolate=True):
+    """
+    Measures stages one after the other.
+    :param stages: List of stage names.
+    :param corpus: The Corpus.
+    :param batch_sizes: List of batch sizes.
+    :param options: The benchmark options.
+    :param isolate: Run every stage and batch size in a fresh process, so neither the models of a stage nor the
+        memory reached at a batch size count in the peak memory of the next.
+    :return: Dictionary of the run metadata and the results.
+    """
+    unknown = [name for name in stages if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(unknown)}.")
+
+    results = []
+    for name in stages:
+        if not isolate:
+            results.extend(run_stage(name, corpus, batch_sizes, options))
+            continue
+
+        context = multiprocessing.get_context("spawn")
+        for batch_size in [1] if name in SINGLE_ITEM_STAGES else batch_sizes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results.extend(executor.submit(run_stage, name, corpus, [batch_size], options).result())
+
+    return {
+        "metadata": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "resumes": len(corpus.resumes),
+            "job_descriptions": len(corpus.job_descriptions),
+            "isolated": isolate,
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, tolerance=0.2, memory_tolerance=0.1):
+    """
+    Compares results with a baseline run.
+    :param results: The current run, as returned by run_benchmarks.
+    :param baseline: The baseline run.
+    :param tolerance: Relative slowdown allowed on the latencies and the throughput.
+    :param memory_tolerance: Relative growth allowed on the peak memory.
+    :return: List of regression messages, empty when every stage is within the tolerances.
+    """
+    reference = {(entry["stage"], entry["batch_size"]): entry for entry in baseline["results"]}
+
+    regressions = []
+    for entry in results["results"]:
+        previous = reference.get((entry["stage"], entry["batch_size"]))
+        if previous is None:
+            continue
+
+        for field, higher_is_worse in COMPARED.items():
+            current, expected = entry.get(field), previous.get(field)
+            if current is None or not expected:
+                continue
+
+            allowed = memory_tolerance if field == "peak_rss_mb" else tolerance
+            change = current / expected - 1 if higher_is_worse else expected / current - 1
+            if change > allowed:
+                regressions.append(
+                    f"{entry['stage']} batch {entry['batch_size']}: {field} {current:.2f} vs baseline "
+                    f"{expected:.2f} ({change:+.0%}, allowed {allowed:.0%})"
+                )
+
+    return regressions
@@ -0,0 +1,144 @@
+"""
+The benchmarked stages. Each setup function builds its component outside of the timings and returns
+a function processing a batch of items together with the list of items.
+"""
+from .corpus import SKILLS
+
+
+def extract_pdf(corpus, options):
+    """
+    Extracts the copies of the sample PDF, one file per call.
+    """
+    from parser import PDFExtractor
+
+    extractor = PDFExtractor()
+    return lambda paths: [extractor.extract(path) for path in paths], corpus.files(".pdf")
+
+
+def extract_txt(corpus, options):
+    """
+    Extracts the generated text resumes, one file per call.
+    """
+    from parser import TextExtractor
+
+    extractor = TextExtractor()
+    return lambda paths: [extractor.extract(path) for path in paths], corpus.files(".txt")
+
+
+def extract_docx(corpus, options):
+    """
+    Extracts the generated DOCX resumes with the streaming extractor, one file per call.
+    """
+    from parser import DOCXExtractor
+
+    extractor = DOCXExtractor()
+    return lambda paths: [extractor.extract(path) for path in paths], corpus.files(".docx")
+
+
+def extract_docx_python_docx(corpus, options):
+    """
+    Extracts the generated DOCX resumes with python-docx, the reference for extract_docx.
+    """
+    from parser import DOCXExtractor
+
+    extractor = DOCXExtractor(streaming=False)
+    return lambda paths: [extractor.extract(path) for path in paths], corpus.files(".docx")
+
+
+def preprocess(corpus, options):
+    """
+    Preprocesses batches of resumes with Preprocessor.preprocess_many.
+    """
+    from processor import Preprocessor
+
+    preprocessor = Preprocessor()
+    return lambda texts: list(preprocessor.preprocess_many(texts, batch_size=len(texts))), corpus.resumes
+
+
+def skill_list(corpus, options):
+    """
+    Extracts the benchmark skill list from resumes with a compiled SkillIndex.
+    """
+    from skill import SkillListMatcher
+
+    index = SkillListMatcher().compile(SKILLS)
+    return lambda texts: [index.extract(text) for text in texts], corpus.resumes
+
+
+def skill_dynamic(corpus, options):
+    """
+    Extracts skills from batches of resumes with the NER model.
+    """
+    from skill import SkillDynamicMatcher
+
+    matcher = SkillDynamicMatcher()
+    return lambda texts: list(matcher.extract_many(texts, batch_size=len(texts))), corpus.resumes
+
+
+def similarity_tfidf(corpus, options):
+    """
+    Scores batches of resumes against a job description with TF-IDF.
+    """
+    from similarity import TFIDFSimilarity
+
+    similarity = TFIDFSimilarity()
+    job_description = corpus.job_descriptions[0]
+    return lambda texts: similarity.batch_similarity(job_description, texts, batch_size=len(texts)), corpus.resumes
+
+
+def similarity_sentence_transformer(corpus, options):
+    """
+    Scores batches of resumes against a job description with a SentenceTransformer.
+    """
+    from similarity import SentenceTransformerSimilarity
+
+    similarity = SentenceTransformerSimilarity(options.sentence_transformer, precision=options.precision)
+    job_description = corpus.job_descriptions[0]
+    return lambda texts: similarity.batch_similarity(job_description, texts, batch_size=len(texts)), corpus.resumes
+
+
+def similarity_bert(corpus, options):
+    """
+    Scores batches of resumes against a job description with BERT.
+    """
+    from similarity import BertSimilarity
+
+    similarity = BertSimilarity(precision=options.precision)
+    job_description = corpus.job_descriptions[0]
+    return lambda texts: similarity.batch_similarity(job_description, texts, batch_size=len(texts)), corpus.resumes
+
+
+def recommendation(corpus, options):
+    """
+    Generates recommendations, batches of several resumes share the job description prefix.
+    """
+    from recommendation import AiRecommendation
+
+    model = AiRecommendation(max_new_tokens=options.max_new_tokens, precision=options.precision)
+    job_description = corpus.job_descriptions[0]
+
+    def run(texts):
+        if len(texts) == 1:
+            return [model.recommend(texts[0], job_description)]
+        return model.recommend_many(texts, job_description, batch_size=len(texts))
+
+    # Generation is slow, a handful of resumes is enough for stable numbers.
+    return run, corpus.resumes[:options.recommendation_items]
+
+
+STAGES = {
+    "extract_pdf": extract_pdf,
+    "extract_txt": extract_txt,
+    "extract_docx": extract_docx,
+    "extract_docx_python_docx": extract_docx_python_docx,
+    "preprocess": preprocess,
+    "skill_list": skill_list,
+    "skill_dynamic": skill_dynamic,
+    "similarity_tfidf": similarity_tfidf,
+    "similarity_sentence_transformer": similarity_sentence_transformer,
+    "similarity_bert": similarity_bert,
+    "recommendation": recommendation,
+}
+
+# Stages processing one document per call, whatever the requested batch sizes.
+SINGLE_ITEM_STAGES = {"extract_pdf", "extract_txt", "extract_docx", "extract_docx_python_docx"}
@@ -0,0 +1,288 @@
+"""
+Evaluates the similarity models on a labelled dataset of resume / job description pairs.
+
+    python -m evaluation.evaluate test.csv --models tfidf,bert,sentence-transformer --cache-dir .eval_cache
+
+The dataset is a local CSV, JSON lines or Parquet file with resume_text, job_description_text and label
+columns, where "No Fit" is the negative label. The test split of the dataset used by evaluation.ipynb
+can be exported once with
+
+    datasets.load_dataset("cnamuangtoun/resume-job-description-fit")["test"].to_csv("test.csv")
+
+Every distinct text is preprocessed once and encoded once per model, in batches and through the caches,
+then every threshold is swept in one vectorized pass to give the ROC and precision-recall curves and the
+operating point with the best F1 score.
+"""
+import os
+import re
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+MODELS = ("tfidf", "bert", "sentence-transformer")
+
+
+def load_pairs(path):
+    """
+    Reads a labelled dataset file.
+    :param path: CSV, JSON lines or Parquet file.
+    :return: Tuple of the resume texts, the job description texts and the 0/1 label array.
+    """
+    if path.endswith(".parquet"):
+        frame = pd.read_parquet(path)
+    elif path.endswith((".jsonl", ".json")):
+        frame = pd.read_json(path, lines=path.endswith(".jsonl"))
+    else:
+        frame = pd.read_csv(path)
+
+    labels = frame["label"]
+    if labels.dtype == object:
+        labels = (labels != "No Fit").astype(int)
+
+    return (
+        frame["resume_text"].fillna("").tolist(),
+        frame["job_description_text"].fillna("").tolist(),
+        labels.to_numpy(dtype=np.int8),
+    )
+
+
+def preprocess_unique(texts, preprocessor, cache=None, batch_size=64):
+    """
+    Preprocesses the distinct texts once.
+    :param texts: List of texts, with repetitions.
+    :param preprocessor: The Preprocessor.
+    :param cache: Optional StageCache keeping the preprocessed texts across runs.
+    :param batch_size: Number of texts per spaCy batch.
+    :return: Tuple of the distinct preprocessed texts and the position of every text among them.
+    """
+    from pipeline import content_hash, component_config
+    from pipeline.pipeline import PREPROCESSOR_SETTINGS
+
+    unique, inverse = np.unique(np.asarray(texts, dtype=object), return_inverse=True)
+    unique = unique.tolist()
+
+    def compute(missing):
+        return list(preprocessor.preprocess_many([unique[position] for position in missing], batch_size=batch_size))
+
+    if cache is None:
+        return compute(range(len(unique))), inverse
+
+    hashes = [content_hash(text) for text in unique]
+    config = component_config(preprocessor, *PREPROCESSOR_SETTINGS)
+    return cache.get_or_compute_many("preprocess", hashes, compute, config=config), inverse
+
+
+def embedding_scores(similarity, texts, resume_positions, job_positions, batch_size=32):
+    """
+    Scores pairs with an embedding model, encoding every distinct text once.
+    :param similarity: SentenceTransformerSimilarity or BertSimilarity.
+    :param texts: List of the distinct preprocessed texts.
+    :param resume_positions: Position of the resume of every pair in texts.
+    :param job_positions: Position of the job description of every pair in texts.
+    :param batch_size: Number of texts per forward pass.
+    :return: Array of cosine similarities, one per pair.
+    """
+    embeddings = np.asarray(similarity.encode_many(texts, batch_size=batch_size), dtype=np.float32)
+    embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+    return np.einsum("ij,ij->i", embeddings[resume_positions], embeddings[job_positions])
+
+
+def tfidf_scores(similarity, texts, resume_positions, job_positions):
+    """
+    Scores pairs with the pairwise TF-IDF similarity, batching the resumes of each job description.
+    :param similarity: An unfitted TFIDFSimilarity.
+    :param texts: List of the distinct preprocessed texts.
+    :param resume_positions: Position of the resume of every pair in texts.
+    :param job_positions: Position of the job description of every pair in texts.
+    :return: Array of cosine similarities, one per pair.
+    """
+    scores = np.zeros(len(resume_positions), dtype=np.float32)
+    for job in np.unique(job_positions):
+        pairs = np.flatnonzero(job_positions == job)
+        pair_resumes = [texts[position] for position in resume_positions[pairs]]
+        scores[pairs], _ = similarity.batch_similarity(texts[job], pair_resumes)
+
+    return scores
+
+
+def threshold_sweep(scores, labels):
+    """
+    Computes the confusion counts at every distinct threshold in one pass over the sorted scores.
+    A pair is predicted positive when its score is at least the threshold.
+    :param scores: Array of scores.
+    :param labels: Array of 0/1 labels.
+    :return: Dictionary of arrays: thresholds, precision, recall, fpr, f1 and accuracy, by decreasing threshold.
+    """
+    order = np.argsort(-scores, kind="stable")
+    sorted_scores, sorted_labels = scores[order], labels[order].astype(np.int64)
+
+    # The last position of every run of equal scores.
+    ends = np.r_[np.flatnonzero(np.diff(sorted_scores)), len(sorted_scores) - 1]
+    true_positives = np.cumsum(sorted_labels)[ends]
+    false_positives = (ends + 1) - true_positives
+
+    positives = int(sorted_labels.sum())
+    negatives = len(sorted_labels) - positives
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = true_positives / (true_positives + false_positives)
+        recall = true_positives / positives if positives else np.zeros(len(ends))
+        fpr = false_positives / negatives if negatives else np.zeros(len(ends))
+        f1 = 2 * true_positives / (2 * true_positives + false_positives + (positives - true_positives))
+        accuracy = (true_positives + negatives - false_positives) / len(sorted_labels)
+
+    return {
+        "thresholds": sorted_scores[ends],
+        "precision": np.nan_to_num(precision),
+        "recall": recall,
+        "fpr": fpr,
+        "f1": np.nan_to_num(f1),
+        "accuracy": accuracy,
+    }
+
+
+def summarize(sweep):
+    """
+    Computes the areas under the curves and the best F1 operating point of a sweep.
+    :param sweep: The output of threshold_sweep.
+    :return: Dictionary of metrics.
+    """
+    fpr = np.r_[0.0, sweep["fpr"]]
+    tpr = np.r_[0.0, sweep["recall"]]
+    recall_steps = np.diff(np.r_[0.0, sweep["recall"]])
+
+    best = int(np.argmax(sweep["f1"]))
+    return {
+        "roc_auc": float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)),
+        "average_precision": float(np.sum(recall_steps * sweep["precision"])),
+        "threshold": float(sweep["thresholds"][best]),
+        "accuracy": float(sweep["accuracy"][best]),
+        "precision": float(sweep["precision"][best]),
+        "recall": float(sweep["recall"][best]),
+        "f1": float(sweep["f1"][best]),
+    }
+
+
+def _slug(name):
+    """
+    Turns a model cache name into a directory name.
+    :param name: The cache name, e.g. bert-base-uncased#precision=int8.
+    :return: The name with every character outside letters, digits, dots and dashes replaced by an underscore.
+    """
+    return re.sub(r"[^A-Za-z0-9.-]+", "_", name)
+
+
+def _build(name, args):
+    """
+    Builds a similarity model, caching the embeddings of each model in its own directory of args.cache_dir.
+    :param name: tfidf, bert or sentence-transformer.
+    :param args: The command line arguments.
+    :return: The similarity instance.
+    """
+    from similarity import SentenceTransformerSimilarity, BertSimilarity, TFIDFSimilarity, EmbeddingCache
+
+    if name == "tfidf":
+        return TFIDFSimilarity()
+    if name == "bert":
+        similarity = BertSimilarity(precision=args.precision)
+    else:
+        similarity = SentenceTransformerSimilarity(args.sentence_transformer, precision=args.precision)
+
+    # The vector store of a cache holds embeddings of a single size, so models do not share one.
+    if args.cache_dir:
+        similarity.cache = EmbeddingCache(os.path.join(args.cache_dir, "embeddings", _slug(similarity.cache_name)))
+    return similarity
+
+
+def _plot(curves, path):
+    """
+    Draws the ROC and precision-recall curves of every model.
+    :param curves: Dictionary of model name to sweep.
+    :param path: The image path.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    figure, (roc, pr) = plt.subplots(1, 2, figsize=(12, 5))
+    for name, sweep in curves.items():
+        roc.plot(np.r_[0.0, sweep["fpr"]], np.r_[0.0, sweep["recall"]], label=name)
+        pr.plot(sweep["recall"], sweep["precision"], label=name)
+
+    roc.plot([0, 1], [0, 1], linestyle="--", color="grey")
+    roc.set(xlabel="False positive rate", ylabel="True positive rate", title="ROC")
+    pr.set(xlabel="Recall", ylabel="Precision", title="Precision-Recall")
+    roc.legend()
+    pr.legend()
+    figure.tight_layout()
+    figure.savefig(path)
+    plt.close(figure)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Evaluate the similarity models with a threshold sweep.")
+    parser.add_argument("dataset",
+                        help="CSV, JSON lines or Parquet file with resume_text, job_description_text and label.")
+    parser.add_argument("--models", default=",".join(MODELS), help=f"Comma separated models among {', '.join(MODELS)}.")
+    parser.add_argument("--limit", type=int, default=None, help="Evaluate the first pairs only.")
+    parser.add_argument("--cache-dir", default=None, help="Directory caching preprocessed texts and embeddings.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--precision", choices=["float32", "bfloat16", "int8"], default="float32")
+    parser.add_argument("--sentence-transformer", default="mixedbread-ai/mxbai-embed-large-v1")
+    parser.add_argument("-o", "--output", default="evaluation_results.json", help="JSON report with the curves.")
+    parser.add_argument("--csv", default=None, help="Optional CSV of the best F1 metrics, like evaluation.csv.")
+    parser.add_argument("--plot", default=None, help="Optional image of the ROC and precision-recall curves.")
+    args = parser.parse_args(arguments)
+
+    from processor import Preprocessor
+    from pipeline import StageCache
+
+    resumes, job_descriptions, labels = load_pairs(args.dataset)
+    if args.limit is not None:
+        resumes, job_descriptions, labels = resumes[:args.limit], job_descriptions[:args.limit], labels[:args.limit]
+
+    stage_cache = None
+    if args.cache_dir:
+        stage_cache = StageCache(directory=os.path.join(args.cache_dir, "stages"), max_disk_entries=10 ** 6)
+
+    texts, inverse = preprocess_unique(resumes + job_descriptions, Preprocessor(), stage_cache)
+    resume_positions, job_positions = inverse[:len(resumes)], inverse[len(resumes):]
+    print(f"{len(labels)} pairs, {len(texts)} distinct texts")
+
+    report, curves = {}, {}
+    for name in [name.strip() for name in args.models.split(",") if name.strip()]:
+        if name not in MODELS:
+            raise ValueError(f"Unknown model {name}, choose among {', '.join(MODELS)}.")
+
+        similarity = _build(name, args)
+        if name == "tfidf":
+            scores = tfidf_scores(similarity, texts, resume_positions, job_positions)
+        else:
+            scores = embedding_scores(similarity, texts, resume_positions, job_positions, args.batch_size)
+            if similarity.cache is not None:
+                similarity.cache.close()
+        del similarity
+
+        curves[name] = threshold_sweep(scores, labels)
+        report[name] = summarize(curves[name])
+        print(name, ", ".join(f"{metric}={value:.4f}" for metric, value in report[name].items()))
+
+    with open(args.output, "w") as file:
+        json.dump({
+            "dataset": args.dataset,
+            "pairs": len(labels),
+            "models": report,
+            "curves": {name: {key: values.tolist() for key, values in sweep.items()} for name, sweep in curves.items()},
+        }, file)
+
+    if args.csv:
+        pd.DataFrame(report).loc[["accuracy", "precision", "recall", "f1", "threshold", "roc_auc"]].to_csv(args.csv)
+
+    if args.plot:
+        _plot(curves, args.plot)
+
+
+if __name__ == "__main__":
+    main()
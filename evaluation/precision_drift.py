@@ -0,0 +1,237 @@
+"""
+Reports how far reduced precision models drift from float32 on the sample data.
+
+    python -m evaluation.precision_drift --precision int8 --precision bfloat16 --llm
+
+For each embedding model the resume and job descriptions of sample_data are encoded at float32 and at every
+requested precision. The report gives the cosine between the float32 and reduced embeddings of each text,
+the change of every resume / job description score, the encoding latency and the serialized weight size.
+With --llm the recommendation model is compared on its next token predictions over the prompt.
+"""
+import os
+import json
+import time
+import argparse
+import numpy as np
+import torch
+
+SAMPLE_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_data")
+
+
+def load_sample_texts(directory=SAMPLE_DATA):
+    """
+    Extracts and preprocesses the sample resume and job descriptions.
+    :param directory: The sample data directory.
+    :return: Tuple of the resume texts and the job description texts.
+    """
+    from parser import PDFExtractor, TextExtractor
+    from processor import Preprocessor
+
+    preprocessor = Preprocessor()
+    resumes = [
+        PDFExtractor().extract(os.path.join(directory, name))
+        for name in sorted(os.listdir(directory)) if name.endswith(".pdf")
+    ]
+    job_descriptions = [
+        TextExtractor().extract(os.path.join(directory, name))
+        for name in sorted(os.listdir(directory)) if name.endswith(".txt")
+    ]
+
+    return list(preprocessor.preprocess_many(resumes)), list(preprocessor.preprocess_many(job_descriptions))
+
+
+def _normalized(embeddings):
+    """
+    Scales embeddings to unit length.
+    :param embeddings: 2-D array of embeddings.
+    :return: The normalized float32 embeddings.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+
+def _measure(similarity, texts, repeats):
+    """
+    Encodes the texts, keeping the fastest of several runs.
+    :param similarity: The similarity instance.
+    :param texts: List of texts.
+    :param repeats: Number of timed runs.
+    :return: Tuple of the normalized embeddings and the seconds per run.
+    """
+    seconds = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        embeddings = similarity.encode_many(texts)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    return _normalized(embeddings), seconds
+
+
+def _skipped(precision):
+    """
+    Tells why a precision cannot be compared on this machine.
+    :param precision: The precision.
+    :return: The reason, None when the precision can be compared.
+    """
+    from resources.precision import bfloat16_supported
+
+    if precision == "bfloat16" and not bfloat16_supported():
+        # The model would silently stay float32 and report no drift at all.
+        return "This CPU has no native bfloat16 support."
+    return None
+
+
+def embedding_drift(build, precisions, resumes, job_descriptions, repeats=3):
+    """
+    Compares the embeddings and scores of reduced precision models with float32.
+    Every precision is loaded into its own pool, cleared before the next one loads.
+    :param build: Function building the similarity for a precision and a ModelPool.
+    :param precisions: List of reduced precisions.
+    :param resumes: List of preprocessed resumes.
+    :param job_descriptions: List of preprocessed job descriptions.
+    :param repeats: Number of timed encoding runs.
+    :return: Dictionary of report entries, one per precision including float32.
+    """
+    from resources.pool import ModelPool
+    from resources.precision import model_size
+
+    texts = resumes + job_descriptions
+    report = {}
+    reference_embeddings = reference_scores = None
+
+    for precision in ["float32"] + [precision for precision in precisions if precision != "float32"]:
+        reason = _skipped(precision)
+        if reason is not None:
+            report[precision] = {"skipped": reason}
+            continue
+
+        pool = ModelPool()
+        similarity = build(precision, pool)
+        embeddings, seconds = _measure(similarity, texts, repeats)
+        scores = embeddings[len(resumes):] @ embeddings[:len(resumes)].T
+
+        entry = {"seconds": seconds, "model_bytes": model_size(similarity.model), "scores": scores.tolist()}
+        if reference_embeddings is None:
+            reference_embeddings, reference_scores = embeddings, scores
+        else:
+            cosine = np.sum(embeddings * reference_embeddings, axis=1)
+            drift = np.abs(scores - reference_scores)
+            entry.update(
+                embedding_cosine_min=float(cosine.min()),
+                embedding_cosine_mean=float(cosine.mean()),
+                score_drift_max=float(drift.max()),
+                score_drift_mean=float(drift.mean()),
+                ranking_preserved=bool(np.array_equal(np.argsort(-scores, axis=1), np.argsort(-reference_scores, axis=1))),
+                speedup=report["float32"]["seconds"] / seconds,
+                size_ratio=entry["model_bytes"] / report["float32"]["model_bytes"],
+            )
+        report[precision] = entry
+
+        del similarity
+        pool.clear()
+
+    return report
+
+
+def generation_drift(model_name, precisions, resume, job_description, max_prompt_tokens=1024):
+    """
+    Compares the next token predictions of reduced precision language models with float32 over the prompt.
+    Every precision is loaded into its own pool, cleared before the next one loads.
+    :param model_name: The recommendation model name.
+    :param precisions: List of reduced precisions.
+    :param resume: The resume text.
+    :param job_description: The job description text.
+    :param max_prompt_tokens: Token budget of the prompt.
+    :return: Dictionary of report entries, one per precision including float32.
+    """
+    from recommendation import AiRecommendation
+    from resources.pool import ModelPool
+    from resources.precision import model_size
+
+    report = {}
+    reference = None
+
+    for precision in ["float32"] + [precision for precision in precisions if precision != "float32"]:
+        reason = _skipped(precision)
+        if reason is not None:
+            report[precision] = {"skipped": reason}
+            continue
+
+        pool = ModelPool()
+        recommendation = AiRecommendation(model_name, max_prompt_tokens=max_prompt_tokens, precision=precision,
+                                          pool=pool)
+        prompt = recommendation.build_prompt(resume, job_description)
+        inputs = recommendation.tokenizer(prompt, return_tensors="pt")
+
+        start = time.perf_counter()
+        with torch.no_grad():
+            logits = recommendation.model(**inputs).logits[0].float()
+        seconds = time.perf_counter() - start
+
+        probabilities = torch.log_softmax(logits, dim=-1)
+        entry = {"seconds": seconds, "model_bytes": model_size(recommendation.model)}
+        if reference is None:
+            reference = probabilities
+        else:
+            kl = torch.sum(reference.exp() * (reference - probabilities), dim=-1)
+            entry.update(
+                top1_agreement=float((probabilities.argmax(-1) == reference.argmax(-1)).float().mean()),
+                kl_divergence_mean=float(kl.mean()),
+                kl_divergence_max=float(kl.max()),
+                speedup=report["float32"]["seconds"] / seconds,
+                size_ratio=entry["model_bytes"] / report["float32"]["model_bytes"],
+            )
+        report[precision] = entry
+
+        del recommendation
+        pool.clear()
+
+    return report
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Report the score drift of reduced precision models.")
+    parser.add_argument("--precision", action="append", choices=["bfloat16", "int8"], dest="precisions",
+                        help="Reduced precision to compare with float32, repeat the option for several.")
+    parser.add_argument("--sentence-transformer", default="mixedbread-ai/mxbai-embed-large-v1")
+    parser.add_argument("--bert", default="google-bert/bert-base-uncased")
+    parser.add_argument("--llm", action="store_true", help="Also compare the recommendation model.")
+    parser.add_argument("--llm-model", default="HuggingFaceTB/SmolLM2-1.7B-Instruct")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("-o", "--output", default=None, help="Optional JSON file for the report.")
+    args = parser.parse_args(arguments)
+
+    from similarity import SentenceTransformerSimilarity, BertSimilarity
+
+    precisions = args.precisions or ["int8"]
+    resumes, job_descriptions = load_sample_texts()
+
+    report = {
+        "sentence_transformer": embedding_drift(
+            lambda precision, pool: SentenceTransformerSimilarity(args.sentence_transformer, precision=precision,
+                                                                  pool=pool),
+            precisions, resumes, job_descriptions, args.repeats,
+        ),
+        "bert": embedding_drift(
+            lambda precision, pool: BertSimilarity(args.bert, precision=precision, pool=pool),
+            precisions, resumes, job_descriptions, args.repeats,
+        ),
+    }
+    if args.llm:
+        report["recommendation"] = generation_drift(args.llm_model, precisions, resumes[0], job_descriptions[0])
+
+    for model, entries in report.items():
+        for precision, entry in entries.items():
+            summary = ", ".join(
+                f"{key}={value:.4f}" if isinstance(value, float) else f"{key}={value}"
+                for key, value in entry.items() if key != "scores"
+            )
+            print(f"{model} {precision}: {summary}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+from .metrics import (
+    Counter, Gauge, Histogram, Registry, REGISTRY, STAGE_SECONDS, DOCUMENTS, TOKENS, CACHE_LOOKUPS, span, timed
+)
+from .memory import current_rss
+from .exporter import start_http_server, write_metrics
+from .profiler import SamplingProfiler
+
+__all__ = [
+    "Counter", "Gauge", "Histogram", "Registry", "REGISTRY", "STAGE_SECONDS", "DOCUMENTS", "TOKENS", "CACHE_LOOKUPS",
+    "span", "timed", "current_rss", "start_http_server", "write_metrics", "SamplingProfiler",
+]
@@ -0,0 +1,49 @@
+import os
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from .metrics import REGISTRY
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def start_http_server(port=9100, address="127.0.0.1", registry=REGISTRY):
+    """
+    Serves the metrics at /metrics from a background thread.
+    :param port: The port to listen on.
+    :param address: The address to bind, local only by default.
+    :param registry: The metrics registry.
+    :return: The running server, call shutdown to stop it.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+
+    return server
+
+
+def write_metrics(path, registry=REGISTRY):
+    """
+    Writes the metrics to a file atomically, for the node exporter textfile collector or a batch job.
+    :param path: The output file path, usually ending in .prom.
+    :param registry: The metrics registry.
+    """
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as file:
+        file.write(registry.render())
+    os.replace(temporary_path, path)
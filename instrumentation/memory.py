@@ -0,0 +1,28 @@
+import os
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss():
+    """
+    Reads the resident memory of the process.
+    Falls back to the peak resident memory of the process lifetime where /proc is not available.
+    :return: Resident memory in bytes, None when it cannot be read.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        pass
+
+    if resource is None:
+        return None
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
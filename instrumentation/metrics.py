@@ -0,0 +1,364 @@
+import time
+import bisect
+import functools
+import inspect
+import threading
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the stage duration buckets.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames, values, extra=()):
+    """
+    Formats the label set of a sample in the Prometheus text format.
+    :param labelnames: Tuple of label names.
+    :param values: Tuple of label values.
+    :param extra: Extra (name, value) pairs, such as the bucket bound of a histogram.
+    :return: The label string, empty without labels.
+    """
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+
+    escaped = (f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    """
+    Escapes a label value.
+    :param value: The label value.
+    :return: The value with backslashes, quotes and line breaks escaped.
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    """
+    Formats a sample value, bucket bounds included.
+    :param value: The number.
+    :return: The value string.
+    """
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    A monotonically increasing count, one per label set.
+    """
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Initializes the counter.
+        :param name: The metric name.
+        :param documentation: The help text.
+        :param labelnames: Tuple of label names.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.__values = {}
+        self.__lock = threading.Lock()
+
+
+    def inc(self, amount=1, **labels):
+        """
+        Adds to the count of a label set.
+        :param amount: The non-negative amount added.
+        :param labels: The label values.
+        """
+        if amount < 0:
+            raise ValueError("Counters can only increase.")
+
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.__lock:
+            self.__values[key] = self.__values.get(key, 0) + amount
+
+
+    def value(self, **labels):
+        """
+        Reads the count of a label set.
+        :param labels: The label values.
+        :return: The count.
+        """
+        with self.__lock:
+            return self.__values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+
+    def samples(self):
+        """
+        Lists the samples of every label set.
+        :return: List of (name, label string, value) tuples.
+        """
+        with self.__lock:
+            values = sorted(self.__values.items())
+
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in values]
+
+
+class Gauge:
+    """
+    A value that goes up and down, one per label set.
+    """
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Initializes the gauge.
+        :param name: The metric name.
+        :param documentation: The help text.
+        :param labelnames: Tuple of label names.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.__values = {}
+        self.__lock = threading.Lock()
+
+
+    def set(self, value, **labels):
+        """
+        Sets the value of a label set.
+        :param value: The value.
+        :param labels: The label values.
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.__lock:
+            self.__values[key] = value
+
+
+    def value(self, **labels):
+        """
+        Reads the value of a label set.
+        :param labels: The label values.
+        :return: The value.
+        """
+        with self.__lock:
+            return self.__values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+
+    def samples(self):
+        """
+        Lists the samples of every label set.
+        :return: List of (name, label string, value) tuples.
+        """
+        with self.__lock:
+            values = sorted(self.__values.items())
+
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in values]
+
+
+class Histogram:
+    """
+    Observations counted into cumulative buckets, with their sum and count, one per label set.
+    """
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Initializes the histogram.
+        :param name: The metric name.
+        :param documentation: The help text.
+        :param labelnames: Tuple of label names.
+        :param buckets: Sorted upper bounds of the buckets, +Inf is added.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.__values = {}
+        self.__lock = threading.Lock()
+
+
+    def observe(self, value, **labels):
+        """
+        Records an observation.
+        :param value: The observed value.
+        :param labels: The label values.
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        bucket = bisect.bisect_left(self.buckets, value)
+
+        with self.__lock:
+            counts, total = self.__values.get(key, ([0] * len(self.buckets), 0.0))
+            counts[bucket] += 1
+            self.__values[key] = (counts, total + value)
+
+
+    def samples(self):
+        """
+        Lists the bucket, sum and count samples of every label set.
+        :return: List of (name, label string, value) tuples.
+        """
+        with self.__lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self.__values.items())
+
+        samples = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                samples.append((f"{self.name}_bucket", labels, cumulative))
+            samples.append((f"{self.name}_sum", _format_labels(self.labelnames, key), total))
+            samples.append((f"{self.name}_count", _format_labels(self.labelnames, key), cumulative))
+
+        return samples
+
+
+class Registry:
+    """
+    The metrics of a process, rendered together in the Prometheus text format.
+    """
+    def __init__(self):
+        self.__metrics = {}
+        self.__lock = threading.Lock()
+
+
+    def counter(self, name, documentation, labelnames=()):
+        """
+        Returns the counter of a name, creating it on first use.
+        :param name: The metric name.
+        :param documentation: The help text.
+        :param labelnames: Tuple of label names.
+        :return: The Counter.
+        """
+        return self.__get_or_create(Counter, name, documentation, labelnames)
+
+
+    def gauge(self, name, documentation, labelnames=()):
+        """
+        Returns the gauge of a name, creating it on first use.
+        :param name: The metric name.
+        :param documentation: The help text.
+        :param labelnames: Tuple of label names.
+        :return: The Gauge.
+        """
+        return self.__get_or_create(Gauge, name, documentation, labelnames)
+
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Returns the histogram of a name, creating it on first use.
+        :param name: The metric name.
+        :param documentation: The help text.
+        :param labelnames: Tuple of label names.
+        :param buckets: Sorted upper bounds of the buckets.
+        :return: The Histogram.
+        """
+        return self.__get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+    def render(self):
+        """
+        Renders every metric in the Prometheus text exposition format.
+        :return: The exposition text.
+        """
+        with self.__lock:
+            metrics = list(self.__metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+    def __get_or_create(self, kind, name, documentation, labelnames, **kwargs):
+        """
+        Returns a registered metric, or registers a new one.
+        :param kind: Counter, Gauge or Histogram.
+        :param name: The metric name.
+        :param documentation: The help text.
+        :param labelnames: Tuple of label names.
+        :return: The metric.
+        """
+        with self.__lock:
+            metric = self.__metrics.get(name)
+            if metric is None:
+                metric = self.__metrics[name] = kind(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, kind) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered with another type or labels.")
+
+        return metric
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "resume_analyzer_stage_seconds", "Time spent in each stage.", ("stage",)
+)
+DOCUMENTS = REGISTRY.counter(
+    "resume_analyzer_documents_total", "Documents processed by each stage.", ("stage",)
+)
+TOKENS = REGISTRY.counter(
+    "resume_analyzer_tokens_total", "Tokens processed, or generated, by each stage.", ("stage",)
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "resume_analyzer_cache_lookups_total", "Cache lookups by cache and result.", ("cache", "result")
+)
+
+
+@contextmanager
+def span(stage):
+    """
+    Times a block of code into the stage duration histogram.
+    :param stage: The stage name.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def timed(stage, documents=False):
+    """
+    Decorator timing every call of a function into the stage duration histogram.
+    Generator functions are timed while they run only, not while their consumer holds them.
+    :param stage: The stage name.
+    :param documents: Count a document per call, or per yielded item of a generator function.
+    :return: The decorator.
+    """
+    def decorator(function):
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def generator(*args, **kwargs):
+                elapsed = 0.0
+                iterator = function(*args, **kwargs)
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            item = next(iterator)
+                        except StopIteration:
+                            return
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        if documents:
+                            DOCUMENTS.inc(stage=stage)
+                        yield item
+                finally:
+                    iterator.close()
+                    STAGE_SECONDS.observe(elapsed, stage=stage)
+
+            return generator
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                result = function(*args, **kwargs)
+            if documents:
+                DOCUMENTS.inc(stage=stage)
+            return result
+
+        return wrapper
+
+    return decorator
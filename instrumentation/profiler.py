@@ -0,0 +1,119 @@
+import os
+import sys
+import threading
+from collections import Counter as Tally
+
+
+class SamplingProfiler:
+    """
+    A low overhead statistical profiler. A background thread periodically reads the current stack of the
+    profiled threads with sys._current_frames and counts the collapsed stacks, the input format of flame graphs.
+    Switched on around a single request, it shows where that request spent its time.
+    """
+    def __init__(self, interval=0.005, thread_ids=None):
+        """
+        Initializes the profiler.
+        :param interval: Seconds between two samples.
+        :param thread_ids: Optional ids of the profiled threads, every other thread when None.
+        """
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.samples = 0
+        self.__stacks = Tally()
+        self.__stop = threading.Event()
+        self.__thread = None
+
+
+    def start(self):
+        """
+        Starts sampling in the background.
+        :return: The profiler.
+        """
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__run, name="sampling-profiler", daemon=True)
+        self.__thread.start()
+        return self
+
+
+    def stop(self):
+        """
+        Stops sampling.
+        :return: The profiler.
+        """
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        return self
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, *exception):
+        self.stop()
+        return False
+
+
+    def collapsed(self):
+        """
+        The sampled stacks, root first with frames separated by semicolons.
+        :return: Dictionary of collapsed stack to sample count.
+        """
+        return dict(self.__stacks)
+
+
+    def top(self, count=20):
+        """
+        Ranks the functions by the samples spent in them, excluding and including their callees.
+        :param count: Number of functions returned.
+        :return: List of (function, self samples, total samples) tuples, by decreasing self samples.
+        """
+        own, total = Tally(), Tally()
+        for stack, samples in self.__stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += samples
+            for frame in set(frames):
+                total[frame] += samples
+
+        return [(frame, samples, total[frame]) for frame, samples in own.most_common(count)]
+
+
+    def write_collapsed(self, path):
+        """
+        Writes the collapsed stacks, one "stack count" line each, for flamegraph.pl or speedscope.
+        :param path: The output file path.
+        """
+        with open(path, "w") as file:
+            for stack, samples in sorted(self.__stacks.items()):
+                file.write(f"{stack} {samples}\n")
+
+
+    def __run(self):
+        """
+        Samples the profiled threads until the profiler is stopped.
+        """
+        own_id = threading.get_ident()
+        while not self.__stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                self.__stacks[self.__collapse(frame)] += 1
+            self.samples += 1
+
+
+    @staticmethod
+    def __collapse(frame):
+        """
+        Collapses a stack into one string.
+        :param frame: The innermost frame.
+        :return: The frames from the root, as file:function, separated by semicolons.
+        """
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+
+        return ";".join(reversed(frames))
@@ -1,49 +1,68 @@
+import os
+import time
 import gradio as gr
-from parser import PDFExtractor, TextExtractor, DOCXExtractor
-from processor import Preprocessor
-from skill import SkillDynamicMatcher
-from similarity import SentenceTransformerSimilarity
-from recommendation import AiRecommendation
-
-# Initialize components
-pdf_extractor = PDFExtractor()
-docx_extractor = DOCXExtractor()
-text_extractor = TextExtractor()
-preprocessor = Preprocessor()
-skill_matcher = SkillDynamicMatcher()
-sentence_transformer = SentenceTransformerSimilarity("mixedbread-ai/mxbai-embed-large-v1")
-recommendation = AiRecommendation()
-
-
-def extract(file):
-    if file is None:
-        return "No file uploaded."
-    file_path = file if isinstance(file, str) else file.name
-    if file_path.endswith('.pdf'):
-        return pdf_extractor.extract(file_path)
-    elif file_path.endswith('.docx'):
-        return docx_extractor.extract(file_path)
-    elif file_path.endswith('.txt'):
-        return text_extractor.extract(file_path)
-    else:
-        return "Unsupported file type."
+from resources import BackgroundLoader
+from instrumentation import start_http_server
+
+
+def build_pipeline():
+    # The model libraries are imported here, on the loader thread, so the interface starts right away.
+    from processor import Preprocessor
+    from skill import SkillDynamicMatcher
+    from similarity import SentenceTransformerSimilarity
+    from recommendation import AiRecommendation
+    from pipeline import ResumeAnalysisPipeline, StageCache
+
+    return ResumeAnalysisPipeline(
+        preprocessor=Preprocessor(),
+        skill_matcher=SkillDynamicMatcher(),
+        similarity=SentenceTransformerSimilarity("mixedbread-ai/mxbai-embed-large-v1"),
+        recommendation=AiRecommendation(draft_model_name=os.environ.get("DRAFT_MODEL")),
+        cache=StageCache(directory=os.environ.get("STAGE_CACHE_DIR")),
+    )
+
+
+# Initialize components in the background, requests made before they are ready get a loading message
+loader = BackgroundLoader(build_pipeline, lambda pipeline: pipeline.warm_up()).start()
+
+
+def loading_message():
+    if loader.state == BackgroundLoader.FAILED:
+        return f"Error: the models failed to load: {loader.error}"
+    return f"The models are {loader.state}, please try again in a moment."
+
+
+def model_status():
+    if loader.ready:
+        return "✅ Models ready."
+    return f"⏳ {loading_message()}"
+
+# Prometheus metrics on METRICS_PORT, and a collapsed stack profile per analysis in PROFILE_DIR, when set.
+if os.environ.get("METRICS_PORT"):
+    start_http_server(int(os.environ["METRICS_PORT"]))
+PROFILE_DIR = os.environ.get("PROFILE_DIR")
+if PROFILE_DIR:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
 
 
 def analyze_files(resume_file, job_description_file):
     if not resume_file or not job_description_file:
         return "Please upload both files.", "", "", "", "", ""
 
-    try:
-        # Extract and process text
-        resume_text = extract(resume_file)
-        jd_text = extract(job_description_file)
-        preprocess_resume = preprocessor.preprocess(resume_text)
-        preprocess_jd = preprocessor.preprocess(jd_text)
+    if not loader.ready:
+        return loading_message(), "", "", "", "", ""
 
-        # Skill matching
-        matched_jd_skills = skill_matcher.extract(jd_text)
-        matched_resume_skills = skill_matcher.extract(resume_text)
-        matched_result = skill_matcher.match(matched_jd_skills, matched_resume_skills)
+    pipeline = loader.wait()
+    try:
+        # Extract, process and match both documents
+        result = pipeline.analyze(resume_file, job_description_file, profile=PROFILE_DIR is not None)
+        if result.profiler is not None:
+            result.profiler.write_collapsed(os.path.join(PROFILE_DIR, f"analyze-{time.time_ns()}.folded"))
+        resume_text = result.resume_text
+        jd_text = result.job_description_text
+        matched_jd_skills = result.job_description_skills
+        matched_resume_skills = result.resume_skills
+        matched_result = (result.match_ratio, result.match_string)
 
         # Create scrollable skill display
         skill_display = """
@@ -84,8 +103,7 @@ def analyze_files(resume_file, job_description_file):
         # Prepare other outputs
         ratio_text = f"Match Ratio: {matched_result[0]}" if matched_result else "No matches"
         match_string = f"Match Details: {matched_result[1]}" if matched_result else ""
-        score = sentence_transformer.similarity(preprocess_resume, preprocess_jd)
-        similarity_text = f"Similarity Score: {score:.2f}"
+        similarity_text = f"Similarity Score: {result.similarity:.2f}"
 
         return resume_text, jd_text, gr.HTML(skill_display), ratio_text, match_string, similarity_text
 
@@ -95,13 +113,21 @@ def analyze_files(resume_file, job_description_file):
 
 def get_ai_recommendation(resume_file, job_description_file):
     if not resume_file or not job_description_file:
-        return "Please upload both files first."
+        yield "Please upload both files first."
+        return
+    if not loader.ready:
+        yield loading_message()
+        return
+
+    pipeline = loader.wait()
     try:
-        resume_text = extract(resume_file)
-        jd_text = extract(job_description_file)
-        return recommendation.recommend(resume_text, jd_text)
+        # Stream the recommendation into the textbox as tokens are generated
+        answer = ""
+        for piece in pipeline.stream_recommend(resume_file, job_description_file):
+            answer += piece
+            yield answer
     except Exception as e:
-        return f"Error: {str(e)}"
+        yield f"Error: {str(e)}"
 
 
 # Custom CSS for scrollable containers
@@ -120,6 +146,7 @@ custom_css = """
 
 with gr.Blocks(title="Resume Analyzer", css=custom_css) as demo:
     gr.Markdown("# 🧠 Smart Resume Analyzer")
+    status = gr.Markdown(model_status())
 
     # File upload
     with gr.Row():
@@ -183,4 +210,6 @@ with gr.Blocks(title="Resume Analyzer", css=custom_css) as demo:
         scroll_to_output=True
     )
 
+    demo.load(model_status, outputs=[status])
+
 demo.launch()
\ No newline at end of file
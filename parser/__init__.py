@@ -1,3 +1,3 @@
-from .extract import PDFExtractor, DOCXExtractor, TextExtractor
+from .extract import PDFExtractor, DOCXExtractor, TextExtractor, MAX_PAGES, MAX_CHARS
 
-__all__ = ["PDFExtractor", "DOCXExtractor", "TextExtractor"]
\ No newline at end of file
+__all__ = ["PDFExtractor", "DOCXExtractor", "TextExtractor", "MAX_PAGES", "MAX_CHARS"]
\ No newline at end of file
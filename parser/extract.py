@@ -1,6 +1,128 @@
-import pdfplumber
-from docx import Document
+import io
+import os
+import zipfile
+import tempfile
+from collections import deque
+from xml.etree.ElementTree import iterparse
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, wait
+from instrumentation import timed
+
+# WordprocessingML tags read by the streaming DOCX extractor.
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_BODY, _PARAGRAPH, _RUN, _TEXT = _W + "body", _W + "p", _W + "r", _W + "t"
+_TABLE, _ROW, _CELL = _W + "tbl", _W + "tr", _W + "tc"
+_TAB, _BREAKS = _W + "tab", (_W + "br", _W + "cr")
+
+# PDF limits far above a resume, passed by the pipelines reading uploads so a crafted thousand-page file
+# cannot hold a worker.
+MAX_PAGES = 50
+MAX_CHARS = 200000
+
+
+def _extract_page_range(source, start, stop):
+    """
+    Extract the text of a range of pages, run in a worker process.
+    :param source: the file path or the file content
+    :param start: first page number
+    :param stop: page number after the last page
+    :return: list of page texts
+    """
+    import pdfplumber
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    texts = []
+    with pdfplumber.open(source, pages=range(start + 1, stop + 1)) as pdf:
+        for page in pdf.pages:
+            texts.append(page.extract_text() or "")
+            page.close()
+
+    return texts
+
+
+def _docx_blocks(source):
+    """
+    Streams the paragraphs and table rows of a DOCX document, in document order, out of word/document.xml
+    with an incremental parser. Finished elements are cleared, so memory does not grow with the document.
+    :param source: the file path or a binary file object
+    :return: generator of paragraph texts, and of table rows with their cells separated by tabs
+    """
+    with zipfile.ZipFile(source) as archive, archive.open("word/document.xml") as xml:
+        body = None
+        paragraphs, cells, rows = [], [], []
+        runs = 0
+
+        for event, element in iterparse(xml, events=("start", "end")):
+            tag = element.tag
+            if event == "start":
+                if tag == _PARAGRAPH:
+                    paragraphs.append([])
+                elif tag == _RUN:
+                    runs += 1
+                elif tag == _CELL:
+                    cells.append([])
+                elif tag == _ROW:
+                    rows.append([])
+                elif tag == _BODY:
+                    body = element
+                continue
+
+            if tag == _TEXT:
+                if paragraphs:
+                    paragraphs[-1].append(element.text or "")
+            elif tag == _RUN:
+                runs -= 1
+            # Tabs and breaks also appear in the paragraph properties, only the ones inside a run are text.
+            elif tag == _TAB and runs and paragraphs:
+                paragraphs[-1].append("\t")
+            elif tag in _BREAKS and runs and paragraphs:
+                paragraphs[-1].append("\n")
+            elif tag == _PARAGRAPH:
+                text = "".join(paragraphs.pop())
+                if paragraphs:
+                    # A text box paragraph, inside a run of the enclosing paragraph.
+                    paragraphs[-1].append(f"\n{text}")
+                elif cells:
+                    cells[-1].append(text)
+                else:
+                    yield text
+            elif tag == _CELL:
+                rows[-1].append(" ".join(text for text in cells.pop() if text))
+            elif tag == _ROW:
+                row = "\t".join(rows.pop())
+                if cells:
+                    cells[-1].append(row)
+                else:
+                    yield row
+
+            if tag in (_PARAGRAPH, _ROW, _TABLE):
+                element.clear()
+                if body is not None and not paragraphs and not cells:
+                    body.clear()
+
+
+def _join_limited(texts, max_chars=None):
+    """
+    Join texts, stopping once max_chars characters are collected.
+    :param texts: iterable of texts
+    :param max_chars: number of characters returned at most, all when None
+    :return: joined text
+    """
+    if max_chars is None:
+        return "".join(texts)
+
+    parts = []
+    remaining = max_chars
+    for text in texts:
+        parts.append(text[:remaining])
+        remaining -= len(parts[-1])
+        if remaining <= 0:
+            break
+
+    return "".join(parts)
+
 
 class Extractor(ABC):
     """
@@ -18,31 +140,168 @@ class Extractor(ABC):
 class PDFExtractor(Extractor):
     """
     Extract text from PDF files.
+    With several workers the extractor owns a process pool, release it with close or a with block.
     """
+    def __init__(self, max_pages=None, max_chars=None, workers=1, pages_per_task=8):
+        """
+        Initializes the extraction limits and the parallelism.
+        :param max_pages: Number of pages read at most, all when None.
+        :param max_chars: Number of characters returned at most, all when None.
+        :param workers: Number of processes extracting page ranges in parallel, 1 to read pages serially.
+        :param pages_per_task: Number of pages extracted by a process per task.
+        """
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self.__executor = None
+
+
+    @timed("extract_pdf", documents=True)
     def extract(self, path):
         """
         Extract text from PDF file.
-        :param path: the file path
+        :param path: the file path or a binary file object
         :return: extracted text
         """
-        text = ""
-        with pdfplumber.open(path) as pdf:
+        if self.workers > 1:
+            pages = self.__extract_parallel(path)
+        else:
+            pages = self.extract_pages(path)
+
+        try:
+            return _join_limited(pages, self.max_chars)
+        finally:
+            # Stops reading, or submitting page ranges, once max_chars characters are collected.
+            pages.close()
+
+
+    def close(self):
+        """
+        Shuts down the process pool of the parallel extraction.
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown(cancel_futures=True)
+            self.__executor = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def extract_pages(self, path):
+        """
+        Extract the text of each page, releasing every page once it is read.
+        Pages without a text layer give an empty string.
+        :param path: the file path or a binary file object
+        :return: generator of page texts
+        """
+        import pdfplumber
+
+        if hasattr(path, "read"):
+            path.seek(0)
+
+        with pdfplumber.open(path, pages=self.__page_numbers()) as pdf:
             for page in pdf.pages:
-                text += page.extract_text()
+                yield page.extract_text() or ""
+                page.close()
 
-        return text
+
+    def __page_numbers(self):
+        """
+        The page numbers pdfplumber builds pages for, so pages past max_pages are never parsed.
+        :return: range of 1-based page numbers, None for every page
+        """
+        return range(1, self.max_pages + 1) if self.max_pages is not None else None
+
+
+    def __extract_parallel(self, path):
+        """
+        Extract page ranges on a process pool, with at most one range per worker submitted ahead of the pages
+        read, so closing the generator leaves the remaining ranges unread.
+        A file object is copied once to a temporary file, the tasks get its path rather than the content.
+        :param path: the file path or a binary file object
+        :return: generator of page texts, in page order
+        """
+        import pdfplumber
+
+        source, temporary_path = path, None
+        if hasattr(path, "read"):
+            path.seek(0)
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as file:
+                while chunk := path.read(2 ** 20):
+                    file.write(chunk)
+            source = temporary_path = file.name
+
+        try:
+            with pdfplumber.open(source, pages=self.__page_numbers()) as pdf:
+                page_count = len(pdf.pages)
+
+            yield from self.__submit_ranges(source, page_count)
+        finally:
+            if temporary_path is not None:
+                os.remove(temporary_path)
+
+
+    def __submit_ranges(self, source, page_count):
+        """
+        Extract the page ranges of a file, one range per worker in flight.
+        :param source: the file path
+        :param page_count: number of pages to read
+        :return: generator of page texts, in page order
+        """
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        starts = iter(range(0, page_count, self.pages_per_task))
+        tasks = deque()
+        try:
+            while True:
+                for start in starts:
+                    stop = min(start + self.pages_per_task, page_count)
+                    tasks.append(self.__executor.submit(_extract_page_range, source, start, stop))
+                    if len(tasks) >= self.workers:
+                        break
+
+                if not tasks:
+                    return
+                yield from tasks.popleft().result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Ranges already running still read the file, it is removed once they are done.
+            wait(tasks)
 
 
 class DOCXExtractor(Extractor):
     """
     Extract text from DOCX files.
     """
+    def __init__(self, streaming=True):
+        """
+        Initializes the extraction mode.
+        :param streaming: Stream the paragraphs and tables out of the document XML. When False, the document
+            is loaded with python-docx and only its paragraphs are read, joined without separators.
+        """
+        self.streaming = streaming
+
+
+    @timed("extract_docx", documents=True)
     def extract(self, path):
         """
         Extract text from DOCX file.
-        :param path: the file path
-        :return: extracted text
+        :param path: the file path or a binary file object
+        :return: extracted text, one line per paragraph or table row
         """
+        if self.streaming:
+            return "\n".join(self.extract_blocks(path))
+
+        from docx import Document
+
         text = ""
         document = Document(path)
         for paragraph in document.paragraphs:
@@ -51,16 +310,35 @@ class DOCXExtractor(Extractor):
         return text
 
 
+    def extract_blocks(self, path):
+        """
+        Extract the paragraphs and table rows in document order, without building the document tree.
+        Table cells are separated by tabs and the paragraphs of a cell by spaces.
+        :param path: the file path or a binary file object
+        :return: generator of paragraph and table row texts
+        """
+        if hasattr(path, "read"):
+            path.seek(0)
+
+        yield from _docx_blocks(path)
+
+
 class TextExtractor(Extractor):
     """
     Extract text from .txt file.
     """
+    @timed("extract_txt", documents=True)
     def extract(self, path):
         """
         Extract text from .txt file.
-        :param path: the file path
+        :param path: the file path or a file object
         :return: extracted text
         """
+        if hasattr(path, "read"):
+            path.seek(0)
+            text = path.read()
+            return text.decode("utf-8") if isinstance(text, bytes) else text
+
         with open(path, "r") as file:
             text = file.read()
 
@@ -0,0 +1,13 @@
+from resources.lazy import lazy_exports
+
+_EXPORTS = {
+    "StageCache": ".cache",
+    "content_hash": ".cache",
+    "file_hash": ".cache",
+    "component_config": ".cache",
+    "ResumeAnalysisPipeline": ".pipeline",
+    "AnalysisResult": ".pipeline",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
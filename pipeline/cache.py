@@ -0,0 +1,239 @@
+import os
+import json
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from instrumentation import CACHE_LOOKUPS
+
+
+def content_hash(data):
+    """
+    Hashes a text or bytes value.
+    :param data: The text or bytes to hash.
+    :return: The hex SHA-256 digest.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(file, chunk_size=1 << 20):
+    """
+    Hashes the content of a file given as a path, an uploaded file or a binary file object.
+    :param file: The file path or file object.
+    :param chunk_size: Number of bytes read at once from a path.
+    :return: The hex SHA-256 digest.
+    """
+    if hasattr(file, "getvalue"):
+        return content_hash(file.getvalue())
+
+    if hasattr(file, "read"):
+        position = file.tell()
+        file.seek(0)
+        digest = content_hash(file.read())
+        file.seek(position)
+        return digest
+
+    path = file if isinstance(file, (str, os.PathLike)) else file.name
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def component_config(component, *names):
+    """
+    Describes the settings of a stage component that change its output, for the stage cache keys.
+    :param component: The component, such as an extractor or the Preprocessor.
+    :param names: Names of the attributes changing the output, the ones the component lacks are skipped.
+    :return: Dictionary of the component class name and the attribute values.
+    """
+    config = {"type": type(component).__name__}
+    config.update((name, getattr(component, name)) for name in names if hasattr(component, name))
+    return config
+
+
+class StageCache:
+    """
+    A bounded cache of pipeline stage results keyed by the stage, its configuration and the hash of its input.
+    Results are kept in a memory tier and, when a directory is given, in an on-disk tier shared across restarts.
+    """
+    def __init__(self, max_entries=256, directory=None, max_disk_entries=4096):
+        """
+        Initializes the cache tiers.
+        :param max_entries: Number of results kept in memory.
+        :param directory: Optional directory of the on-disk tier.
+        :param max_disk_entries: Number of results kept on disk.
+        """
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.__memory = OrderedDict()
+        self.__disk = OrderedDict()
+        self.__lock = threading.RLock()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            files = [entry for entry in os.scandir(directory) if entry.name.endswith(".pkl")]
+            for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+                self.__disk[entry.name[:-len(".pkl")]] = entry.path
+
+
+    @staticmethod
+    def key(stage, input_hash, config=None):
+        """
+        Builds the key of a stage result.
+        :param stage: Name of the stage.
+        :param input_hash: Hash of the stage input.
+        :param config: JSON serializable stage configuration, such as the model name.
+        :return: The cache key.
+        """
+        return content_hash(json.dumps([stage, config, input_hash], sort_keys=True, default=str))
+
+
+    def get_or_compute(self, stage, input_hash, compute, config=None):
+        """
+        Returns the cached result of a stage, computing and storing it on a miss.
+        :param stage: Name of the stage.
+        :param input_hash: Hash of the stage input.
+        :param compute: Function without arguments computing the result.
+        :param config: JSON serializable stage configuration.
+        :return: The stage result.
+        """
+        return self.get_or_compute_many(stage, [input_hash], lambda _: [compute()], config=config)[0]
+
+
+    def get_or_compute_many(self, stage, input_hashes, compute_many, config=None):
+        """
+        Returns the cached results of a stage for several inputs, computing the missing ones in one call.
+        :param stage: Name of the stage.
+        :param input_hashes: List of input hashes.
+        :param compute_many: Function mapping the positions of the missing inputs to their results.
+        :param config: JSON serializable stage configuration.
+        :return: List of stage results, one per input.
+        """
+        keys = [self.key(stage, input_hash, config) for input_hash in input_hashes]
+        results = [None] * len(keys)
+
+        missing = []
+        for position, key in enumerate(keys):
+            found, value = self.__lookup(key)
+            if found:
+                results[position] = value
+            else:
+                missing.append(position)
+
+        if missing:
+            for position, value in zip(missing, compute_many(missing)):
+                results[position] = value
+                self.__store(keys[position], value)
+
+        return results
+
+
+    def stats(self):
+        """
+        Reports the hit and miss counters of both tiers.
+        :return: Dictionary of cache statistics.
+        """
+        with self.__lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self.__memory),
+                "disk_entries": len(self.__disk),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+    def clear(self):
+        """
+        Removes every result from both tiers.
+        """
+        with self.__lock:
+            self.__memory.clear()
+            for path in self.__disk.values():
+                if os.path.exists(path):
+                    os.remove(path)
+            self.__disk.clear()
+
+
+    def __lookup(self, key):
+        """
+        Looks a key up in memory, then on disk, promoting disk results to memory.
+        :param key: The cache key.
+        :return: Tuple of whether the key was found and its value.
+        """
+        with self.__lock:
+            if key in self.__memory:
+                self.__memory.move_to_end(key)
+                self.hits += 1
+                CACHE_LOOKUPS.inc(cache="stage", result="hit")
+                return True, self.__memory[key]
+
+            path = self.__disk.get(key)
+            if path is not None:
+                try:
+                    with open(path, "rb") as file:
+                        value = pickle.load(file)
+                except (OSError, pickle.UnpicklingError, EOFError):
+                    del self.__disk[key]
+                else:
+                    self.__disk.move_to_end(key)
+                    self.disk_hits += 1
+                    CACHE_LOOKUPS.inc(cache="stage", result="disk_hit")
+                    self.__remember(key, value)
+                    return True, value
+
+            self.misses += 1
+            CACHE_LOOKUPS.inc(cache="stage", result="miss")
+            return False, None
+
+
+    def __store(self, key, value):
+        """
+        Stores a result in memory and, when enabled, on disk.
+        :param key: The cache key.
+        :param value: The stage result.
+        """
+        with self.__lock:
+            self.__remember(key, value)
+
+            if self.directory is None:
+                return
+
+            path = os.path.join(self.directory, f"{key}.pkl")
+            temporary_path = f"{path}.tmp"
+            with open(temporary_path, "wb") as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, path)
+
+            self.__disk[key] = path
+            self.__disk.move_to_end(key)
+            while len(self.__disk) > self.max_disk_entries:
+                _, evicted = self.__disk.popitem(last=False)
+                if os.path.exists(evicted):
+                    os.remove(evicted)
+
+
+    def __remember(self, key, value):
+        """
+        Stores a result in the memory tier, evicting the least recently used one when it is full.
+        :param key: The cache key.
+        :param value: The stage result.
+        """
+        self.__memory[key] = value
+        self.__memory.move_to_end(key)
+        while len(self.__memory) > self.max_entries:
+            self.__memory.popitem(last=False)
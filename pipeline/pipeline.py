@@ -0,0 +1,299 @@
+import time
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from parser import PDFExtractor, DOCXExtractor, TextExtractor, MAX_PAGES, MAX_CHARS
+from instrumentation import span, SamplingProfiler
+from .cache import content_hash, file_hash, component_config
+
+# Attributes of the extractors and of the preprocessor their cached results depend on.
+EXTRACTOR_SETTINGS = ("max_pages", "max_chars", "streaming")
+PREPROCESSOR_SETTINGS = ("spacy_model", "language")
+
+
+@dataclass
+class AnalysisResult:
+    """
+    The outputs of one resume and job description analysis.
+    """
+    resume_text: str
+    job_description_text: str
+    preprocessed_resume: str
+    preprocessed_job_description: str
+    resume_skills: list
+    job_description_skills: list
+    match_ratio: float
+    match_string: str
+    similarity: float
+    timings: dict = field(default_factory=dict)
+    profiler: SamplingProfiler = None
+
+
+@dataclass
+class Stage:
+    """
+    A pipeline stage: a function of the results of the stages it depends on.
+    """
+    name: str
+    function: object
+    dependencies: tuple = ()
+
+
+def run_stages(stages, executor):
+    """
+    Runs a dependency graph of stages, submitting every stage as soon as its dependencies finished.
+    :param stages: List of stages.
+    :param executor: The executor running the stages.
+    :return: Tuple of the dictionaries of stage results and stage durations in seconds.
+    """
+    def timed(stage, inputs):
+        start = time.perf_counter()
+        result = stage.function(*inputs)
+        return result, time.perf_counter() - start
+
+    pending = {stage.name: stage for stage in stages}
+    results, timings, running = {}, {}, {}
+
+    while pending or running:
+        for name, stage in list(pending.items()):
+            if all(dependency in results for dependency in stage.dependencies):
+                inputs = [results[dependency] for dependency in stage.dependencies]
+                running[executor.submit(timed, stage, inputs)] = name
+                del pending[name]
+
+        if not running:
+            raise ValueError(f"Stages {', '.join(pending)} depend on stages that do not exist.")
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future)
+            try:
+                results[name], timings[name] = future.result()
+            except BaseException:
+                for other in running:
+                    other.cancel()
+                raise
+
+    return results, timings
+
+
+class ResumeAnalysisPipeline:
+    """
+    Runs extraction, preprocessing, skill extraction, skill matching and similarity for a resume
+    and a job description. Independent stages run concurrently on a thread pool.
+    """
+    def __init__(self, preprocessor, skill_matcher, similarity, recommendation=None, extractors=None,
+                 cache=None, max_workers=4):
+        """
+        Initializes the pipeline components.
+        :param preprocessor: The Preprocessor instance.
+        :param skill_matcher: The SkillDynamicMatcher instance.
+        :param similarity: The similarity instance, stages use encode_many when it has one.
+        :param recommendation: Optional AiRecommendation instance.
+        :param extractors: Dictionary of file extension to extractor, PDF bounded to MAX_PAGES and MAX_CHARS, DOCX
+            and text when None.
+        :param cache: Optional StageCache memoizing the stage results.
+        :param max_workers: Number of threads running stages.
+        """
+        self.preprocessor = preprocessor
+        self.skill_matcher = skill_matcher
+        self.similarity = similarity
+        self.recommendation = recommendation
+        self.extractors = extractors or {
+            ".pdf": PDFExtractor(MAX_PAGES, MAX_CHARS), ".docx": DOCXExtractor(), ".txt": TextExtractor(),
+        }
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+
+
+    def extract(self, file):
+        """
+        Extracts the text of a file with the extractor of its extension.
+        :param file: The file path, or a file object with a name such as an uploaded file.
+        :return: The extracted text.
+        """
+        name = file if isinstance(file, str) else file.name
+        extension = name[name.rfind("."):].lower() if "." in name else ""
+        extractor = self.extractors.get(extension)
+        if extractor is None:
+            raise ValueError("Unsupported file type.")
+
+        source = file if isinstance(file, str) or hasattr(file, "read") else file.name
+
+        return self.__cached("extract", lambda: file_hash(source), lambda: extractor.extract(source),
+                             component_config(extractor, *EXTRACTOR_SETTINGS))
+
+
+    def preprocess(self, text):
+        """
+        Preprocesses a text.
+        :param text: The extracted text.
+        :return: The preprocessed text.
+        """
+        return self.__cached("preprocess", lambda: content_hash(text), lambda: self.preprocessor.preprocess(text),
+                             component_config(self.preprocessor, *PREPROCESSOR_SETTINGS))
+
+
+    def extract_skills(self, texts):
+        """
+        Extracts the skills of several texts in one batch.
+        :param texts: List of extracted texts.
+        :return: List of skill lists, one per text.
+        """
+        def compute(missing):
+            return self.skill_matcher.extract_many([texts[position] for position in missing])
+
+        return self.__cached_many("skills", texts, compute, getattr(self.skill_matcher, "model_path", None))
+
+
+    def embed(self, texts):
+        """
+        Encodes several preprocessed texts in one batch.
+        :param texts: List of preprocessed texts.
+        :return: List of embeddings, one per text.
+        """
+        def compute(missing):
+            return list(self.similarity.encode_many([texts[position] for position in missing]))
+
+        # The cache name tells apart the precisions and the long document settings of a model.
+        config = getattr(self.similarity, "cache_name", getattr(self.similarity, "model_name", None))
+        return self.__cached_many("embedding", texts, compute, config)
+
+
+    def score(self, resume, job_description):
+        """
+        Scores a preprocessed resume against a preprocessed job description.
+        :param resume: The preprocessed resume.
+        :param job_description: The preprocessed job description.
+        :return: The similarity score.
+        """
+        if not hasattr(self.similarity, "encode_many"):
+            return float(self.similarity.similarity(resume, job_description))
+
+        resume_embedding, job_embedding = np.asarray(self.embed([resume, job_description]), dtype=np.float32)
+        norm = np.linalg.norm(resume_embedding) * np.linalg.norm(job_embedding)
+        return float(resume_embedding @ job_embedding / norm) if norm else 0.0
+
+
+    def warm_up(self, text="Python developer with experience in machine learning and cloud services."):
+        """
+        Runs every model once on a short text, so the first request does not pay for the lazy loads,
+        the first allocations and the first compilation of the models.
+        :param text: The warm-up text.
+        """
+        with span("warm_up"):
+            preprocessed = self.preprocessor.preprocess(text)
+            list(self.skill_matcher.extract_many([text]))
+            if hasattr(self.similarity, "encode_many"):
+                self.similarity.encode_many([preprocessed])
+            else:
+                self.similarity.similarity(preprocessed, preprocessed)
+            if self.recommendation is not None:
+                self.recommendation.warm_up()
+
+
+    def analyze(self, resume_file, job_description_file, profile=False):
+        """
+        Analyzes a resume against a job description.
+        :param resume_file: The resume file path or file object.
+        :param job_description_file: The job description file path or file object.
+        :param profile: Sample the stacks of the running threads during the analysis. Concurrent analyses
+            show up in the same profile.
+        :return: The AnalysisResult, with the duration of every stage and the profiler when profiling.
+        """
+        stages = [
+            Stage("extract_resume", lambda: self.extract(resume_file)),
+            Stage("extract_job_description", lambda: self.extract(job_description_file)),
+            Stage("preprocess_resume", self.preprocess, ("extract_resume",)),
+            Stage("preprocess_job_description", self.preprocess, ("extract_job_description",)),
+            Stage("skills", lambda resume, job: self.extract_skills([resume, job]),
+                  ("extract_resume", "extract_job_description")),
+            Stage("match", lambda skills: self.skill_matcher.match(skills[1], skills[0]), ("skills",)),
+            Stage("similarity", self.score, ("preprocess_resume", "preprocess_job_description")),
+        ]
+
+        profiler = SamplingProfiler().start() if profile else None
+        start = time.perf_counter()
+        try:
+            with span("analyze"):
+                results, timings = run_stages(stages, self.executor)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+        timings["total"] = time.perf_counter() - start
+
+        match_ratio, match_string = results["match"]
+        resume_skills, job_description_skills = results["skills"]
+
+        return AnalysisResult(
+            resume_text=results["extract_resume"],
+            job_description_text=results["extract_job_description"],
+            preprocessed_resume=results["preprocess_resume"],
+            preprocessed_job_description=results["preprocess_job_description"],
+            resume_skills=resume_skills,
+            job_description_skills=job_description_skills,
+            match_ratio=match_ratio,
+            match_string=match_string,
+            similarity=results["similarity"],
+            timings=timings,
+            profiler=profiler,
+        )
+
+
+    def recommend(self, resume_file, job_description_file):
+        """
+        Generates resume improvement advice, reusing the cached extraction of both files.
+        :param resume_file: The resume file path or file object.
+        :param job_description_file: The job description file path or file object.
+        :return: The recommendation.
+        """
+        if self.recommendation is None:
+            raise RuntimeError("The pipeline was built without a recommendation model.")
+
+        resume_text, job_description_text = self.executor.map(self.extract, [resume_file, job_description_file])
+        return self.recommendation.recommend(resume_text, job_description_text)
+
+
+    def stream_recommend(self, resume_file, job_description_file):
+        """
+        Generates resume improvement advice, yielding the text as it is generated.
+        :param resume_file: The resume file path or file object.
+        :param job_description_file: The job description file path or file object.
+        :return: Generator of text pieces.
+        """
+        if self.recommendation is None:
+            raise RuntimeError("The pipeline was built without a recommendation model.")
+
+        resume_text, job_description_text = self.executor.map(self.extract, [resume_file, job_description_file])
+        yield from self.recommendation.stream_recommend(resume_text, job_description_text)
+
+
+    def __cached(self, stage, input_hash, compute, config=None):
+        """
+        Computes a stage result through the cache when there is one.
+        :param stage: Name of the stage.
+        :param input_hash: Function returning the hash of the stage input.
+        :param compute: Function without arguments computing the result.
+        :param config: JSON serializable stage configuration.
+        :return: The stage result.
+        """
+        if self.cache is None:
+            return compute()
+
+        return self.cache.get_or_compute(stage, input_hash(), compute, config=config)
+
+
+    def __cached_many(self, stage, texts, compute_many, config=None):
+        """
+        Computes a stage result for several texts through the cache when there is one.
+        :param stage: Name of the stage.
+        :param texts: List of stage inputs.
+        :param compute_many: Function mapping the positions of the missing inputs to their results.
+        :param config: JSON serializable stage configuration.
+        :return: List of stage results, one per text.
+        """
+        if self.cache is None:
+            return list(compute_many(list(range(len(texts)))))
+
+        hashes = [content_hash(text) for text in texts]
+        return self.cache.get_or_compute_many(stage, hashes, compute_many, config=config)
@@ -0,0 +1,384 @@
+"""
+Screens a directory or manifest of resumes against one or more job descriptions.
+
+    python -m pipeline.screen resumes/ -j job_description.txt -o results.jsonl --workers 4
+
+One JSON record per resume is appended to the output as soon as its batch finishes. The output doubles
+as the checkpoint: a restarted run skips every resume already recorded there, except the ones recorded
+with an error, which are screened again and get a newer record.
+"""
+import os
+import sys
+import json
+import argparse
+import multiprocessing
+import numpy as np
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+EXTENSIONS = (".pdf", ".docx", ".txt")
+
+# Components of a worker process, built once by _initialize_worker.
+_worker = {}
+
+
+def iter_resumes(source):
+    """
+    Lists the resumes of a directory, recursively, or of a manifest file.
+    A manifest holds one path per line, or JSON lines with an id and a path.
+    :param source: The directory or manifest path.
+    :return: Generator of (resume id, path) tuples.
+    """
+    if os.path.isdir(source):
+        for root, directories, files in os.walk(source):
+            directories.sort()
+            for name in sorted(files):
+                if name.lower().endswith(EXTENSIONS):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, source), path
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source) as manifest:
+        for line in manifest:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                path = entry["path"]
+                resume_id = entry.get("id", path)
+            else:
+                path = resume_id = line
+            yield resume_id, path if os.path.isabs(path) else os.path.join(base, path)
+
+
+def load_checkpoint(output):
+    """
+    Reads the resume ids already written to an output file, dropping a partially written last line.
+    Resumes whose record is an error are not finished, the next run screens them again and appends a new record.
+    :param output: The JSONL output path.
+    :return: Set of the finished resume ids.
+    """
+    done = set()
+    if not os.path.exists(output):
+        return done
+
+    valid_size = 0
+    with open(output, "rb") as file:
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+                resume_id = record["id"]
+            except (ValueError, KeyError):
+                break
+            if "error" in record:
+                done.discard(resume_id)
+            else:
+                done.add(resume_id)
+            valid_size += len(line)
+
+    if valid_size < os.path.getsize(output):
+        with open(output, "r+b") as file:
+            file.truncate(valid_size)
+
+    return done
+
+
+def _batched(iterable, batch_size):
+    """
+    Splits an iterable into lists of at most batch_size items.
+    :param iterable: The iterable to split.
+    :param batch_size: The maximum number of items per batch.
+    :return: Generator of lists.
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _build_similarity(name, model_name, precision="float32"):
+    """
+    Builds the similarity of a worker.
+    :param name: sentence-transformer, bert or tfidf.
+    :param model_name: Optional model name.
+    :param precision: Inference precision of the embedding models: float32, bfloat16 or int8.
+    :return: The similarity instance.
+    """
+    from similarity import SentenceTransformerSimilarity, BertSimilarity, TFIDFSimilarity
+
+    if name == "tfidf":
+        return TFIDFSimilarity()
+    if name == "bert":
+        return BertSimilarity(model_name, precision=precision) if model_name else BertSimilarity(precision=precision)
+    return SentenceTransformerSimilarity(model_name or "mixedbread-ai/mxbai-embed-large-v1", precision=precision)
+
+
+def _initialize_worker(job_descriptions, similarity_name, model_name, skill_list, threads, precision="float32"):
+    """
+    Builds the components of a worker process and processes the job descriptions once.
+    :param job_descriptions: List of job description paths.
+    :param similarity_name: sentence-transformer, bert or tfidf.
+    :param model_name: Optional model name of the similarity.
+    :param skill_list: Optional list of skills, the NER model is used when None.
+    :param threads: Optional number of torch threads of the worker.
+    :param precision: Inference precision of the embedding models.
+    """
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+    from parser import PDFExtractor, DOCXExtractor, TextExtractor, MAX_PAGES, MAX_CHARS
+    from processor import Preprocessor
+    from skill import SkillListMatcher, SkillDynamicMatcher
+
+    extractors = {".pdf": PDFExtractor(MAX_PAGES, MAX_CHARS), ".docx": DOCXExtractor(), ".txt": TextExtractor()}
+    preprocessor = Preprocessor()
+    similarity = _build_similarity(similarity_name, model_name, precision)
+
+    if skill_list is None:
+        matcher = SkillDynamicMatcher()
+        extract_skills = lambda texts: list(matcher.extract_many(texts))
+    else:
+        matcher = SkillListMatcher()
+        index = matcher.compile(skill_list)
+        extract_skills = lambda texts: [index.extract(text) for text in texts]
+
+    texts = [_extract(extractors, path) for path in job_descriptions]
+    preprocessed = list(preprocessor.preprocess_many(texts))
+
+    _worker.update(
+        extractors=extractors,
+        preprocessor=preprocessor,
+        similarity=similarity,
+        matcher=matcher,
+        extract_skills=extract_skills,
+        job_names=[os.path.basename(path) for path in job_descriptions],
+        job_preprocessed=preprocessed,
+        job_skills=extract_skills(texts),
+        job_embeddings=None,
+    )
+
+    if hasattr(similarity, "encode_many"):
+        embeddings = np.asarray(similarity.encode_many(preprocessed), dtype=np.float32)
+        _worker["job_embeddings"] = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+
+def _extract(extractors, path):
+    """
+    Extracts the text of a file with the extractor of its extension.
+    :param extractors: Dictionary of file extension to extractor.
+    :param path: The file path.
+    :return: The extracted text.
+    """
+    extractor = extractors.get(os.path.splitext(path)[1].lower())
+    if extractor is None:
+        raise ValueError("Unsupported file type.")
+    return extractor.extract(path)
+
+
+def _screen_batch(batch):
+    """
+    Screens a batch of resumes against every job description, run in a worker process.
+    :param batch: List of (resume id, path) tuples.
+    :return: List of JSON serializable records.
+    """
+    records, texts = [], []
+    for resume_id, path in batch:
+        try:
+            texts.append(_extract(_worker["extractors"], path))
+            records.append({"id": resume_id, "path": path})
+        except Exception as error:
+            records.append({"id": resume_id, "path": path, "error": f"{type(error).__name__}: {error}"})
+
+    valid = [record for record in records if "error" not in record]
+    if not valid:
+        return records
+
+    try:
+        skills, scores = _analyze(texts)
+    except Exception as error:
+        if len(valid) == 1:
+            valid[0]["error"] = f"{type(error).__name__}: {error}"
+            return records
+
+        # One failing resume fails the whole batch, so the resumes are analyzed alone and only it gets the error.
+        for record, text in zip(valid, texts):
+            try:
+                skills, scores = _analyze([text])
+            except Exception as error:
+                record["error"] = f"{type(error).__name__}: {error}"
+            else:
+                _fill(record, skills[0], scores[:, 0])
+        return records
+
+    for position, record in enumerate(valid):
+        _fill(record, skills[position], scores[:, position])
+
+    return records
+
+
+def _analyze(texts):
+    """
+    Preprocesses resume texts, extracts their skills and scores them against every job description.
+    :param texts: List of extracted resume texts.
+    :return: Tuple of the skill lists and the 2-D array of scores, one row per job description.
+    """
+    preprocessed = list(_worker["preprocessor"].preprocess_many(texts))
+    skills = _worker["extract_skills"](texts)
+    return skills, np.asarray(_score(preprocessed))
+
+
+def _fill(record, skills, scores):
+    """
+    Adds the skills and the job description results of a resume to its record.
+    :param record: The resume record.
+    :param skills: The skills of the resume.
+    :param scores: Array of the resume scores, one per job description.
+    """
+    record["skills"] = sorted(skills)
+    record["results"] = []
+    for job, job_name in enumerate(_worker["job_names"]):
+        job_skills = _worker["job_skills"][job]
+        matched = sorted(set(job_skills) & set(skills))
+        record["results"].append({
+            "job_description": job_name,
+            "similarity": float(scores[job]),
+            "match_ratio": len(matched) / len(job_skills) if job_skills else None,
+            "match": f"{len(matched)}/{len(job_skills)}",
+            "matched_skills": matched,
+        })
+
+
+def _score(preprocessed):
+    """
+    Scores preprocessed resumes against every job description.
+    :param preprocessed: List of preprocessed resumes.
+    :return: 2-D array of scores, one row per job description.
+    """
+    similarity = _worker["similarity"]
+    if _worker["job_embeddings"] is None:
+        return np.stack([
+            similarity.batch_similarity(job, preprocessed)[0] for job in _worker["job_preprocessed"]
+        ])
+
+    embeddings = np.asarray(similarity.encode_many(preprocessed), dtype=np.float32)
+    embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+    return _worker["job_embeddings"] @ embeddings.T
+
+
+def screen(resumes, job_descriptions, output, workers=1, batch_size=16, max_in_flight=None,
+           similarity="sentence-transformer", model_name=None, skill_list=None, threads=None, precision="float32"):
+    """
+    Screens resumes on a process pool, appending one JSON record per resume to the output.
+    At most max_in_flight batches are queued, so memory stays bounded whatever the number of resumes.
+    :param resumes: The resume directory or manifest path.
+    :param job_descriptions: List of job description paths.
+    :param output: The JSONL output path, also used as the checkpoint.
+    :param workers: Number of worker processes.
+    :param batch_size: Number of resumes per task.
+    :param max_in_flight: Number of batches queued at once, twice the workers when None.
+    :param similarity: sentence-transformer, bert or tfidf.
+    :param model_name: Optional model name of the similarity.
+    :param skill_list: Optional list of skills, the NER model is used when None.
+    :param threads: Number of torch threads per worker, the CPU count divided by the workers when None.
+    :param precision: Inference precision of the embedding models: float32, bfloat16 or int8.
+    :return: Number of resumes screened by this run.
+    """
+    done = load_checkpoint(output)
+    pending = ((resume_id, path) for resume_id, path in iter_resumes(resumes) if resume_id not in done)
+    batches = _batched(pending, batch_size)
+    max_in_flight = max_in_flight or 2 * workers
+    # Every torch worker would otherwise run one thread per core, oversubscribing the CPU workers times over.
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_initialize_worker,
+        initargs=(job_descriptions, similarity, model_name, skill_list, threads, precision),
+    )
+
+    screened = 0
+    with executor, open(output, "a") as file:
+        running = set()
+        for batch in batches:
+            running.add(executor.submit(_screen_batch, batch))
+            if len(running) >= max_in_flight:
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                screened += _write(file, finished)
+                print(f"screened {len(done) + screened} resumes", file=sys.stderr)
+
+        finished, _ = wait(running)
+        screened += _write(file, finished)
+
+    print(f"screened {len(done) + screened} resumes", file=sys.stderr)
+    return screened
+
+
+def _write(file, futures):
+    """
+    Appends the records of finished batches and flushes them to disk.
+    :param file: The open output file.
+    :param futures: Finished futures of _screen_batch.
+    :return: Number of records written.
+    """
+    count = 0
+    for future in futures:
+        for record in future.result():
+            file.write(json.dumps(record) + "\n")
+            count += 1
+
+    file.flush()
+    os.fsync(file.fileno())
+    return count
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Screen resumes against job descriptions.")
+    parser.add_argument("resumes", help="Directory of resumes or manifest file with one path per line.")
+    parser.add_argument("-j", "--job-description", action="append", required=True, dest="job_descriptions",
+                        help="Job description file, repeat the option for several.")
+    parser.add_argument("-o", "--output", required=True, help="JSONL output file, also used to resume a run.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-in-flight", type=int, default=None)
+    parser.add_argument("--similarity", choices=["sentence-transformer", "bert", "tfidf"],
+                        default="sentence-transformer")
+    parser.add_argument("--model", default=None, help="Model name of the similarity.")
+    parser.add_argument("--skill-list", default=None,
+                        help="File with one skill per line, matched with SkillListMatcher instead of the NER model.")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Torch threads per worker, the CPU count divided by the workers by default.")
+    parser.add_argument("--precision", choices=["float32", "bfloat16", "int8"], default="float32",
+                        help="Inference precision of the embedding models.")
+    args = parser.parse_args(arguments)
+
+    skill_list = None
+    if args.skill_list:
+        with open(args.skill_list) as file:
+            skill_list = [line.strip() for line in file if line.strip()]
+
+    screen(
+        args.resumes,
+        args.job_descriptions,
+        args.output,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        max_in_flight=args.max_in_flight,
+        similarity=args.similarity,
+        model_name=args.model,
+        skill_list=skill_list,
+        threads=args.threads,
+        precision=args.precision,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
-from .preprocessor import Preprocessor
+from resources.lazy import lazy_exports
 
-__all__ = ["Preprocessor"]
\ No newline at end of file
+_EXPORTS = {"Preprocessor": ".preprocessor"}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
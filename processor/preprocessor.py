@@ -1,43 +1,111 @@
-import nltk
-import spacy
 import re
+import warnings
 from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
+from resources import load_spacy, lease_spacy, load_stopwords, LEMMATIZER_EXCLUDE
+from instrumentation import timed, TOKENS
+
+# Pipeline components the rule based lemmatizer depends on.
+LEMMA_PIPES = ("tok2vec", "tagger", "attribute_ruler", "lemmatizer")
+
+
+def _disabled_pipes(nlp):
+    """
+    Lists the loaded components the lemmatizer does not need.
+    :param nlp: The spaCy pipeline.
+    :return: List of component names.
+    """
+    return [name for name in nlp.pipe_names if name not in LEMMA_PIPES]
+
 
 class Preprocessor:
     """
     This class provides methods to perform text preprocessing including tokenization,
      stopword removal, lemmatization, and basic text cleaning.
     """
-    def __init__(self, nltk_resource="all", spacy_model="en_core_web_sm", language="english"):
+    def __init__(self, nltk_resource=None, spacy_model="en_core_web_sm", language="english", pool=None):
         """
-        The constructor for download the nltk resource and spacy model.
-        :param nltk_resource: nltk resource
+        The constructor stores the resource names, the models are shared and loaded on first use.
+        Run `python -m resources` once to download them.
+        :param nltk_resource: deprecated and ignored, the NLTK data is downloaded by `python -m resources`
         :param spacy_model: spacy model
         :param language: the main language
+        :param pool: the ModelPool holding the spaCy model, the process-wide pool when None
+        """
+        if nltk_resource is not None:
+            warnings.warn(
+                "Preprocessor no longer downloads NLTK data, nltk_resource is ignored. Run python -m resources instead.",
+                DeprecationWarning, stacklevel=2,
+            )
+
+        self.spacy_model = spacy_model
+        self.language = language
+        self.pool = pool
+
+
+    @property
+    def nlp(self):
+        """
+        The shared spaCy pipeline, without the components the lemmatizer does not need.
         """
-        try:
-            if nltk_resource == "all":
-                nltk.data.find(f"corpora")
-            else:
-                nltk.data.find(f"corpora/{nltk_resource}")
+        return load_spacy(self.spacy_model, exclude=LEMMATIZER_EXCLUDE, pool=self.pool)
 
-        except LookupError:
-            nltk.download(nltk_resource)
 
-        if not spacy.util.is_package(spacy_model):
-            spacy.cli.download(spacy_model)
+    @property
+    def stop_word(self):
+        """
+        The shared stop word set of the language.
+        """
+        return load_stopwords(self.language)
 
-        self.nlp = spacy.load(spacy_model)
-        self.stop_word = set(stopwords.words(language))
+
+    @property
+    def disabled_pipes(self):
+        """
+        The loaded components the lemmatizer does not need.
+        """
+        return _disabled_pipes(self.nlp)
 
 
+    @timed("preprocess", documents=True)
     def preprocess(self, text):
         """
         This method performs text cleaning, tokenization, and lemmatization.
         :param text: the text to be preprocessed
         :return: the preprocessed text
         """
+        with lease_spacy(self.spacy_model, LEMMATIZER_EXCLUDE, self.pool) as nlp:
+            doc = nlp(self.__clean(text), disable=_disabled_pipes(nlp))
+        tokens = [token.lemma_ for token in doc]
+        TOKENS.inc(len(doc), stage="preprocess")
+
+        return " ".join(tokens)
+
+
+    @timed("preprocess_many", documents=True)
+    def preprocess_many(self, texts, batch_size=64, n_process=1):
+        """
+        This method preprocesses a stream of texts, lemmatizing them in batches with nlp.pipe.
+        The output is identical to calling preprocess on each text.
+        :param texts: list or iterator of texts to be preprocessed
+        :param batch_size: number of texts per spaCy batch
+        :param n_process: number of processes used by spaCy
+        :return: generator of the preprocessed texts, in input order
+        """
+        cleaned = (self.__clean(text) for text in texts)
+        with lease_spacy(self.spacy_model, LEMMATIZER_EXCLUDE, self.pool) as nlp:
+            docs = nlp.pipe(cleaned, batch_size=batch_size, n_process=n_process, disable=_disabled_pipes(nlp))
+
+            for doc in docs:
+                TOKENS.inc(len(doc), stage="preprocess_many")
+                yield " ".join(token.lemma_ for token in doc)
+
+
+    def __clean(self, text):
+        """
+        This method performs text cleaning, tokenization, and stopword removal.
+        :param text: the text to be cleaned
+        :return: the cleaned tokens joined by spaces
+        """
         text = re.sub(r'(\w+):', r'\1:\n', text)
         text = re.sub(r'([a-z])([A-Z])', r'\1 \n\2', text)
         text = re.sub(r'\s+', ' ', text)
@@ -47,13 +115,4 @@ class Preprocessor:
         tokens = word_tokenize(text)
         tokens = [token for token in tokens if token not in self.stop_word]
 
-        doc = self.nlp(" ".join(tokens))
-        tokens = [token.lemma_ for token in doc]
-
         return " ".join(tokens)
-
-
-
-
-
-
@@ -1,3 +1,6 @@
-from .ai_recommendation import AiRecommendation
+from resources.lazy import lazy_exports
 
-__all__ = ["AiRecommendation"]
\ No newline at end of file
+_EXPORTS = {"AiRecommendation": ".ai_recommendation"}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -1,16 +1,141 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
+import re
+import copy
+import torch
+from queue import Empty
+from threading import Thread, Lock, Event
+from contextlib import contextmanager
+from transformers import (
+    AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer, DynamicCache, StoppingCriteria, StoppingCriteriaList
+)
+from resources.precision import apply_precision, bfloat16_supported
+from resources.pool import POOL
+from instrumentation import span, timed, DOCUMENTS, TOKENS
+
+# Blank lines, and line breaks before a short heading line, start a new section of a document.
+_SECTION_BREAK = re.compile(r"\n\s*\n|\n(?=[A-Z][\w &/+-]{0,40}:?[ \t]*\n)")
+
+# Seconds the streaming consumer waits for a token before checking that the generation thread is still alive.
+_STREAM_POLL_SECONDS = 1.0
+
+
+class _Cancellation(StoppingCriteria):
+    """
+    Stops a generation once its event is set, such as when the consumer of a stream goes away.
+    """
+    def __init__(self, event):
+        """
+        Initializes the criteria.
+        :param event: The threading.Event cancelling the generation.
+        """
+        self.event = event
+
+
+    def __call__(self, input_ids, scores, **kwargs):
+        """
+        Checked after every generation step.
+        :param input_ids: The generated token ids.
+        :param scores: The token scores.
+        :return: Boolean tensor, one per sequence, true once cancelled.
+        """
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+def _water_fill(lengths, budget):
+    """
+    Shares a budget between items, giving short items all they need and splitting the rest evenly.
+    :param lengths: List of item lengths.
+    :param budget: The total budget.
+    :return: List of allocations, one per item.
+    """
+    allocations = [0] * len(lengths)
+    remaining = max(budget, 0)
+
+    order = sorted(range(len(lengths)), key=lambda position: lengths[position])
+    for rank, position in enumerate(order):
+        share = remaining // (len(order) - rank)
+        allocations[position] = min(lengths[position], share)
+        remaining -= allocations[position]
+
+    return allocations
+
 
 class AiRecommendation:
     """
     Generates resume improvement suggestions based on a job description using a causal language model.
     """
-    def __init__(self, model_name="HuggingFaceTB/SmolLM2-1.7B-Instruct"):
+    def __init__(self, model_name="HuggingFaceTB/SmolLM2-1.7B-Instruct", max_prompt_tokens=2048, max_new_tokens=300,
+                 precision="float32", draft_model_name=None, num_assistant_tokens=5, pool=None):
         """
-        Initializes the tokenizer and model with the specified model name.
+        Initializes the tokenizer, the models are loaded into the pool on first use.
         :param model_name: The name of the model to use.
+        :param max_prompt_tokens: Token budget of the prompt, the resume and job description are trimmed to fit.
+        :param max_new_tokens: Number of tokens generated at most.
+        :param precision: Inference precision on CPU: float32, bfloat16 or int8.
+        :param draft_model_name: Optional smaller model of the same family, e.g. HuggingFaceTB/SmolLM2-135M-Instruct,
+            proposing tokens that the model verifies in one forward pass. The sampling distribution is unchanged.
+        :param num_assistant_tokens: Number of tokens the draft model proposes per verification.
+        :param pool: The ModelPool holding the models, the process-wide pool when None. An idle model is
+            unloaded by the pool and loaded again by the next generation.
         """
+        self.model_name = model_name
+        self.draft_model_name = draft_model_name
+        self.num_assistant_tokens = num_assistant_tokens
+        self.precision = precision
+        self.pool = pool or POOL
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(model_name)
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_new_tokens = max_new_tokens
+
+        self.__stats = {"generations": 0, "tokens": 0, "target_passes": 0, "draft_passes": 0}
+        self.__stats_lock = Lock()
+        self.__assisted_running = 0
+
+        self.__model_key = f"causal-lm:{model_name}#precision={precision}"
+        self.__draft_key = None
+        if draft_model_name is not None:
+            # The hooked model counts the passes of this instance, so it is not shared with other instances.
+            self.__model_key = f"{self.__model_key}#assisted={id(self)}"
+            self.__draft_key = f"causal-lm:{draft_model_name}#precision={precision}#assistant={id(self)}"
+
+
+    @property
+    def model(self):
+        """
+        The model, loaded into the pool when it is not resident.
+        """
+        return self.pool.get(self.__model_key, self.__load_target)
+
+
+    @property
+    def draft_model(self):
+        """
+        The draft model, None without one.
+        """
+        if self.__draft_key is None:
+            return None
+
+        return self.pool.get(self.__draft_key, self.__load_draft)
+
+
+    def build_prompt(self, resume, job_description):
+        """
+        Builds the prompt, trimming the resume and job description to the prompt token budget.
+        Every section keeps its beginning, short sections are kept whole and long ones share the rest of the budget.
+        :param resume: The user resume
+        :param job_description: The job description
+        :return: The prompt
+        """
+        template_tokens = self.__count_tokens(self.__format_prompt("", ""))
+        budget = self.max_prompt_tokens - template_tokens
+
+        resume_tokens = self.__count_tokens(resume)
+        job_description_tokens = self.__count_tokens(job_description)
+        if resume_tokens + job_description_tokens > budget:
+            resume_budget, job_description_budget = _water_fill([resume_tokens, job_description_tokens], budget)
+            resume = self.__truncate_sections(resume, resume_budget)
+            job_description = self.__truncate_sections(job_description, job_description_budget)
+
+        return self.__format_prompt(resume, job_description)
 
 
     def recommend(self, resume, job_description):
@@ -20,7 +145,285 @@ class AiRecommendation:
         :param job_description: The job description
         :return: The recommendation
         """
-        prompt = f"""
+        prompt = self.build_prompt(resume, job_description)
+        inputs = self.tokenizer(prompt, return_tensors="pt")
+
+        outputs = self.__generate(inputs)
+
+        generated_tokens = outputs[0][inputs["input_ids"].shape[1]:]
+        answer_only = self.tokenizer.decode(generated_tokens, skip_special_tokens=True).strip()
+
+        return answer_only
+
+
+    def stream_recommend(self, resume, job_description):
+        """
+        Generates targeted resume improvement advice, yielding the text as the tokens are generated.
+        :param resume: The user resume
+        :param job_description: The job description
+        :return: Generator of text pieces
+        """
+        prompt = self.build_prompt(resume, job_description)
+        inputs = self.tokenizer(prompt, return_tensors="pt")
+        streamer = TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=_STREAM_POLL_SECONDS
+        )
+        errors = []
+        cancelled = Event()
+        stopping_criteria = StoppingCriteriaList([_Cancellation(cancelled)])
+
+        def generate():
+            # A failed generation never ends the streamer itself, so it is ended here and the error handed over.
+            try:
+                self.__generate(inputs, streamer=streamer, stopping_criteria=stopping_criteria)
+            except BaseException as error:
+                errors.append(error)
+                streamer.end()
+
+        thread = Thread(target=generate)
+        thread.start()
+
+        try:
+            while True:
+                try:
+                    piece = next(streamer)
+                except StopIteration:
+                    break
+                except Empty:
+                    if thread.is_alive():
+                        continue
+                    break
+                yield piece
+        finally:
+            # A consumer closing the stream early stops the generation at the next token instead of waiting for it.
+            cancelled.set()
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+
+    def recommend_many(self, resumes, job_description, batch_size=4):
+        """
+        Generates advice for several resumes against one job description.
+        The instruction and job description come first in the prompt, so their key/value cache is computed once
+        and shared by every resume. Each batch appends its resumes after the shared prefix, left padded.
+        Assisted generation only supports one sequence at a time, so the draft model is not used here.
+        :param resumes: List of user resumes
+        :param job_description: The job description
+        :param batch_size: Number of resumes generated at once
+        :return: List of recommendations, one per resume
+        """
+        if not resumes:
+            return []
+
+        budget = self.max_prompt_tokens - self.__count_tokens("".join(self.__format_batch_prompt("", "")))
+        if self.__count_tokens(job_description) > budget // 2:
+            job_description = self.__truncate_sections(job_description, budget // 2)
+        resume_budget = budget - self.__count_tokens(job_description)
+
+        with self.pool.lease(self.__model_key, self.__load_target) as model:
+            prefix, _ = self.__format_batch_prompt(job_description, "")
+            prefix_ids = self.tokenizer(prefix, return_tensors="pt").input_ids.to(model.device)
+
+            with torch.no_grad():
+                prefix_cache = model(prefix_ids, past_key_values=DynamicCache(), use_cache=True).past_key_values
+
+            pad_token_id = self.tokenizer.pad_token_id
+            if pad_token_id is None:
+                pad_token_id = self.tokenizer.eos_token_id
+
+            recommendations = []
+            for start in range(0, len(resumes), batch_size):
+                suffixes = []
+                for resume in resumes[start:start + batch_size]:
+                    if self.__count_tokens(resume) > resume_budget:
+                        resume = self.__truncate_sections(resume, resume_budget)
+                    _, suffix = self.__format_batch_prompt(job_description, resume)
+                    suffixes.append(self.tokenizer.encode(suffix, add_special_tokens=False))
+
+                length = max(len(ids) for ids in suffixes)
+                suffix_ids = torch.tensor([[pad_token_id] * (length - len(ids)) + ids for ids in suffixes])
+                suffix_mask = torch.tensor([[0] * (length - len(ids)) + [1] * len(ids) for ids in suffixes])
+
+                count = len(suffixes)
+                input_ids = torch.cat([prefix_ids.cpu().repeat(count, 1), suffix_ids], dim=1).to(model.device)
+                attention_mask = torch.cat(
+                    [torch.ones(count, prefix_ids.shape[1], dtype=suffix_mask.dtype), suffix_mask], dim=1
+                ).to(model.device)
+
+                cache = copy.deepcopy(prefix_cache)
+                cache.batch_repeat_interleave(count)
+
+                with span("generate_batch"):
+                    outputs = model.generate(
+                        input_ids=input_ids,
+                        attention_mask=attention_mask,
+                        past_key_values=cache,
+                        pad_token_id=pad_token_id,
+                        **self.__generation_kwargs(),
+                    )
+
+                generated_tokens = outputs[:, input_ids.shape[1]:]
+                DOCUMENTS.inc(count, stage="generate_batch")
+                TOKENS.inc(int((generated_tokens != pad_token_id).sum()), stage="generate_batch")
+                recommendations.extend(
+                    text.strip() for text in self.tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
+                )
+
+        return recommendations
+
+
+    def warm_up(self, max_new_tokens=4):
+        """
+        Generates a few tokens without the draft model, so the first recommendation does not pay for the
+        first allocations. The warm-up is left out of the acceptance stats.
+        :param max_new_tokens: Number of tokens generated.
+        """
+        inputs = self.tokenizer(self.__format_prompt("Python", "Python"), return_tensors="pt")
+        kwargs = {**self.__generation_kwargs(), "max_new_tokens": max_new_tokens}
+
+        with self.pool.lease(self.__model_key, self.__load_target) as model, torch.no_grad():
+            model.generate(**inputs.to(model.device), **kwargs)
+
+
+    def acceptance_stats(self):
+        """
+        Reports how well the draft model predicts the model, over every assisted generation so far.
+        Each verification pass accepts some draft tokens and adds one token of its own, so the accepted
+        draft tokens are the generated tokens minus the model passes.
+        :return: Dictionary of the counts, the acceptance rate and the tokens generated per model pass.
+        """
+        with self.__stats_lock:
+            stats = dict(self.__stats)
+
+        accepted = max(stats["tokens"] - stats["target_passes"], 0)
+        stats["acceptance_rate"] = accepted / stats["draft_passes"] if stats["draft_passes"] else None
+        stats["tokens_per_target_pass"] = stats["tokens"] / stats["target_passes"] if stats["target_passes"] else None
+
+        return stats
+
+
+    @timed("generate", documents=True)
+    def __generate(self, inputs, **kwargs):
+        """
+        Generates from a single prompt, assisted by the draft model when there is one.
+        Both models are leased from the pool for the whole generation.
+        :param inputs: The tokenized prompt.
+        :param kwargs: Extra generate arguments.
+        :return: The generated token ids, prompt included.
+        """
+        if self.__draft_key is None:
+            with self.pool.lease(self.__model_key, self.__load_target) as model:
+                outputs = model.generate(**inputs.to(model.device), **self.__generation_kwargs(), **kwargs)
+            TOKENS.inc(outputs.shape[1] - inputs["input_ids"].shape[1], stage="generate")
+            return outputs
+
+        with self.pool.lease(self.__model_key, self.__load_target) as model, \
+                self.pool.lease(self.__draft_key, self.__load_draft) as draft_model:
+            with self.__stats_lock:
+                self.__assisted_running += 1
+            try:
+                outputs = model.generate(
+                    **inputs.to(model.device), **self.__generation_kwargs(), assistant_model=draft_model, **kwargs
+                )
+            finally:
+                with self.__stats_lock:
+                    self.__assisted_running -= 1
+
+        generated = outputs.shape[1] - inputs["input_ids"].shape[1]
+        TOKENS.inc(generated, stage="generate")
+        self.__count("generations")
+        self.__count("tokens", generated)
+
+        return outputs
+
+
+    def __count(self, name, value=1):
+        """
+        Adds to a generation counter.
+        :param name: The counter name.
+        :param value: The amount added.
+        """
+        with self.__stats_lock:
+            self.__stats[name] += value
+
+
+    def __count_target_pass(self, *_):
+        """
+        Forward hook of the model counting its passes while an assisted generation runs.
+        The passes of unassisted generations, such as recommend_many, are left out of the stats.
+        """
+        with self.__stats_lock:
+            if self.__assisted_running:
+                self.__stats["target_passes"] += 1
+
+
+    def __load_target(self):
+        """
+        Loads the model, hooked to count its passes when there is a draft model.
+        :return: The model.
+        """
+        model = self.__load_model(self.model_name, self.precision)
+        if self.__draft_key is not None:
+            model.register_forward_hook(self.__count_target_pass)
+
+        return model
+
+
+    def __load_draft(self):
+        """
+        Loads the draft model, hooked to count its passes.
+        :return: The draft model.
+        """
+        draft_model = self.__load_model(self.draft_model_name, self.precision)
+        draft_model.generation_config.num_assistant_tokens = self.num_assistant_tokens
+        draft_model.generation_config.num_assistant_tokens_schedule = "constant"
+
+        # Forward passes of assisted generations are counted, the acceptance rate is derived from the counts.
+        draft_model.register_forward_hook(lambda *_: self.__count("draft_passes"))
+
+        return draft_model
+
+
+    @staticmethod
+    def __load_model(model_name, precision):
+        """
+        Loads a causal language model at an inference precision.
+        bfloat16 weights are loaded directly, which avoids holding a float32 copy of the model in memory.
+        :param model_name: The name of the model to load.
+        :param precision: float32, bfloat16 or int8.
+        :return: The model.
+        """
+        if precision == "bfloat16" and bfloat16_supported():
+            return AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.bfloat16)
+
+        return apply_precision(AutoModelForCausalLM.from_pretrained(model_name), precision)
+
+
+    def __generation_kwargs(self):
+        """
+        The sampling settings of every generation.
+        :return: Dictionary of generate arguments.
+        """
+        return {
+            "max_new_tokens": self.max_new_tokens,
+            "do_sample": True,
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "eos_token_id": self.tokenizer.eos_token_id,
+        }
+
+
+    @staticmethod
+    def __format_prompt(resume, job_description):
+        """
+        Fills the prompt template.
+        :param resume: The user resume
+        :param job_description: The job description
+        :return: The prompt
+        """
+        return f"""
         Given the following resume and job description, provide specific, actionable recommendations to improve the resume so it better matches the job description.
 
         Resume:
@@ -30,18 +433,55 @@ class AiRecommendation:
         {job_description}
         """
 
-        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
 
-        outputs = self.model.generate(
-            **inputs,
-            max_new_tokens=300,
-            do_sample=True,
-            temperature=0.7,
-            top_p=0.9,
-            eos_token_id=self.tokenizer.eos_token_id,
-        )
+    @staticmethod
+    def __format_batch_prompt(job_description, resume):
+        """
+        Fills the prompt template of batched generation, with the job description before the resume.
+        :param job_description: The job description
+        :param resume: The user resume
+        :return: Tuple of the prefix shared by every resume and the resume specific suffix
+        """
+        prefix = f"""
+        Given the following job description and resume, provide specific, actionable recommendations to improve the resume so it better matches the job description.
+
+        Job Description:
+        {job_description}
+
+        Resume:
+        """
+        suffix = f"""{resume}
+        """
+        return prefix, suffix
+
+
+    def __count_tokens(self, text):
+        """
+        Counts the tokens of a text.
+        :param text: The text
+        :return: Number of tokens
+        """
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+
+    def __truncate_sections(self, text, budget):
+        """
+        Trims a document to a token budget section by section, keeping the beginning of each section.
+        :param text: The document
+        :param budget: The token budget
+        :return: The trimmed document
+        """
+        sections = [section.strip() for section in _SECTION_BREAK.split(text) if section.strip()]
+        token_ids = [self.tokenizer.encode(section, add_special_tokens=False) for section in sections]
+
+        # Separators and truncation marks cost about two tokens per section.
+        allocations = _water_fill([len(ids) for ids in token_ids], budget - 2 * len(sections))
 
-        generated_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        answer_only = generated_text[len(prompt):].strip()
+        kept = []
+        for section, ids, allocation in zip(sections, token_ids, allocations):
+            if allocation >= len(ids):
+                kept.append(section)
+            elif allocation > 0:
+                kept.append(self.tokenizer.decode(ids[:allocation], skip_special_tokens=True) + " ...")
 
-        return answer_only
\ No newline at end of file
+        return "\n\n".join(kept)
@@ -0,0 +1,17 @@
+from .lazy import lazy_exports
+
+_EXPORTS = {
+    "load_spacy": ".registry",
+    "lease_spacy": ".registry",
+    "load_ner_model": ".registry",
+    "lease_ner_model": ".registry",
+    "load_stopwords": ".registry",
+    "download": ".registry",
+    "LEMMATIZER_EXCLUDE": ".registry",
+    "BackgroundLoader": ".warmup",
+    "ModelPool": ".pool",
+    "POOL": ".pool",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,3 @@
+from .registry import download
+
+download()
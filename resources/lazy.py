@@ -0,0 +1,27 @@
+import sys
+import importlib
+
+
+def lazy_exports(package, exports):
+    """
+    Builds the module __getattr__ and __dir__ of a package whose public names are imported on first access (PEP 562),
+    so importing the package does not import the heavy libraries of its submodules.
+    :param package: The package __name__.
+    :param exports: Dictionary of public name to the relative name of the module defining it.
+    :return: Tuple of the __getattr__ and __dir__ functions.
+    """
+    namespace = sys.modules[package].__dict__
+
+    def __getattr__(name):
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+
+        value = getattr(importlib.import_module(module, package), name)
+        namespace[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(namespace) | set(exports))
+
+    return __getattr__, __dir__
@@ -0,0 +1,370 @@
+import os
+import gc
+import time
+import ctypes
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from instrumentation import REGISTRY, current_rss
+
+MODEL_EVENTS = REGISTRY.counter(
+    "resume_analyzer_model_events_total", "Model loads and unloads by model and event.", ("model", "event")
+)
+MODEL_RESIDENT_BYTES = REGISTRY.gauge(
+    "resume_analyzer_model_resident_bytes", "Estimated resident memory of each loaded model.", ("model",)
+)
+MODEL_LOAD_SECONDS = REGISTRY.histogram(
+    "resume_analyzer_model_load_seconds", "Time spent loading each model.", ("model",)
+)
+
+_SIZE_UNITS = {"": 1, "K": 2 ** 10, "M": 2 ** 20, "G": 2 ** 30, "T": 2 ** 40}
+
+
+def parse_size(text):
+    """
+    Parses a memory size such as 6G, 512M or 1073741824.
+    :param text: The size, with an optional K, M, G or T suffix, B and iB suffixes are accepted too.
+    :return: The size in bytes, None for None or an empty text.
+    """
+    if not text:
+        return None
+
+    value = str(text).strip().upper().removesuffix("B").removesuffix("I")
+    unit = value[-1] if value[-1] in _SIZE_UNITS else ""
+    return int(float(value[:len(value) - len(unit)]) * _SIZE_UNITS[unit])
+
+
+def model_memory(model):
+    """
+    Adds up the bytes of the tensors of a PyTorch model, parameters and buffers included.
+    :param model: The model, anything without a state_dict gives 0.
+    :return: The size in bytes.
+    """
+    state_dict = getattr(model, "state_dict", None)
+    if not callable(state_dict):
+        return 0
+
+    try:
+        tensors = state_dict().values()
+    except Exception:
+        return 0
+
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors if hasattr(tensor, "element_size"))
+
+
+def _release_memory():
+    """
+    Collects the unreachable objects and asks glibc to return the freed heap pages to the system.
+    """
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class _Entry:
+    """
+    A loaded model with its lease count and last use.
+    """
+    __slots__ = ("model", "size", "references", "last_used")
+
+    def __init__(self, model, size):
+        self.model = model
+        self.size = size
+        self.references = 0
+        self.last_used = time.monotonic()
+
+
+class ModelPool:
+    """
+    Keeps the models of a process within a memory budget.
+    Models are loaded on first use and leased while they run. Once no lease holds a model, it can be
+    unloaded: the least recently used ones when a load would exceed the budget, and any model left idle
+    for idle_timeout seconds. An unloaded model is loaded again on its next use.
+    """
+    def __init__(self, budget=None, idle_timeout=None, max_events=256):
+        """
+        Initializes an empty pool.
+        :param budget: Memory in bytes the loaded models may use, unlimited when None. A leased model is never
+            unloaded, so the pool goes over the budget when the leased models alone exceed it.
+        :param idle_timeout: Seconds after which a model nobody uses is unloaded, never when None.
+        :param max_events: Number of load and unload events kept for events.
+        """
+        self.budget = budget
+        self.idle_timeout = idle_timeout
+        self.__entries = OrderedDict()
+        self.__sizes = {}
+        self.__events = deque(maxlen=max_events)
+        self.__lock = threading.Lock()
+        self.__load_locks = {}
+        self.__stop = threading.Event()
+        self.__reaper = None
+
+
+    @classmethod
+    def from_environment(cls):
+        """
+        Builds a pool from MODEL_MEMORY_BUDGET, e.g. 6G, and MODEL_IDLE_TIMEOUT in seconds.
+        :return: The ModelPool.
+        """
+        idle_timeout = os.environ.get("MODEL_IDLE_TIMEOUT")
+        return cls(
+            budget=parse_size(os.environ.get("MODEL_MEMORY_BUDGET")),
+            idle_timeout=float(idle_timeout) if idle_timeout else None,
+        )
+
+
+    @contextmanager
+    def lease(self, key, load):
+        """
+        Holds a model for the duration of a block, loading it when it is not resident.
+        :param key: The model key, models loaded with the same key are shared.
+        :param load: Function without arguments loading the model.
+        """
+        model = self.acquire(key, load)
+        try:
+            yield model
+        finally:
+            self.release(key)
+
+
+    def get(self, key, load):
+        """
+        Returns a model without leasing it, loading it when it is not resident.
+        The pool may unload the model while the caller still holds it, in which case its memory is freed
+        only once the caller drops it. Use lease around the work instead.
+        :param key: The model key.
+        :param load: Function without arguments loading the model.
+        :return: The model.
+        """
+        model = self.acquire(key, load)
+        self.release(key)
+        return model
+
+
+    def acquire(self, key, load):
+        """
+        Leases a model, every acquire must be followed by a release.
+        :param key: The model key.
+        :param load: Function without arguments loading the model.
+        :return: The model.
+        """
+        model = self.__lease(key)
+        if model is not None:
+            return model
+
+        with self.__load_lock(key):
+            # Another thread may have loaded the model while this one waited.
+            model = self.__lease(key)
+            if model is not None:
+                return model
+
+            # A model loaded before makes room for itself before loading again.
+            self.__evict_until(self.__sizes.get(key, 0))
+
+            rss = current_rss()
+            start = time.perf_counter()
+            model = load()
+            seconds = time.perf_counter() - start
+            grown = current_rss() - rss if rss is not None else 0
+            size = max(grown, model_memory(model), 0)
+
+            entry = _Entry(model, size)
+            entry.references = 1
+            with self.__lock:
+                self.__entries[key] = entry
+                self.__sizes[key] = size
+
+            MODEL_LOAD_SECONDS.observe(seconds, model=key)
+            MODEL_RESIDENT_BYTES.set(size, model=key)
+            self.__report("load", key, size, seconds)
+
+        self.__evict_until(0)
+        self.__start_reaper()
+        return model
+
+
+    def release(self, key):
+        """
+        Ends a lease taken with acquire.
+        :param key: The model key.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return
+            entry.references -= 1
+            entry.last_used = time.monotonic()
+
+        # Models left while the pool was over budget can go now, the released one stays for its next use.
+        if not entry.references:
+            self.__evict_until(0, keep=key)
+
+
+    def unload(self, key, event="unload"):
+        """
+        Unloads a model that no lease holds.
+        :param key: The model key.
+        :param event: The event reported, unload, evict or idle.
+        :return: Whether the model was unloaded.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or entry.references > 0:
+                return False
+            del self.__entries[key]
+
+        MODEL_RESIDENT_BYTES.set(0, model=key)
+        self.__report(event, key, entry.size)
+        del entry
+        _release_memory()
+        return True
+
+
+    def unload_idle(self):
+        """
+        Unloads the models nobody used for idle_timeout seconds.
+        :return: List of the unloaded model keys.
+        """
+        if self.idle_timeout is None:
+            return []
+
+        deadline = time.monotonic() - self.idle_timeout
+        with self.__lock:
+            idle = [
+                key for key, entry in self.__entries.items() if not entry.references and entry.last_used <= deadline
+            ]
+
+        return [key for key in idle if self.unload(key, event="idle")]
+
+
+    def clear(self):
+        """
+        Unloads every model no lease holds and stops the idle reaper.
+        """
+        self.__stop.set()
+        with self.__lock:
+            keys = list(self.__entries)
+
+        for key in keys:
+            self.unload(key)
+
+
+    @property
+    def resident(self):
+        """
+        Estimated memory of the loaded models in bytes.
+        """
+        with self.__lock:
+            return sum(entry.size for entry in self.__entries.values())
+
+
+    def stats(self):
+        """
+        Reports the loaded models, least recently used first.
+        :return: Dictionary of model key to its resident bytes, leases and idle seconds.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            return {
+                key: {"resident_bytes": entry.size, "leases": entry.references, "idle_seconds": now - entry.last_used}
+                for key, entry in self.__entries.items()
+            }
+
+
+    def events(self):
+        """
+        The latest load and unload events.
+        :return: List of dictionaries with the time, the event, the model key, its size and the load seconds.
+        """
+        with self.__lock:
+            return list(self.__events)
+
+
+    def __lease(self, key):
+        """
+        Leases a resident model.
+        :param key: The model key.
+        :return: The model, None when it is not resident.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return None
+
+            entry.references += 1
+            entry.last_used = time.monotonic()
+            self.__entries.move_to_end(key)
+            return entry.model
+
+
+    def __load_lock(self, key):
+        """
+        The lock serializing the loads of a model, so concurrent first uses load it once.
+        :param key: The model key.
+        :return: The lock.
+        """
+        with self.__lock:
+            return self.__load_locks.setdefault(key, threading.Lock())
+
+
+    def __evict_until(self, needed, keep=None):
+        """
+        Unloads the least recently used models no lease holds until needed more bytes fit in the budget.
+        :param needed: Bytes about to be loaded.
+        :param keep: Key of a model not to unload.
+        """
+        if self.budget is None:
+            return
+
+        while True:
+            with self.__lock:
+                total = sum(entry.size for entry in self.__entries.values())
+                if total + needed <= self.budget:
+                    return
+                candidates = [key for key, entry in self.__entries.items() if not entry.references and key != keep]
+
+            if not candidates or not self.unload(candidates[0], event="evict"):
+                return
+
+
+    def __start_reaper(self):
+        """
+        Starts the thread unloading idle models, once and only with an idle timeout.
+        """
+        if self.idle_timeout is None or self.__reaper is not None:
+            return
+
+        with self.__lock:
+            if self.__reaper is not None:
+                return
+            self.__reaper = threading.Thread(target=self.__reap, name="model-pool-reaper", daemon=True)
+
+        self.__reaper.start()
+
+
+    def __reap(self):
+        """
+        Unloads the idle models every few seconds until the pool is cleared.
+        """
+        interval = min(max(self.idle_timeout / 4, 0.1), 30.0)
+        while not self.__stop.wait(interval):
+            self.unload_idle()
+
+
+    def __report(self, event, key, size, seconds=None):
+        """
+        Records a load or unload event in the metrics and the event log.
+        :param event: load, unload, evict or idle.
+        :param key: The model key.
+        :param size: The model size in bytes.
+        :param seconds: The load duration.
+        """
+        MODEL_EVENTS.inc(model=key, event=event)
+        with self.__lock:
+            self.__events.append({"time": time.time(), "event": event, "model": key, "bytes": size, "seconds": seconds})
+
+
+# The pool the models of the process are loaded into, configured through the environment.
+POOL = ModelPool.from_environment()
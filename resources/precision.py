@@ -0,0 +1,50 @@
+import io
+import warnings
+import torch
+
+PRECISIONS = ("float32", "bfloat16", "int8")
+
+
+def bfloat16_supported():
+    """
+    Whether the CPU has native bfloat16 instructions, without which bfloat16 inference is slower than float32.
+    :return: True when bfloat16 is supported.
+    """
+    checks = [getattr(torch.cpu, name, None) for name in ("_is_avx512_bf16_supported", "_is_amx_tile_supported")]
+    return any(check is not None and check() for check in checks)
+
+
+def apply_precision(model, precision="float32"):
+    """
+    Prepares a model for CPU inference at a reduced precision.
+    int8 applies dynamic quantization to the linear layers, bfloat16 casts the weights when the CPU supports it.
+    :param model: The torch model.
+    :param precision: float32, bfloat16 or int8.
+    :return: The converted model.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {', '.join(PRECISIONS)}.")
+
+    if precision == "float32":
+        return model
+
+    model.eval()
+
+    if precision == "bfloat16":
+        if not bfloat16_supported():
+            warnings.warn("This CPU has no native bfloat16 support, keeping float32 weights.")
+            return model
+        return model.to(torch.bfloat16)
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def model_size(model):
+    """
+    Measures the serialized size of a model's weights, including quantized ones.
+    :param model: The torch model.
+    :return: Size in bytes.
+    """
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes
@@ -0,0 +1,152 @@
+import threading
+
+# Components not needed when only the lemma of a token is read.
+LEMMATIZER_EXCLUDE = ("parser", "ner")
+
+# Resources fetched by download, at build time rather than when a class is constructed.
+SPACY_MODELS = ("en_core_web_sm",)
+NLTK_RESOURCES = ("stopwords", "punkt_tab")
+HUGGINGFACE_MODELS = ("amjad-awad/skill-extractor",)
+
+# spaCy, NLTK and huggingface_hub are imported by the functions using them, so importing the registry is cheap.
+_lock = threading.Lock()
+_stopwords = {}
+
+
+def _pool(pool):
+    """
+    The pool models are loaded into.
+    :param pool: A ModelPool, the process-wide pool when None.
+    :return: The ModelPool.
+    """
+    if pool is not None:
+        return pool
+
+    from .pool import POOL
+    return POOL
+
+
+def _spacy_model(name, exclude):
+    """
+    The pool key and the loader of a spaCy model.
+    :param name: Name or path of the spaCy model.
+    :param exclude: Names of the pipeline components not to load.
+    :return: Tuple of the key and the function loading the model.
+    """
+    exclude = tuple(sorted(exclude))
+
+    def load():
+        import spacy
+        try:
+            return spacy.load(name, exclude=list(exclude))
+        except OSError as error:
+            raise OSError(f"The spaCy model {name} is not installed, run `python -m resources` first.") from error
+
+    return f"spacy:{name}" + (f"#exclude={','.join(exclude)}" if exclude else ""), load
+
+
+def _ner_model(repo_id):
+    """
+    The pool key and the loader of a spaCy NER model stored in a Hugging Face repository.
+    The local snapshot is used when present, the repository is only downloaded when it is missing.
+    :param repo_id: The Hugging Face model repository.
+    :return: Tuple of the key and the function loading the model.
+    """
+    def load():
+        import spacy
+        from huggingface_hub import snapshot_download
+        from huggingface_hub.errors import LocalEntryNotFoundError
+        try:
+            path = snapshot_download(repo_id, repo_type="model", local_files_only=True)
+        except LocalEntryNotFoundError:
+            path = snapshot_download(repo_id, repo_type="model")
+
+        return spacy.load(path)
+
+    return f"ner:{repo_id}", load
+
+
+def load_spacy(name, exclude=(), pool=None):
+    """
+    Returns the shared spaCy pipeline of a model, loading it into the pool on first use.
+    Callers asking for the same model and excluded components share one instance.
+    :param name: Name or path of the spaCy model.
+    :param exclude: Names of the pipeline components not to load.
+    :param pool: The ModelPool, the process-wide pool when None.
+    :return: The spaCy pipeline.
+    """
+    return _pool(pool).get(*_spacy_model(name, exclude))
+
+
+def lease_spacy(name, exclude=(), pool=None):
+    """
+    Leases the shared spaCy pipeline of a model, so the pool keeps it loaded while it runs.
+    :param name: Name or path of the spaCy model.
+    :param exclude: Names of the pipeline components not to load.
+    :param pool: The ModelPool, the process-wide pool when None.
+    :return: Context manager giving the spaCy pipeline.
+    """
+    return _pool(pool).lease(*_spacy_model(name, exclude))
+
+
+def load_ner_model(repo_id, pool=None):
+    """
+    Returns the shared spaCy NER model stored in a Hugging Face repository, loading it into the pool on first use.
+    :param repo_id: The Hugging Face model repository.
+    :param pool: The ModelPool, the process-wide pool when None.
+    :return: The spaCy pipeline.
+    """
+    return _pool(pool).get(*_ner_model(repo_id))
+
+
+def lease_ner_model(repo_id, pool=None):
+    """
+    Leases the shared spaCy NER model stored in a Hugging Face repository, so the pool keeps it loaded while it runs.
+    :param repo_id: The Hugging Face model repository.
+    :param pool: The ModelPool, the process-wide pool when None.
+    :return: Context manager giving the spaCy pipeline.
+    """
+    return _pool(pool).lease(*_ner_model(repo_id))
+
+
+def load_stopwords(language="english"):
+    """
+    Returns the process-wide NLTK stop word set of a language, reading it on first use.
+    :param language: The stop word language.
+    :return: Frozen set of stop words.
+    """
+    words = _stopwords.get(language)
+    if words is not None:
+        return words
+
+    with _lock:
+        if language not in _stopwords:
+            from nltk.corpus import stopwords
+            try:
+                _stopwords[language] = frozenset(stopwords.words(language))
+            except LookupError as error:
+                raise LookupError("The NLTK stopwords corpus is not installed, run `python -m resources` first.") from error
+
+        return _stopwords[language]
+
+
+def download(spacy_models=SPACY_MODELS, nltk_resources=NLTK_RESOURCES, huggingface_models=HUGGINGFACE_MODELS):
+    """
+    Downloads the spaCy models, NLTK resources and Hugging Face models that are missing.
+    :param spacy_models: Names of the spaCy models.
+    :param nltk_resources: Names of the NLTK resources.
+    :param huggingface_models: Hugging Face model repositories.
+    """
+    import nltk
+    import spacy
+    from huggingface_hub import snapshot_download
+
+    for name in spacy_models:
+        if not spacy.util.is_package(name):
+            spacy.cli.download(name)
+
+    for resource in nltk_resources:
+        nltk.download(resource, quiet=True)
+
+    for repo_id in huggingface_models:
+        snapshot_download(repo_id, repo_type="model")
@@ -0,0 +1,90 @@
+import threading
+import time
+
+
+class BackgroundLoader:
+    """
+    Builds an object on a background thread and warms it up, so an application can start serving
+    while its models load. The state goes from loading to warming to ready, or to failed.
+    """
+    LOADING = "loading"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self, build, warm_up=None):
+        """
+        Initializes the loader, call start to begin loading.
+        :param build: Function without arguments returning the object.
+        :param warm_up: Optional function called with the object once it is built.
+        """
+        self.build = build
+        self.warm_up = warm_up
+        self.state = self.LOADING
+        self.error = None
+        self.timings = {}
+        self.__value = None
+        self.__ready = threading.Event()
+        self.__thread = None
+        self.__lock = threading.Lock()
+
+
+    def start(self):
+        """
+        Starts loading on a daemon thread, once.
+        :return: The loader.
+        """
+        with self.__lock:
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__load, name="background-loader", daemon=True)
+                self.__thread.start()
+
+        return self
+
+
+    @property
+    def ready(self):
+        """
+        Whether the object is built and warmed up.
+        """
+        return self.state == self.READY
+
+
+    def wait(self, timeout=None):
+        """
+        Waits for the object, starting the loader when it was not started.
+        :param timeout: Seconds to wait at most, forever when None.
+        :return: The object, or None when it is still loading after timeout seconds.
+        """
+        self.start()
+        if not self.__ready.wait(timeout):
+            return None
+
+        if self.state == self.FAILED:
+            raise RuntimeError("The models failed to load.") from self.error
+
+        return self.__value
+
+
+    def __load(self):
+        """
+        Builds and warms up the object, recording the state and the duration of both steps.
+        """
+        try:
+            start = time.perf_counter()
+            value = self.build()
+            self.timings["build"] = time.perf_counter() - start
+
+            if self.warm_up is not None:
+                self.state = self.WARMING
+                start = time.perf_counter()
+                self.warm_up(value)
+                self.timings["warm_up"] = time.perf_counter() - start
+
+            self.__value = value
+            self.state = self.READY
+        except Exception as error:
+            self.error = error
+            self.state = self.FAILED
+        finally:
+            self.__ready.set()
@@ -0,0 +1,4 @@
+from .batcher import MicroBatcher, QueueFull
+from .server import ScoringService
+
+__all__ = ["MicroBatcher", "QueueFull", "ScoringService"]
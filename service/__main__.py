@@ -0,0 +1,54 @@
+"""
+Runs the scoring service.
+
+    python -m service --port 8000 --max-batch-size 32 --max-wait-ms 10
+"""
+import os
+import asyncio
+import argparse
+from .server import ScoringService, DEFAULT_LIMITS
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Serve resume scoring over HTTP with micro-batching.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0, help="Time a request waits to fill a batch.")
+    parser.add_argument("--max-queue", type=int, default=1024, help="Items waiting per model before rejecting.")
+    parser.add_argument("--recommend-limit", type=int, default=DEFAULT_LIMITS["recommend"],
+                        help="Concurrent recommendation requests.")
+    parser.add_argument("--no-recommendation", action="store_true", help="Do not load the recommendation model.")
+    parser.add_argument("--model", default="mixedbread-ai/mxbai-embed-large-v1")
+    parser.add_argument("--precision", choices=["float32", "bfloat16", "int8"], default="float32")
+    args = parser.parse_args(arguments)
+
+    from processor import Preprocessor
+    from skill import SkillDynamicMatcher
+    from similarity import SentenceTransformerSimilarity
+
+    recommendation = None
+    if not args.no_recommendation:
+        from recommendation import AiRecommendation
+        recommendation = AiRecommendation(precision=args.precision, draft_model_name=os.environ.get("DRAFT_MODEL"))
+
+    service = ScoringService(
+        Preprocessor(),
+        SkillDynamicMatcher(),
+        SentenceTransformerSimilarity(args.model, precision=args.precision),
+        recommendation,
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000,
+        max_queue=args.max_queue,
+        limits={"recommend": args.recommend_limit},
+    )
+
+    print(f"serving on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import REGISTRY
+
+BATCH_SIZES = REGISTRY.histogram(
+    "resume_analyzer_batch_size", "Items per micro-batch.", ("batcher",), buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+
+class QueueFull(Exception):
+    """
+    Raised when a batcher queue is full, the caller should retry later.
+    """
+
+
+class MicroBatcher:
+    """
+    Gathers the items submitted by concurrent requests into batches, runs each batch once
+    on a worker thread and hands every caller its own result.
+    A batch is run as soon as it is full or its first item waited max_wait seconds.
+    """
+    def __init__(self, name, function, max_batch_size=32, max_wait=0.01, max_queue=1024):
+        """
+        Initializes the batcher, call start from the event loop before submitting.
+        :param name: Name of the batcher, used in the metrics.
+        :param function: Function mapping a list of items to the list of their results.
+        :param max_batch_size: Number of items per batch at most.
+        :param max_wait: Seconds the first item of a batch waits for more items.
+        :param max_queue: Number of items waiting at most, submissions beyond it raise QueueFull.
+        """
+        self.name = name
+        self.function = function
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.__queue = None
+        self.__task = None
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"batcher-{name}")
+
+
+    def start(self):
+        """
+        Starts the batching task on the running event loop.
+        """
+        self.__queue = asyncio.Queue(maxsize=self.max_queue)
+        self.__task = asyncio.get_running_loop().create_task(self.__run())
+
+
+    async def stop(self):
+        """
+        Stops the batching task and the worker thread.
+        """
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+        self.__executor.shutdown(wait=False)
+
+
+    @property
+    def pending(self):
+        """
+        Number of items waiting for a batch.
+        """
+        return self.__queue.qsize() if self.__queue is not None else 0
+
+
+    async def submit(self, item):
+        """
+        Queues an item and waits for its result.
+        :param item: The item.
+        :return: The result of the item.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.__queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            raise QueueFull(f"The {self.name} queue is full.") from None
+
+        return await future
+
+
+    async def submit_many(self, items):
+        """
+        Queues several items, which may land in different batches. Either every item is queued or none is.
+        :param items: List of items.
+        :return: List of results, in item order.
+        """
+        items = list(items)
+        if self.max_queue > 0 and self.__queue.qsize() + len(items) > self.max_queue:
+            raise QueueFull(f"The {self.name} queue has no room for {len(items)} items.")
+
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in items]
+        for item, future in zip(items, futures):
+            self.__queue.put_nowait((item, future))
+
+        return await asyncio.gather(*futures)
+
+
+    async def __run(self):
+        """
+        Collects batches and runs them one at a time.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.__queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.__queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Callers that gave up, such as closed connections, are dropped from the batch.
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            BATCH_SIZES.observe(len(batch), batcher=self.name)
+            try:
+                results = await loop.run_in_executor(self.__executor, self.function, [item for item, _ in batch])
+            except Exception as error:
+                if len(batch) == 1:
+                    if not batch[0][1].done():
+                        batch[0][1].set_exception(error)
+                    continue
+                # One bad item fails the whole batch, so the items run alone and only the failing callers get the error.
+                for item, future in batch:
+                    await self.__run_one(item, future)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+    async def __run_one(self, item, future):
+        """
+        Runs a single item of a failed batch, handing its caller the result or the error.
+        :param item: The item.
+        :param future: The future of its caller.
+        """
+        if future.done():
+            return
+
+        try:
+            result = (await asyncio.get_running_loop().run_in_executor(self.__executor, self.function, [item]))[0]
+        except Exception as error:
+            if not future.done():
+                future.set_exception(error)
+            return
+
+        if not future.done():
+            future.set_result(result)
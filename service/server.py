@@ -0,0 +1,327 @@
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import REGISTRY
+from resources.pool import POOL
+from .batcher import MicroBatcher, QueueFull
+
+REQUESTS = REGISTRY.counter(
+    "resume_analyzer_requests_total", "HTTP requests by endpoint and status.", ("endpoint", "status")
+)
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+# Concurrent requests admitted per endpoint, the recommendation model has its own small share.
+DEFAULT_LIMITS = {"score": 256, "embed": 256, "skills": 256, "recommend": 2}
+
+
+class HTTPError(Exception):
+    """
+    An error answered with an HTTP status.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class BadRequest(HTTPError):
+    """
+    A malformed request, answered with a 400.
+    """
+    def __init__(self, message):
+        super().__init__(400, message)
+
+
+class ScoringService:
+    """
+    An asyncio HTTP service scoring resumes against job descriptions.
+    Concurrent requests are gathered into micro-batches per model, so the models run batched forward
+    passes instead of one pass per request. Bounded queues reject work beyond capacity with a 503,
+    and per-endpoint limits keep slow recommendations from starving scoring.
+
+    POST /score      {"resume": ..., "job_description": ...}
+    POST /embed      {"texts": [...]}
+    POST /skills     {"texts": [...]}
+    POST /recommend  {"resume": ..., "job_description": ...}
+    GET  /health, GET /metrics
+    """
+    def __init__(self, preprocessor, skill_matcher, similarity, recommendation=None, max_batch_size=32,
+                 max_wait=0.01, max_queue=1024, limits=None, admission_timeout=1.0, max_body=10 * 2 ** 20):
+        """
+        Initializes the service components.
+        :param preprocessor: The Preprocessor instance.
+        :param skill_matcher: The SkillDynamicMatcher instance.
+        :param similarity: SentenceTransformerSimilarity or BertSimilarity instance.
+        :param recommendation: Optional AiRecommendation instance.
+        :param max_batch_size: Number of items per micro-batch at most.
+        :param max_wait: Seconds a request waits for others to fill its micro-batch.
+        :param max_queue: Number of items waiting per model before requests are rejected.
+        :param limits: Dictionary of endpoint to concurrent requests, DEFAULT_LIMITS for the missing ones.
+        :param admission_timeout: Seconds a request waits for an endpoint slot before it is rejected.
+        :param max_body: Largest request body in bytes.
+        """
+        self.preprocessor = preprocessor
+        self.skill_matcher = skill_matcher
+        self.similarity = similarity
+        self.recommendation = recommendation
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.admission_timeout = admission_timeout
+        self.max_body = max_body
+
+        def batcher(name, function):
+            return MicroBatcher(name, function, max_batch_size, max_wait, max_queue)
+
+        self.batchers = {
+            "preprocess": batcher("preprocess", lambda texts: list(preprocessor.preprocess_many(texts))),
+            "embed": batcher("embed", lambda texts: [vector.tolist() for vector in similarity.encode_many(texts)]),
+            "skills": batcher("skills", lambda texts: list(skill_matcher.extract_many(texts))),
+        }
+
+        self.__semaphores = {}
+        self.__recommend_executor = ThreadPoolExecutor(
+            max_workers=self.limits["recommend"], thread_name_prefix="recommend"
+        )
+        self.__routes = {
+            ("POST", "/score"): ("score", self.score),
+            ("POST", "/embed"): ("embed", self.embed),
+            ("POST", "/skills"): ("skills", self.skills),
+            ("POST", "/recommend"): ("recommend", self.recommend),
+            ("GET", "/health"): ("health", self.health),
+            ("GET", "/metrics"): ("metrics", None),
+        }
+
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        """
+        Serves requests until cancelled.
+        :param host: The address to bind.
+        :param port: The port to listen on.
+        """
+        self.__semaphores = {name: asyncio.Semaphore(limit) for name, limit in self.limits.items()}
+        for batcher in self.batchers.values():
+            batcher.start()
+
+        server = await asyncio.start_server(self.__connection, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for batcher in self.batchers.values():
+                await batcher.stop()
+            self.__recommend_executor.shutdown(wait=False)
+
+
+    async def score(self, body):
+        """
+        Scores a resume against a job description.
+        :param body: Request with resume and job_description texts.
+        :return: Response with the similarity, the skills and the skill match.
+        """
+        resume, job_description = self.__texts(body, "resume", "job_description")
+
+        preprocessed, skills = await asyncio.gather(
+            self.batchers["preprocess"].submit_many([resume, job_description]),
+            self.batchers["skills"].submit_many([resume, job_description]),
+        )
+        resume_embedding, job_embedding = await self.batchers["embed"].submit_many(preprocessed)
+
+        dot = sum(a * b for a, b in zip(resume_embedding, job_embedding))
+        norm = (sum(a * a for a in resume_embedding) * sum(b * b for b in job_embedding)) ** 0.5
+
+        resume_skills, job_description_skills = skills
+        match_ratio, match_string = 0.0, "0/0"
+        if job_description_skills:
+            match_ratio, match_string = self.skill_matcher.match(job_description_skills, resume_skills)
+
+        return {
+            "similarity": dot / norm if norm else 0.0,
+            "resume_skills": resume_skills,
+            "job_description_skills": job_description_skills,
+            "match_ratio": match_ratio,
+            "match": match_string,
+        }
+
+
+    async def embed(self, body):
+        """
+        Encodes preprocessed texts.
+        :param body: Request with a texts list.
+        :return: Response with the embeddings.
+        """
+        return {"embeddings": await self.batchers["embed"].submit_many(self.__text_list(body))}
+
+
+    async def skills(self, body):
+        """
+        Extracts the skills of texts.
+        :param body: Request with a texts list.
+        :return: Response with a skill list per text.
+        """
+        return {"skills": await self.batchers["skills"].submit_many(self.__text_list(body))}
+
+
+    async def recommend(self, body):
+        """
+        Generates resume advice on the dedicated recommendation thread.
+        :param body: Request with resume and job_description texts.
+        :return: Response with the recommendation.
+        """
+        if self.recommendation is None:
+            raise HTTPError(404, "The service runs without a recommendation model.")
+
+        resume, job_description = self.__texts(body, "resume", "job_description")
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(
+            self.__recommend_executor, self.recommendation.recommend, resume, job_description
+        )
+        return {"recommendation": text}
+
+
+    async def health(self, body):
+        """
+        Reports the queue lengths and the models loaded in the pool.
+        :param body: Unused.
+        :return: Response with the status, the pending items per model and the loaded models.
+        """
+        return {
+            "status": "ok",
+            "pending": {name: batcher.pending for name, batcher in self.batchers.items()},
+            "models": POOL.stats(),
+        }
+
+
+    async def handle(self, method, path, body):
+        """
+        Routes a request and turns errors into statuses.
+        :param method: The HTTP method.
+        :param path: The request path.
+        :param body: The request body bytes.
+        :return: Tuple of the status, the content type and the response bytes.
+        """
+        route = self.__routes.get((method, path))
+        if route is None:
+            allowed = any(known == path for _, known in self.__routes)
+            status = 405 if allowed else 404
+            REQUESTS.inc(endpoint="unknown", status=status)
+            return status, "application/json", json.dumps({"error": REASONS[status]}).encode()
+
+        endpoint, handler = route
+        if handler is None:
+            REQUESTS.inc(endpoint=endpoint, status=200)
+            return 200, "text/plain; version=0.0.4; charset=utf-8", REGISTRY.render().encode()
+
+        try:
+            try:
+                payload = json.loads(body) if body else {}
+            except ValueError as error:
+                raise BadRequest(f"The request body is not valid JSON: {error}") from None
+            async with self.__admission(endpoint):
+                status, response = 200, await handler(payload)
+        except HTTPError as error:
+            status, response = error.status, {"error": str(error)}
+        except QueueFull as error:
+            status, response = 503, {"error": str(error)}
+        except Exception as error:
+            status, response = 500, {"error": f"{type(error).__name__}: {error}"}
+
+        REQUESTS.inc(endpoint=endpoint, status=status)
+        return status, "application/json", json.dumps(response).encode()
+
+
+    @asynccontextmanager
+    async def __admission(self, endpoint):
+        """
+        Holds a concurrency slot of an endpoint, raising a 503 when none frees up in time.
+        :param endpoint: The endpoint name.
+        """
+        semaphore = self.__semaphores.get(endpoint)
+        if semaphore is None:
+            yield
+            return
+
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.admission_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(503, f"Too many concurrent {endpoint} requests.") from None
+
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+    async def __connection(self, reader, writer):
+        """
+        Serves the HTTP/1.1 requests of a connection, keeping it alive between requests.
+        :param reader: The connection stream reader.
+        :param writer: The connection stream writer.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+
+                method, target, version = request_line.decode("latin-1").split(maxsplit=2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > self.max_body:
+                    status, content_type, response = 413, "application/json", b'{"error": "Payload Too Large"}'
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, content_type, response = await self.handle(method, target.split("?")[0], body)
+                    keep_alive = version.strip() == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(response)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + response
+                )
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+    @staticmethod
+    def __texts(body, *fields):
+        """
+        Reads required text fields of a request.
+        :param body: The decoded request.
+        :param fields: The field names.
+        :return: List of the field values.
+        """
+        values = [body.get(name) if isinstance(body, dict) else None for name in fields]
+        if not all(isinstance(value, str) for value in values):
+            raise BadRequest(f"The request needs the text fields {', '.join(fields)}.")
+        return values
+
+
+    @staticmethod
+    def __text_list(body):
+        """
+        Reads the texts list of a request.
+        :param body: The decoded request.
+        :return: The list of texts.
+        """
+        texts = body.get("texts") if isinstance(body, dict) else None
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            raise BadRequest("The request needs a texts list of strings.")
+        return texts
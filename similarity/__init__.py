@@ -1,3 +1,13 @@
-from .similarity import SentenceTransformerSimilarity, BertSimilarity, TFIDFSimilarity
+from resources.lazy import lazy_exports
 
-__all__ = ["SentenceTransformerSimilarity", "BertSimilarity", "TFIDFSimilarity"]
\ No newline at end of file
+# Each similarity is imported on first access, so TF-IDF alone does not load torch.
+_EXPORTS = {
+    "SentenceTransformerSimilarity": ".sentence_transformer",
+    "BertSimilarity": ".bert",
+    "TFIDFSimilarity": ".tfidf",
+    "EmbeddingCache": ".cache",
+    "ResumeIndex": ".index",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,203 @@
+import torch
+import numpy as np
+import torch.nn.functional as F
+from transformers import BertConfig, BertTokenizerFast, BertModel
+from resources.precision import apply_precision
+from resources.pool import POOL
+from instrumentation import timed, DOCUMENTS
+from .utils import _batched, _cosine_batch_similarity
+
+
+class BertSimilarity:
+    """
+    A class for computing sentence similarity using a pretrained BERT model.
+    """
+    REDUCERS = ("mean", "max", "weighted")
+
+    def __init__(self, model_name="google-bert/bert-base-uncased", cache=None,
+                 long_document=False, window_size=512, stride=128, reducer="mean", precision="float32", pool=None):
+        """
+        Initializes the BertSimilarity with a given BERT model, loaded into the pool on first use.
+        :param model_name: The name of the pretrained BERT model.
+        :param cache: Optional EmbeddingCache reused across calls and runs, by one process at a time.
+        :param long_document: Encode the whole text as overlapping token windows instead of truncating it.
+        :param window_size: Number of tokens per window in long document mode.
+        :param stride: Number of tokens shared by consecutive windows in long document mode.
+        :param reducer: How window embeddings are combined: mean, max or weighted by window length.
+        :param precision: Inference precision on CPU: float32, bfloat16 or int8.
+        :param pool: The ModelPool holding the model, the process-wide pool when None.
+        """
+        if reducer not in self.REDUCERS:
+            raise ValueError(f"reducer must be one of {', '.join(self.REDUCERS)}.")
+
+        if not 0 <= stride < window_size:
+            raise ValueError("stride must be smaller than window_size.")
+
+        self.model_name = model_name
+        self.precision = precision
+        self.pool = pool or POOL
+        self.config = BertConfig.from_pretrained(model_name)
+        self.tokenizer = BertTokenizerFast.from_pretrained(model_name)
+        self.cache = cache
+        self.__model_key = f"bert:{model_name}#precision={precision}"
+
+        self.long_document = long_document
+        self.window_size = min(window_size, self.config.max_position_embeddings)
+        self.stride = stride
+        self.reducer = reducer
+
+        # Long document and reduced precision embeddings differ from the default ones, so they get their own cache entries.
+        self.cache_name = model_name
+        if long_document:
+            self.cache_name = f"{model_name}#window={self.window_size},stride={stride},reducer={reducer}"
+        if precision != "float32":
+            self.cache_name = f"{self.cache_name}#precision={precision}"
+
+
+    @property
+    def model(self):
+        """
+        The BERT model, loaded into the pool when it is not resident.
+        """
+        return self.pool.get(self.__model_key, self.__load)
+
+
+    def encode(self, sentence):
+        """
+        Encodes a sentence into a dense vector using the average of the last 4 hidden layers.
+        :param sentence: Input sentence to encode.
+        :return: Sentence embedding tensor.
+        """
+        if self.cache is not None and isinstance(sentence, str):
+            return torch.from_numpy(self.encode_many([sentence]))
+
+        return self.__embed(sentence)
+
+
+    def encode_many(self, sentences, batch_size=16):
+        """
+        Encodes a list of sentences with batched forward passes.
+        :param sentences: List of sentences to encode.
+        :param batch_size: Number of sentences per forward pass.
+        :return: Array of embeddings, one row per sentence.
+        """
+        def encode(texts):
+            embeddings = [self.__embed(batch).numpy() for batch in _batched(texts, batch_size)]
+
+            if not embeddings:
+                return np.empty((0, self.config.hidden_size), dtype=np.float32)
+
+            return np.concatenate(embeddings)
+
+        if self.cache is None:
+            return encode(sentences)
+
+        return self.cache.get_or_encode(self.cache_name, sentences, encode)
+
+
+    @timed("embed_bert")
+    def __embed(self, sentence):
+        """
+        Runs the model on a sentence or a batch of sentences.
+        :param sentence: Input sentence or list of sentences.
+        :return: Sentence embedding tensor, one row per sentence.
+        """
+        DOCUMENTS.inc(1 if isinstance(sentence, str) else len(sentence), stage="embed_bert")
+        with self.pool.lease(self.__model_key, self.__load) as model:
+            if self.long_document:
+                return self.__embed_windows(model, sentence)
+
+            inputs = self.tokenizer(sentence, return_tensors="pt", padding=True, truncation=True)
+
+            with torch.no_grad():
+                outputs = model(**inputs, output_hidden_states=True)
+
+        return self.__pool(outputs.hidden_states, inputs["attention_mask"])
+
+
+    def __embed_windows(self, model, sentence):
+        """
+        Splits each text into overlapping token windows, runs every window through the model
+        as one padded batch and combines the window embeddings of each text with the reducer.
+        :param model: The leased BERT model.
+        :param sentence: Input sentence or list of sentences.
+        :return: Sentence embedding tensor, one row per sentence.
+        """
+        inputs = self.tokenizer(
+            sentence,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=self.window_size,
+            stride=self.stride,
+            return_overflowing_tokens=True,
+        )
+        sample_mapping = inputs.pop("overflow_to_sample_mapping")
+
+        with torch.no_grad():
+            outputs = model(**inputs, output_hidden_states=True)
+
+        windows = self.__pool(outputs.hidden_states, inputs["attention_mask"])
+        lengths = inputs["attention_mask"].sum(dim=1).to(windows.dtype)
+
+        embeddings = []
+        for index in range(int(sample_mapping.max()) + 1):
+            selected = sample_mapping == index
+            if self.reducer == "max":
+                embeddings.append(windows[selected].max(dim=0).values)
+            elif self.reducer == "weighted":
+                weights = lengths[selected] / lengths[selected].sum()
+                embeddings.append((windows[selected] * weights.unsqueeze(-1)).sum(dim=0))
+            else:
+                embeddings.append(windows[selected].mean(dim=0))
+
+        return torch.stack(embeddings)
+
+
+    def __load(self):
+        """
+        Loads the model at the inference precision.
+        :return: The BERT model.
+        """
+        return apply_precision(BertModel.from_pretrained(self.model_name), self.precision)
+
+
+    @staticmethod
+    def __pool(hidden_states, attention_mask):
+        """
+        Averages the last 4 hidden layers over the non-padding tokens.
+        :param hidden_states: Hidden states of every layer.
+        :param attention_mask: Attention mask of the batch.
+        :return: Sentence embedding tensor, in float32 whatever the model precision.
+        """
+        mask = attention_mask.unsqueeze(-1).float()
+        token_count = mask.sum(dim=1).clamp(min=1)
+
+        layer_pooled = [(layer.float() * mask).sum(dim=1) / token_count for layer in hidden_states[-4:]]
+
+        return torch.mean(torch.stack(layer_pooled), dim=0)
+
+
+    def similarity(self, sentence1, sentence2):
+        """
+        Calculates cosine similarity between two sentence.
+        :param sentence1: First sentence text.
+        :param sentence2: Second sentence text.
+        :return: Cosine similarity score between the two sentence.
+        """
+        embedding1 = self.encode(sentence1)
+        embedding2 = self.encode(sentence2)
+
+        return F.cosine_similarity(embedding1, embedding2).item()
+
+
+    def batch_similarity(self, job_description, resumes, batch_size=16, top_k=None):
+        """
+        Scores one job description against many resumes, encoding the job description once.
+        :param job_description: The job description text.
+        :param resumes: List or iterator of resume texts.
+        :param batch_size: Number of resumes encoded per mini-batch.
+        :param top_k: Number of best resume indices to return, all when None.
+        :return: Tuple of the cosine similarity array and the top-k resume indices.
+        """
+        return _cosine_batch_similarity(self.encode_many, job_description, resumes, batch_size, top_k)
@@ -0,0 +1,392 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from instrumentation import CACHE_LOOKUPS
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class EmbeddingCache:
+    """
+    A persistent embedding cache keyed by model name and a hash of the encoded text.
+    Vectors live in a memory-mapped matrix on disk, the index keeps the least recently used order.
+    The matrix has a single embedding size, so models of different sizes need their own cache directories.
+    New entries are appended to a journal replayed on load, flush rewrites the index and empties the journal.
+    A cache directory is used by one process at a time, threads of that process may share the instance.
+    """
+    def __init__(self, path, max_entries=100000, dtype="float32"):
+        """
+        Opens the cache directory, creating it when it does not exist.
+        :param path: Directory holding the index and the vector store.
+        :param max_entries: Maximum number of cached vectors before the least recently used are evicted.
+        :param dtype: Storage type of the vectors, float32 or float16.
+        """
+        if np.dtype(dtype) not in (np.float32, np.float16):
+            raise ValueError("dtype must be float32 or float16.")
+
+        if max_entries < 1:
+            raise ValueError("max_entries must be a positive integer.")
+
+        self.path = path
+        self.max_entries = max_entries
+        self.dtype = np.dtype(dtype)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.encoded = 0
+        self.encode_seconds = 0.0
+
+        self.__vectors = None
+        self.__entries = OrderedDict()
+        self.__free = []
+        self.__journaled = 0
+        self.__lock = threading.RLock()
+
+        os.makedirs(path, exist_ok=True)
+        self.__lock_file = self.__acquire_directory()
+        self.__load()
+        self.__journal = open(os.path.join(path, "journal.jsonl"), "a")
+        if self.__journaled:
+            self.flush()
+
+
+    @staticmethod
+    def key(model_name, text):
+        """
+        Builds the cache key of a text encoded by a model.
+        :param model_name: Name of the model producing the embedding.
+        :param text: The encoded text.
+        :return: The cache key.
+        """
+        return f"{model_name}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+
+    def get(self, model_name, text):
+        """
+        Looks up the embedding of a text.
+        :param model_name: Name of the model producing the embedding.
+        :param text: The encoded text.
+        :return: The cached embedding, or None on a miss.
+        """
+        key = self.key(model_name, text)
+
+        with self.__lock:
+            slot = self.__entries.get(key)
+            if slot is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(cache="embedding", result="miss")
+                return None
+
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            CACHE_LOOKUPS.inc(cache="embedding", result="hit")
+            return np.array(self.__vectors[slot], dtype=np.float32)
+
+
+    def put(self, model_name, text, vector):
+        """
+        Stores the embedding of a text, evicting the least recently used entry when the cache is full.
+        :param model_name: Name of the model producing the embedding.
+        :param text: The encoded text.
+        :param vector: The embedding.
+        """
+        with self.__lock:
+            self.__store(self.key(model_name, text), np.asarray(vector).ravel())
+            self.__sync()
+
+
+    def get_or_encode(self, model_name, texts, encode):
+        """
+        Returns the embeddings of texts, encoding only the ones missing from the cache.
+        :param model_name: Name of the model producing the embeddings.
+        :param texts: List of texts.
+        :param encode: Function that encodes a list of texts into a 2-D array.
+        :return: Array of embeddings, one row per text.
+        """
+        texts = list(texts)
+        if not texts:
+            return np.asarray(encode([]), dtype=np.float32)
+
+        rows = [None] * len(texts)
+        missing = OrderedDict()
+
+        with self.__lock:
+            for position, text in enumerate(texts):
+                key = self.key(model_name, text)
+                slot = self.__entries.get(key)
+                if slot is None:
+                    self.misses += 1
+                    missing.setdefault(key, (text, []))[1].append(position)
+                else:
+                    self.hits += 1
+                    self.__entries.move_to_end(key)
+                    rows[position] = np.array(self.__vectors[slot], dtype=np.float32)
+
+        misses = sum(len(positions) for _, positions in missing.values())
+        CACHE_LOOKUPS.inc(len(texts) - misses, cache="embedding", result="hit")
+        CACHE_LOOKUPS.inc(misses, cache="embedding", result="miss")
+
+        if missing:
+            start = time.perf_counter()
+            vectors = np.asarray(encode([text for text, _ in missing.values()]), dtype=np.float32)
+            self.record_encode_time(time.perf_counter() - start, len(missing))
+
+            with self.__lock:
+                for (key, (_, positions)), vector in zip(missing.items(), vectors):
+                    self.__store(key, vector)
+                    for position in positions:
+                        rows[position] = vector
+                self.__sync()
+
+        return np.stack(rows)
+
+
+    def record_encode_time(self, seconds, count):
+        """
+        Records the encoder time spent on cache misses.
+        :param seconds: Time spent in the encoder.
+        :param count: Number of texts encoded.
+        """
+        with self.__lock:
+            self.encode_seconds += seconds
+            self.encoded += count
+
+
+    def stats(self):
+        """
+        Reports the hit and miss counters and the estimated encoder time saved by the hits.
+        :return: Dictionary of cache statistics.
+        """
+        with self.__lock:
+            lookups = self.hits + self.misses
+            seconds_per_text = self.encode_seconds / self.encoded if self.encoded else 0.0
+
+            return {
+                "entries": len(self.__entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "encode_seconds": self.encode_seconds,
+                "estimated_saved_seconds": self.hits * seconds_per_text,
+            }
+
+
+    def flush(self):
+        """
+        Writes the vector store and the index to disk and empties the journal.
+        """
+        with self.__lock:
+            if self.__vectors is None or self.__journal.closed:
+                return
+
+            self.__vectors.flush()
+
+            index = {
+                "dtype": self.dtype.name,
+                "dim": self.__vectors.shape[1],
+                "capacity": self.__vectors.shape[0],
+                "entries": list(self.__entries.items()),
+            }
+            temporary_path = os.path.join(self.path, "index.json.tmp")
+            with open(temporary_path, "w") as file:
+                json.dump(index, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, os.path.join(self.path, "index.json"))
+
+            self.__journal.truncate(0)
+            self.__journaled = 0
+
+
+    def close(self):
+        """
+        Flushes the cache, closes its journal and lets other processes open the directory.
+        The cache cannot be used afterwards.
+        """
+        with self.__lock:
+            if not self.__journal.closed:
+                self.flush()
+                self.__journal.close()
+                self.__lock_file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def clear(self):
+        """
+        Removes every cached vector.
+        """
+        with self.__lock:
+            self.__entries.clear()
+            if self.__vectors is not None:
+                self.__free = list(range(self.__vectors.shape[0] - 1, -1, -1))
+            self.flush()
+
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+
+    def __acquire_directory(self):
+        """
+        Locks the cache directory for this process, the index, the journal and the vectors of a cache
+        opened by two processes would overwrite each other.
+        :return: The open lock file, closing it releases the lock.
+        """
+        lock_file = open(os.path.join(self.path, "lock"), "a")
+        if fcntl is None:
+            return lock_file
+
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(
+                f"The cache at {self.path} is already open, a cache directory is used by one instance at a time."
+            ) from None
+
+        return lock_file
+
+
+    def __sync(self):
+        """
+        Writes the stored vectors, then the journal entries pointing to them, to the disk.
+        """
+        self.__vectors.flush()
+        self.__journal.flush()
+        os.fsync(self.__journal.fileno())
+
+
+    def __load(self):
+        """
+        Opens the vector store of an existing cache, reads its index and replays its journal.
+        """
+        vectors_path = os.path.join(self.path, "vectors.npy")
+        if not os.path.exists(vectors_path):
+            return
+
+        self.__vectors = np.lib.format.open_memmap(vectors_path, mode="r+")
+        if self.__vectors.dtype != self.dtype:
+            raise ValueError(f"The cache at {self.path} stores {self.__vectors.dtype.name} vectors, "
+                             f"not {self.dtype.name}.")
+
+        index_path = os.path.join(self.path, "index.json")
+        if os.path.exists(index_path):
+            with open(index_path) as file:
+                self.__entries = OrderedDict((key, slot) for key, slot in json.load(file)["entries"])
+
+        self.__replay()
+
+        while len(self.__entries) > self.max_entries:
+            self.__entries.popitem(last=False)
+
+        if self.__vectors.shape[0] < self.max_entries:
+            self.__allocate(self.__vectors.shape[1])
+
+        used = set(self.__entries.values())
+        self.__free = [slot for slot in range(self.__vectors.shape[0] - 1, -1, -1) if slot not in used]
+
+
+    def __replay(self):
+        """
+        Applies the entries stored since the last flush, a slot written again drops the key it held before.
+        """
+        journal_path = os.path.join(self.path, "journal.jsonl")
+        if not os.path.exists(journal_path):
+            return
+
+        keys = {slot: key for key, slot in self.__entries.items()}
+        with open(journal_path) as file:
+            for line in file:
+                try:
+                    key, slot = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash ends the journal.
+                    break
+
+                previous = keys.get(slot)
+                if previous is not None and previous != key:
+                    del self.__entries[previous]
+                if self.__entries.get(key, slot) != slot:
+                    del keys[self.__entries[key]]
+                keys[slot] = key
+                self.__entries[key] = slot
+                self.__entries.move_to_end(key)
+                self.__journaled += 1
+
+
+    def __allocate(self, dim):
+        """
+        Creates the vector store, copying the vectors of a smaller existing store.
+        :param dim: Dimension of the embeddings.
+        """
+        path = os.path.join(self.path, "vectors.npy")
+        temporary_path = os.path.join(self.path, "vectors.npy.tmp")
+
+        vectors = np.lib.format.open_memmap(temporary_path, mode="w+", dtype=self.dtype,
+                                            shape=(self.max_entries, dim))
+        if self.__vectors is not None:
+            vectors[:self.__vectors.shape[0]] = self.__vectors
+            self.__free = [slot for slot in range(self.max_entries - 1, self.__vectors.shape[0] - 1, -1)]
+        else:
+            self.__free = list(range(self.max_entries - 1, -1, -1))
+
+        vectors.flush()
+        del vectors
+        os.replace(temporary_path, path)
+        self.__vectors = np.lib.format.open_memmap(path, mode="r+")
+
+
+    def __store(self, key, vector):
+        """
+        Writes a vector into a free slot, evicting the least recently used entry when needed.
+        :param key: The cache key.
+        :param vector: The embedding.
+        """
+        if self.__vectors is None:
+            self.__allocate(vector.shape[0])
+
+        if vector.shape[0] != self.__vectors.shape[1]:
+            model_name = key.rpartition(":")[0]
+            raise ValueError(
+                f"The cache at {self.path} stores embeddings of size {self.__vectors.shape[1]}, {model_name} gives "
+                f"{vector.shape[0]}. Use one cache directory per model."
+            )
+
+        slot = self.__entries.get(key)
+        if slot is not None:
+            self.__entries.move_to_end(key)
+        else:
+            if len(self.__entries) >= self.max_entries or not self.__free:
+                _, slot = self.__entries.popitem(last=False)
+                self.evictions += 1
+            else:
+                slot = self.__free.pop()
+            self.__entries[key] = slot
+
+        self.__vectors[slot] = vector
+        self.__journal.write(json.dumps([key, slot]) + "\n")
+        self.__journaled += 1
+
+        # Rewriting the index once the journal outgrows the cache keeps the journal, and the flushes, amortized.
+        if self.__journaled > self.max_entries:
+            self.flush()
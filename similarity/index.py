@@ -0,0 +1,382 @@
+import os
+import json
+import time
+import numpy as np
+from .utils import _normalize, _top_k
+
+
+class ResumeIndex:
+    """
+    A top-k resume index over the normalized embeddings of a similarity encoder.
+    Embeddings are stored in a memory-mapped matrix and searched either exactly, block by block,
+    or approximately through an inverted file of k-means clusters.
+    Adds stay in memory until flush writes the index, deletes and rebuild write it themselves.
+    """
+    def __init__(self, encoder, path, block_size=65536, n_probe=8):
+        """
+        Opens the index directory, creating it when it does not exist.
+        :param encoder: A SentenceTransformerSimilarity or BertSimilarity instance.
+        :param path: Directory holding the embeddings and the index metadata.
+        :param block_size: Number of embeddings scored at once by the exact search.
+        :param n_probe: Default number of clusters visited by the approximate search.
+        """
+        self.encoder = encoder
+        self.path = path
+        self.block_size = block_size
+        self.n_probe = n_probe
+
+        self.__vectors = None
+        self.__count = 0
+        self.__ids = []
+        self.__rows = {}
+        self.__deleted = np.zeros(0, dtype=bool)
+        self.__centroids = None
+        self.__assignments = np.zeros(0, dtype=np.int32)
+
+        os.makedirs(path, exist_ok=True)
+        self.__load()
+
+
+    def __len__(self):
+        return len(self.__rows)
+
+
+    def __contains__(self, resume_id):
+        return resume_id in self.__rows
+
+
+    @property
+    def trained(self):
+        """
+        Whether the clusters of the approximate search were built.
+        """
+        return self.__centroids is not None
+
+
+    def add(self, ids, resumes, batch_size=32):
+        """
+        Encodes resumes and adds them to the index, replacing resumes with the same id.
+        Call flush to write the added resumes to disk.
+        :param ids: List of resume ids, strings or integers.
+        :param resumes: List of resume texts.
+        :param batch_size: Number of resumes encoded per forward pass.
+        """
+        self.add_embeddings(ids, self.encoder.encode_many(resumes, batch_size=batch_size))
+
+
+    def add_embeddings(self, ids, embeddings):
+        """
+        Adds precomputed embeddings to the index, replacing resumes with the same id.
+        An id repeated in the batch keeps its last embedding. Call flush to write the added resumes to disk.
+        :param ids: List of resume ids, strings or integers.
+        :param embeddings: 2-D array of embeddings, one row per id.
+        """
+        ids = list(ids)
+        embeddings = _normalize(embeddings)
+        if len(ids) != len(embeddings):
+            raise ValueError("ids and embeddings must have the same length.")
+
+        if not ids:
+            return
+
+        positions = {resume_id: position for position, resume_id in enumerate(ids)}
+        if len(positions) < len(ids):
+            positions = sorted(positions.values())
+            ids, embeddings = [ids[position] for position in positions], embeddings[positions]
+
+        self.delete([resume_id for resume_id in ids if resume_id in self.__rows], flush=False)
+        self.__reserve(self.__count + len(ids), embeddings.shape[1])
+
+        start, stop = self.__count, self.__count + len(ids)
+        self.__vectors[start:stop] = embeddings
+        self.__deleted[start:stop] = False
+
+        if self.trained:
+            self.__assignments[start:stop] = self.__assign(embeddings)
+
+        for row, resume_id in enumerate(ids, start):
+            self.__rows[resume_id] = row
+        self.__ids.extend(ids)
+        self.__count = stop
+
+
+    def delete(self, ids, flush=True):
+        """
+        Removes resumes from the search results. Their rows are reclaimed by rebuild.
+        :param ids: List of resume ids.
+        :param flush: Write the index to disk.
+        """
+        for resume_id in ids:
+            row = self.__rows.pop(resume_id, None)
+            if row is not None:
+                self.__deleted[row] = True
+
+        if flush:
+            self.flush()
+
+
+    def rebuild(self, n_lists=None, iterations=20, sample_size=None, seed=0):
+        """
+        Compacts away deleted rows and trains the clusters of the approximate search.
+        :param n_lists: Number of clusters, 4 * sqrt(size) when None and no clusters when 0.
+        :param iterations: Number of k-means iterations.
+        :param sample_size: Number of embeddings used for training, 256 per cluster when None.
+        :param seed: Seed of the random training sample and initial centroids.
+        """
+        keep = np.flatnonzero(~self.__deleted[:self.__count])
+        if len(keep) < self.__count:
+            self.__compact(keep)
+
+        if n_lists is None:
+            n_lists = int(4 * np.sqrt(self.__count))
+        n_lists = min(n_lists, self.__count)
+
+        if n_lists < 1:
+            self.__centroids = None
+            self.__assignments = np.zeros(0, dtype=np.int32)
+            self.flush()
+            return
+
+        random = np.random.default_rng(seed)
+        sample_size = min(self.__count, sample_size or 256 * n_lists)
+        sample = np.asarray(self.__vectors[np.sort(random.choice(self.__count, sample_size, replace=False))])
+
+        centroids = sample[random.choice(len(sample), n_lists, replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=n_lists) == 0
+            # Empty clusters are re-seeded from random sample points.
+            sums[empty] = sample[random.choice(len(sample), int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        self.__centroids = centroids
+        self.__assignments = np.full(len(self.__deleted), -1, dtype=np.int32)
+        for start in range(0, self.__count, self.block_size):
+            stop = min(start + self.block_size, self.__count)
+            self.__assignments[start:stop] = self.__assign(self.__vectors[start:stop])
+
+        self.flush()
+
+
+    def search(self, job_description, top_k=10, exact=True, n_probe=None):
+        """
+        Finds the resumes closest to a job description.
+        :param job_description: The job description text.
+        :param top_k: Number of resumes to return.
+        :param exact: Score every resume when True, only the probed clusters otherwise.
+        :param n_probe: Number of clusters visited by the approximate search.
+        :return: Tuple of the cosine similarity array and the matching resume ids.
+        """
+        query = self.encoder.encode_many([job_description], batch_size=1)[0]
+
+        return self.search_embedding(query, top_k=top_k, exact=exact, n_probe=n_probe)
+
+
+    def search_embedding(self, query, top_k=10, exact=True, n_probe=None):
+        """
+        Finds the resumes closest to a query embedding.
+        :param query: The query embedding.
+        :param top_k: Number of resumes to return.
+        :param exact: Score every resume when True, only the probed clusters otherwise.
+        :param n_probe: Number of clusters visited by the approximate search.
+        :return: Tuple of the cosine similarity array and the matching resume ids.
+        """
+        query = _normalize(np.asarray(query).reshape(1, -1))[0]
+
+        if exact or not self.trained:
+            rows, scores = self.__search_exact(query, top_k)
+        else:
+            rows, scores = self.__search_approximate(query, top_k, n_probe or self.n_probe)
+
+        return scores, [self.__ids[row] for row in rows]
+
+
+    def recall(self, queries, top_k=10, n_probe=None, batch_size=32):
+        """
+        Measures how many of the exact top-k results the approximate search finds, and how fast both are.
+        :param queries: List of job description texts.
+        :param top_k: Number of resumes compared per query.
+        :param n_probe: Number of clusters visited by the approximate search.
+        :param batch_size: Number of queries encoded per forward pass.
+        :return: Dictionary with the mean recall and the mean latency of both searches in milliseconds.
+        """
+        if not self.trained:
+            raise RuntimeError("The index has no clusters, call rebuild first.")
+
+        embeddings = self.encoder.encode_many(queries, batch_size=batch_size)
+
+        recalls = []
+        exact_seconds = approximate_seconds = 0.0
+        for query in embeddings:
+            start = time.perf_counter()
+            _, expected = self.search_embedding(query, top_k=top_k, exact=True)
+            exact_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            _, found = self.search_embedding(query, top_k=top_k, exact=False, n_probe=n_probe)
+            approximate_seconds += time.perf_counter() - start
+
+            if expected:
+                recalls.append(len(set(expected) & set(found)) / len(expected))
+
+        count = max(len(embeddings), 1)
+        return {
+            "recall": float(np.mean(recalls)) if recalls else 1.0,
+            "exact_ms": 1000 * exact_seconds / count,
+            "approximate_ms": 1000 * approximate_seconds / count,
+            "n_probe": n_probe or self.n_probe,
+        }
+
+
+    def flush(self):
+        """
+        Writes the embeddings and the index metadata to disk.
+        """
+        if self.__vectors is None:
+            return
+
+        self.__vectors.flush()
+        np.save(os.path.join(self.path, "deleted.npy"), self.__deleted[:self.__count])
+
+        if self.trained:
+            np.save(os.path.join(self.path, "centroids.npy"), self.__centroids)
+            np.save(os.path.join(self.path, "assignments.npy"), self.__assignments[:self.__count])
+        else:
+            for name in ("centroids.npy", "assignments.npy"):
+                if os.path.exists(os.path.join(self.path, name)):
+                    os.remove(os.path.join(self.path, name))
+
+        metadata = {"count": self.__count, "dim": self.__vectors.shape[1], "ids": self.__ids}
+        temporary_path = os.path.join(self.path, "index.json.tmp")
+        with open(temporary_path, "w") as file:
+            json.dump(metadata, file)
+        os.replace(temporary_path, os.path.join(self.path, "index.json"))
+
+
+    def __search_exact(self, query, top_k):
+        """
+        Scores every live embedding block by block, keeping the running top-k.
+        :param query: The normalized query embedding.
+        :param top_k: Number of resumes to return.
+        :return: Tuple of the best rows and their scores.
+        """
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+
+        for start in range(0, self.__count, self.block_size):
+            stop = min(start + self.block_size, self.__count)
+            scores = self.__vectors[start:stop] @ query
+            scores[self.__deleted[start:stop]] = -np.inf
+
+            rows = np.concatenate([best_rows, np.arange(start, stop)])
+            scores = np.concatenate([best_scores, scores])
+            best = _top_k(scores, top_k)
+            best_rows, best_scores = rows[best], scores[best]
+
+        live = np.isfinite(best_scores)
+        return best_rows[live], best_scores[live]
+
+
+    def __search_approximate(self, query, top_k, n_probe):
+        """
+        Scores only the embeddings of the clusters closest to the query.
+        :param query: The normalized query embedding.
+        :param top_k: Number of resumes to return.
+        :param n_probe: Number of clusters to visit.
+        :return: Tuple of the best rows and their scores.
+        """
+        probes = _top_k(self.__centroids @ query, n_probe)
+        assignments = self.__assignments[:self.__count]
+        rows = np.flatnonzero(np.isin(assignments, probes) & ~self.__deleted[:self.__count])
+
+        scores = self.__vectors[rows] @ query
+        best = _top_k(scores, top_k)
+
+        return rows[best], scores[best]
+
+
+    def __assign(self, embeddings):
+        """
+        Finds the closest cluster of each embedding.
+        :param embeddings: 2-D array of normalized embeddings.
+        :return: Array of cluster numbers.
+        """
+        return np.argmax(np.asarray(embeddings) @ self.__centroids.T, axis=1).astype(np.int32)
+
+
+    def __reserve(self, size, dim):
+        """
+        Grows the memory-mapped matrix, doubling its capacity, so it can hold size embeddings.
+        :param size: Number of embeddings to hold.
+        :param dim: Dimension of the embeddings.
+        """
+        if self.__vectors is not None and self.__vectors.shape[1] != dim:
+            raise ValueError(f"Expected embeddings of size {self.__vectors.shape[1]}, got {dim}.")
+
+        capacity = 0 if self.__vectors is None else self.__vectors.shape[0]
+        if size <= capacity:
+            return
+
+        capacity = max(size, 2 * capacity, 1024)
+        path = os.path.join(self.path, "vectors.npy")
+        temporary_path = os.path.join(self.path, "vectors.npy.tmp")
+
+        vectors = np.lib.format.open_memmap(temporary_path, mode="w+", dtype=np.float32, shape=(capacity, dim))
+        if self.__vectors is not None:
+            vectors[:self.__count] = self.__vectors[:self.__count]
+        vectors.flush()
+        del vectors
+
+        os.replace(temporary_path, path)
+        self.__vectors = np.lib.format.open_memmap(path, mode="r+")
+        self.__deleted = np.concatenate([self.__deleted, np.ones(capacity - len(self.__deleted), dtype=bool)])
+        if self.trained:
+            padding = np.full(capacity - len(self.__assignments), -1, dtype=np.int32)
+            self.__assignments = np.concatenate([self.__assignments, padding])
+
+
+    def __compact(self, keep):
+        """
+        Moves the live embeddings to the front of the matrix.
+        :param keep: Sorted array of the live rows.
+        """
+        for start in range(0, len(keep), self.block_size):
+            rows = keep[start:start + self.block_size]
+            self.__vectors[start:start + len(rows)] = self.__vectors[rows]
+
+        self.__ids = [self.__ids[row] for row in keep]
+        self.__rows = {resume_id: row for row, resume_id in enumerate(self.__ids)}
+        self.__count = len(keep)
+        self.__deleted[:] = True
+        self.__deleted[:self.__count] = False
+
+
+    def __load(self):
+        """
+        Reads the embeddings and the metadata of an existing index.
+        """
+        metadata_path = os.path.join(self.path, "index.json")
+        if not os.path.exists(metadata_path):
+            return
+
+        with open(metadata_path) as file:
+            metadata = json.load(file)
+
+        self.__vectors = np.lib.format.open_memmap(os.path.join(self.path, "vectors.npy"), mode="r+")
+        self.__count = metadata["count"]
+        self.__ids = metadata["ids"]
+
+        capacity = self.__vectors.shape[0]
+        self.__deleted = np.ones(capacity, dtype=bool)
+        self.__deleted[:self.__count] = np.load(os.path.join(self.path, "deleted.npy"))
+        self.__rows = {
+            resume_id: row for row, resume_id in enumerate(self.__ids) if not self.__deleted[row]
+        }
+
+        centroids_path = os.path.join(self.path, "centroids.npy")
+        if os.path.exists(centroids_path):
+            self.__centroids = np.load(centroids_path)
+            self.__assignments = np.full(capacity, -1, dtype=np.int32)
+            self.__assignments[:self.__count] = np.load(os.path.join(self.path, "assignments.npy"))
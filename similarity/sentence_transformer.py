@@ -0,0 +1,101 @@
+from sentence_transformers import SentenceTransformer
+from sentence_transformers.util import cos_sim
+from resources.precision import apply_precision
+from resources.pool import POOL
+from instrumentation import span, DOCUMENTS
+from .utils import _cosine_batch_similarity
+
+
+class SentenceTransformerSimilarity:
+    """
+    A class for computing sentence similarity using a SentenceTransformer model.
+    """
+    def __init__(self, model_name="all-MiniLM-L6-v2", cache=None, precision="float32", pool=None):
+        """
+        Initializes the SentenceTransformerSimilarity with a given model, loaded into the pool on first use.
+        :param model_name: The name of the pretrained SentenceTransformer model
+        :param cache: Optional EmbeddingCache reused across calls and runs, by one process at a time.
+        :param precision: Inference precision on CPU: float32, bfloat16 or int8.
+        :param pool: The ModelPool holding the model, the process-wide pool when None.
+        """
+        self.model_name = model_name
+        self.precision = precision
+        self.pool = pool or POOL
+        self.cache = cache
+        self.__model_key = f"sentence-transformer:{model_name}#precision={precision}"
+
+        # Reduced precision embeddings drift from float32 ones, so they get their own cache entries.
+        self.cache_name = model_name if precision == "float32" else f"{model_name}#precision={precision}"
+
+
+    @property
+    def model(self):
+        """
+        The SentenceTransformer model, loaded into the pool when it is not resident.
+        """
+        return self.pool.get(self.__model_key, self.__load)
+
+
+    def encode(self, sentence):
+        """
+        Encodes a sentence into a dense vector representation.
+        :param sentence: Input sentence to encode.
+        :return: Embedding vector of the sentence.
+        """
+        if self.cache is not None and isinstance(sentence, str):
+            return self.encode_many([sentence])[0]
+
+        DOCUMENTS.inc(1 if isinstance(sentence, str) else len(sentence), stage="embed_sentence_transformer")
+        with self.pool.lease(self.__model_key, self.__load) as model, span("embed_sentence_transformer"):
+            return model.encode(sentence)
+
+
+    def encode_many(self, sentences, batch_size=32):
+        """
+        Encodes a list of sentences with batched forward passes.
+        :param sentences: List of sentences to encode.
+        :param batch_size: Number of sentences per forward pass.
+        :return: Array of embeddings, one row per sentence.
+        """
+        def encode(texts):
+            DOCUMENTS.inc(len(texts), stage="embed_sentence_transformer")
+            with self.pool.lease(self.__model_key, self.__load) as model, span("embed_sentence_transformer"):
+                return model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+        if self.cache is None:
+            return encode(list(sentences))
+
+        return self.cache.get_or_encode(self.cache_name, sentences, encode)
+
+
+    def similarity(self, sentence1, sentence2):
+        """
+        Calculates cosine similarity between two sentence.
+        :param sentence1: First sentence text.
+        :param sentence2: Second sentence text.
+        :return: Cosine similarity score between the two sentence.
+        """
+        embedding1 = self.encode(sentence1)
+        embedding2 = self.encode(sentence2)
+
+        return cos_sim(embedding1, embedding2).item()
+
+
+    def batch_similarity(self, job_description, resumes, batch_size=32, top_k=None):
+        """
+        Scores one job description against many resumes, encoding the job description once.
+        :param job_description: The job description text.
+        :param resumes: List or iterator of resume texts.
+        :param batch_size: Number of resumes encoded per mini-batch.
+        :param top_k: Number of best resume indices to return, all when None.
+        :return: Tuple of the cosine similarity array and the top-k resume indices.
+        """
+        return _cosine_batch_similarity(self.encode_many, job_description, resumes, batch_size, top_k)
+
+
+    def __load(self):
+        """
+        Loads the model at the inference precision.
+        :return: The SentenceTransformer model.
+        """
+        return apply_precision(SentenceTransformer(self.model_name), self.precision)
@@ -0,0 +1,212 @@
+import os
+import json
+import math
+import numpy as np
+from collections import Counter
+from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
+from instrumentation import timed
+from .utils import _batched, _top_k
+
+
+class TFIDFSimilarity:
+    """
+    A class for computing sentence similarity using a TFIDF model.
+    """
+    def __init__(self, path=None):
+        """
+        Initializes the TfidfVectorizer.
+        :param path: Optional directory of a corpus index written by save, loaded when it exists.
+        """
+        self.model = TfidfVectorizer(ngram_range=(1, 1))
+        self.corpus = None
+
+        if path is not None and os.path.exists(os.path.join(path, "tfidf.json")):
+            self.load(path)
+
+
+    @property
+    def fitted(self):
+        """
+        Whether the vectorizer was fitted on a resume corpus.
+        """
+        return self.corpus is not None
+
+
+    def fit(self, corpus):
+        """
+        Fits the vocabulary and IDF on a resume corpus and keeps the corpus as a sparse matrix.
+        :param corpus: List or iterator of resume texts.
+        :return: The TFIDFSimilarity instance.
+        """
+        self.corpus = self.model.fit_transform(corpus).tocsr()
+        return self
+
+
+    def add(self, resumes):
+        """
+        Appends resumes to the fitted corpus using the existing vocabulary and IDF.
+        Terms outside the fitted vocabulary are ignored.
+        :param resumes: List or iterator of resume texts.
+        :return: Array of the corpus indices of the added resumes.
+        """
+        self.__check_fitted()
+
+        start = self.corpus.shape[0]
+        self.corpus = sparse.vstack([self.corpus, self.model.transform(resumes)], format="csr")
+
+        return np.arange(start, self.corpus.shape[0])
+
+
+    def search(self, job_description, top_k=10):
+        """
+        Scores a job description against every resume of the fitted corpus with one sparse product.
+        :param job_description: The job description text.
+        :param top_k: Number of best resume indices to return, all when None.
+        :return: Tuple of the cosine similarity array and the top-k corpus indices.
+        """
+        self.__check_fitted()
+
+        query = self.model.transform([job_description])
+        scores = (self.corpus @ query.T).toarray().ravel()
+
+        return scores, _top_k(scores, top_k)
+
+
+    def save(self, path):
+        """
+        Writes the vocabulary, the IDF and the corpus matrix to a directory.
+        :param path: The directory to write to.
+        """
+        self.__check_fitted()
+        os.makedirs(path, exist_ok=True)
+
+        index = {
+            "ngram_range": list(self.model.ngram_range),
+            "vocabulary": {term: int(position) for term, position in self.model.vocabulary_.items()},
+        }
+        with open(os.path.join(path, "tfidf.json"), "w") as file:
+            json.dump(index, file)
+
+        np.save(os.path.join(path, "idf.npy"), self.model.idf_)
+        sparse.save_npz(os.path.join(path, "corpus.npz"), self.corpus)
+
+
+    def load(self, path):
+        """
+        Reads a vocabulary, IDF and corpus matrix written by save.
+        :param path: The directory to read from.
+        :return: The TFIDFSimilarity instance.
+        """
+        with open(os.path.join(path, "tfidf.json")) as file:
+            index = json.load(file)
+
+        self.model = TfidfVectorizer(ngram_range=tuple(index["ngram_range"]), vocabulary=index["vocabulary"])
+        self.model.idf_ = np.load(os.path.join(path, "idf.npy"))
+        self.corpus = sparse.load_npz(os.path.join(path, "corpus.npz")).tocsr()
+
+        return self
+
+
+    def encode(self, sentence1, sentence2):
+        """
+        Encode the sentence1 and sentence2 using the TFIDF model.
+        Uses the corpus IDF once the model is fitted, otherwise fits on the two sentences.
+        :param sentence1: The first sentence.
+        :param sentence2: The second sentence.
+        :return: The encode vector of the sentence1 and sentence2.
+        """
+        if self.fitted:
+            encodes = self.model.transform([sentence1, sentence2])
+        else:
+            encodes = self.model.fit_transform([sentence1, sentence2])
+
+        return encodes[0], encodes[1]
+
+
+    @timed("similarity_tfidf")
+    def similarity(self, sentence1, sentence2):
+        """
+        Calculates cosine similarity between two sentence.
+        :param sentence1: First sentence text.
+        :param sentence2: Second sentence text.
+        :return: Cosine similarity score between the two sentence.
+        """
+        embedding1, embedding2 = self.encode(sentence1, sentence2)
+
+        return cosine_similarity(embedding1, embedding2)[0][0]
+
+
+    @timed("similarity_tfidf_batch")
+    def batch_similarity(self, job_description, resumes, batch_size=256, top_k=None):
+        """
+        Scores one job description against many resumes.
+        A fitted model scores with the corpus IDF. Otherwise every score equals similarity(job_description, resume):
+        the IDF of a two document fit is 1 for terms shared by both documents and ln(3/2) + 1 otherwise,
+        so the pairwise scores are computed in closed form from sparse term counts instead of refitting per pair.
+        :param job_description: The job description text.
+        :param resumes: List or iterator of resume texts.
+        :param batch_size: Number of resumes counted per mini-batch.
+        :param top_k: Number of best resume indices to return, all when None.
+        :return: Tuple of the score array and the top-k resume indices.
+        """
+        if self.fitted:
+            query = self.model.transform([job_description])
+            scores = [
+                (self.model.transform(batch) @ query.T).toarray().ravel()
+                for batch in _batched(resumes, batch_size)
+            ]
+            scores = np.concatenate(scores) if scores else np.empty(0)
+
+            return scores, _top_k(scores, top_k)
+
+        analyzer = self.model.build_analyzer()
+        job_counts = Counter(analyzer(job_description))
+        job_square = float(sum(count * count for count in job_counts.values()))
+
+        unique_idf = math.log(3 / 2) + 1
+        unique_weight = unique_idf ** 2 - 1
+
+        scores = []
+        for batch in _batched(resumes, batch_size):
+            vectorizer = CountVectorizer(analyzer=analyzer)
+            try:
+                counts = vectorizer.fit_transform(batch).astype(np.float64)
+            except ValueError:
+                # Every resume in the batch is empty, so none shares a term with the job description.
+                scores.append(np.zeros(len(batch)))
+                continue
+
+            job_vector = np.zeros(len(vectorizer.vocabulary_))
+            for term, count in job_counts.items():
+                index = vectorizer.vocabulary_.get(term)
+                if index is not None:
+                    job_vector[index] = count
+
+            shared = counts.multiply(job_vector > 0).tocsr()
+            shared.eliminate_zeros()
+            dot = counts @ job_vector
+            resume_square = np.asarray(counts.multiply(counts).sum(axis=1)).ravel()
+            resume_shared = np.asarray(shared.multiply(shared).sum(axis=1)).ravel()
+            job_shared = (shared > 0).astype(np.float64) @ (job_vector ** 2)
+
+            resume_norm = np.sqrt(unique_idf ** 2 * resume_square - unique_weight * resume_shared)
+            job_norm = np.sqrt(unique_idf ** 2 * job_square - unique_weight * job_shared)
+            denominator = resume_norm * job_norm
+
+            batch_scores = np.zeros(len(batch))
+            np.divide(dot, denominator, out=batch_scores, where=denominator > 0)
+            scores.append(batch_scores)
+
+        scores = np.concatenate(scores) if scores else np.empty(0)
+
+        return scores, _top_k(scores, top_k)
+
+
+    def __check_fitted(self):
+        """
+        Raises an error when the vectorizer was not fitted on a resume corpus.
+        """
+        if not self.fitted:
+            raise RuntimeError("The TF-IDF index is not fitted, call fit with a resume corpus first.")
@@ -0,0 +1,70 @@
+import numpy as np
+from itertools import islice
+
+
+def _batched(iterable, batch_size):
+    """
+    Splits an iterable into lists of at most batch_size items.
+    :param iterable: The list or iterator to split.
+    :param batch_size: The maximum number of items per batch.
+    :return: Generator of lists.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer.")
+
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _top_k(scores, top_k=None):
+    """
+    Returns the indices of the highest scores in descending order.
+    :param scores: 1-D array of scores.
+    :param top_k: Number of indices to return, all when None.
+    :return: Array of indices sorted by descending score.
+    """
+    if top_k is None or top_k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def _normalize(embeddings):
+    """
+    Scales embeddings to unit length so a dot product is the cosine similarity.
+    :param embeddings: 2-D array of embeddings.
+    :return: Array of unit length embeddings.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def _cosine_batch_similarity(encode_many, job_description, resumes, batch_size, top_k):
+    """
+    Encodes the job description once and scores it against mini-batches of resumes.
+    :param encode_many: Function that encodes a list of texts into a 2-D array.
+    :param job_description: The job description text.
+    :param resumes: List or iterator of resume texts.
+    :param batch_size: Number of resumes encoded per mini-batch.
+    :param top_k: Number of best resume indices to return, all when None.
+    :return: Tuple of the cosine similarity array and the top-k resume indices.
+    """
+    job_embedding = _normalize(encode_many([job_description], batch_size=1))[0]
+
+    scores = [
+        _normalize(encode_many(batch, batch_size=batch_size)) @ job_embedding
+        for batch in _batched(resumes, batch_size)
+    ]
+    scores = np.concatenate(scores) if scores else np.empty(0, dtype=np.float32)
+
+    return scores, _top_k(scores, top_k)
@@ -1,3 +1,11 @@
-from .matcher import SkillListMatcher, SkillDynamicMatcher
+from resources.lazy import lazy_exports
 
-__all__ = ["SkillListMatcher", "SkillDynamicMatcher"]
\ No newline at end of file
+_EXPORTS = {
+    "SkillListMatcher": ".matcher",
+    "SkillDynamicMatcher": ".matcher",
+    "SkillIndex": ".skill_index",
+    "InvertedSkillIndex": ".inverted_index",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
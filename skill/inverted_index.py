@@ -0,0 +1,428 @@
+import os
+import re
+import json
+import numpy as np
+
+# Quoted skills, parentheses and bare words of a query.
+_QUERY_TOKEN = re.compile(r'"([^"]*)"|(\()|(\))|([^\s()"]+)')
+_OPERATORS = ("AND", "OR", "NOT")
+
+
+def normalize_skill(skill):
+    """
+    Normalizes a skill for the index: lower case with single spaces.
+    :param skill: The skill string.
+    :return: The normalized skill.
+    """
+    return " ".join(skill.lower().split())
+
+
+def _tokenize(query):
+    """
+    Splits a query into operators, parentheses and skills. Consecutive bare words form one skill,
+    so machine learning AND python has the skills machine learning and python.
+    :param query: The query text.
+    :return: List of (kind, value) tuples, kind being AND, OR, NOT, (, ) or skill.
+    """
+    tokens, words = [], []
+
+    def flush():
+        if words:
+            tokens.append(("skill", normalize_skill(" ".join(words))))
+            words.clear()
+
+    for quoted, opening, closing, word in _QUERY_TOKEN.findall(query):
+        if word and word.upper() not in _OPERATORS:
+            words.append(word)
+            continue
+
+        flush()
+        if word:
+            tokens.append((word.upper(), word))
+        elif opening or closing:
+            tokens.append((opening or closing, opening or closing))
+        else:
+            tokens.append(("skill", normalize_skill(quoted)))
+
+    flush()
+    return tokens
+
+
+class _QueryParser:
+    """
+    Recursive descent parser of boolean skill queries, NOT binding tighter than AND and AND tighter than OR:
+    expression = term (OR term)*, term = factor (AND factor)*, factor = NOT factor | ( expression ) | skill.
+    """
+    def __init__(self, query):
+        """
+        Tokenizes the query.
+        :param query: The query text.
+        """
+        self.tokens = _tokenize(query)
+        self.position = 0
+
+
+    def parse(self):
+        """
+        Parses the whole query.
+        :return: The query tree of ("or", children), ("and", children), ("not", child) and ("skill", name) nodes.
+        """
+        if not self.tokens:
+            raise ValueError("The query is empty.")
+
+        tree = self.__expression()
+        if self.position < len(self.tokens):
+            raise ValueError(f"Unexpected {self.tokens[self.position][1]!r} in the query.")
+
+        return tree
+
+
+    def __expression(self):
+        """
+        Parses terms joined by OR.
+        :return: The query tree.
+        """
+        children = [self.__term()]
+        while self.__accept("OR"):
+            children.append(self.__term())
+
+        return children[0] if len(children) == 1 else ("or", children)
+
+
+    def __term(self):
+        """
+        Parses factors joined by AND.
+        :return: The query tree.
+        """
+        children = [self.__factor()]
+        while self.__accept("AND"):
+            children.append(self.__factor())
+
+        return children[0] if len(children) == 1 else ("and", children)
+
+
+    def __factor(self):
+        """
+        Parses a negation, a parenthesized expression or a skill.
+        :return: The query tree.
+        """
+        if self.__accept("NOT"):
+            return "not", self.__factor()
+
+        if self.__accept("("):
+            tree = self.__expression()
+            if not self.__accept(")"):
+                raise ValueError("A parenthesis is not closed in the query.")
+            return tree
+
+        if self.position < len(self.tokens) and self.tokens[self.position][0] == "skill":
+            self.position += 1
+            return "skill", self.tokens[self.position - 1][1]
+
+        found = self.tokens[self.position][1] if self.position < len(self.tokens) else "end of query"
+        raise ValueError(f"Expected a skill, found {found!r} in the query.")
+
+
+    def __accept(self, kind):
+        """
+        Consumes the next token when it is of a kind.
+        :param kind: The token kind.
+        :return: Whether the token was consumed.
+        """
+        if self.position < len(self.tokens) and self.tokens[self.position][0] == kind:
+            self.position += 1
+            return True
+
+        return False
+
+
+class InvertedSkillIndex:
+    """
+    An inverted index from normalized skill to the sorted array of the resumes having it.
+    Resumes get increasing internal numbers, so inserts append to the posting lists and keep them sorted.
+    Boolean queries intersect, merge and subtract the posting lists, and ranking counts how many
+    of the skills of a job description every resume covers, without running the extractors again.
+    Adds stay in memory until flush writes the index, deletes and compact write it themselves.
+    """
+    def __init__(self, path=None):
+        """
+        Opens the index directory, creating it when it does not exist.
+        :param path: Directory holding the posting lists, the index is kept in memory only when None.
+        """
+        self.path = path
+
+        self.__ids = []
+        self.__numbers = {}
+        self.__deleted = np.zeros(0, dtype=bool)
+        self.__postings = {}
+        self.__appended = {}
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            self.__load()
+
+
+    def __len__(self):
+        return len(self.__numbers)
+
+
+    def __contains__(self, resume_id):
+        return resume_id in self.__numbers
+
+
+    @property
+    def skills(self):
+        """
+        The indexed skills, sorted.
+        """
+        return sorted(set(self.__postings) | set(self.__appended))
+
+
+    def add(self, ids, skill_lists):
+        """
+        Adds the skills of resumes, replacing resumes with the same id. An id repeated in the batch keeps its
+        last skill list and position. Call flush to write the added resumes to disk.
+        :param ids: List of resume ids, strings or integers.
+        :param skill_lists: List of skill lists, one per id.
+        """
+        ids, skill_lists = list(ids), list(skill_lists)
+        if len(ids) != len(skill_lists):
+            raise ValueError("ids and skill_lists must have the same length.")
+
+        if not ids:
+            return
+
+        # A repeated id is added as often as it appears, so its last skill list and position win.
+        batch = {}
+        for resume_id, skills in zip(ids, skill_lists):
+            batch.pop(resume_id, None)
+            batch[resume_id] = skills
+        ids, skill_lists = list(batch), list(batch.values())
+
+        self.delete([resume_id for resume_id in ids if resume_id in self.__numbers], flush=False)
+
+        start = len(self.__ids)
+        self.__deleted = np.concatenate([self.__deleted, np.zeros(len(ids), dtype=bool)])
+        for number, (resume_id, skills) in enumerate(zip(ids, skill_lists), start):
+            self.__numbers[resume_id] = number
+            self.__ids.append(resume_id)
+            for skill in {normalize_skill(skill) for skill in skills}:
+                self.__appended.setdefault(skill, []).append(number)
+
+
+    def add_texts(self, ids, texts, matcher, skills=None, batch_size=32):
+        """
+        Extracts the skills of resume texts with a matcher and adds them, call flush to write them to disk.
+        :param ids: List of resume ids.
+        :param texts: List of resume texts.
+        :param matcher: A SkillDynamicMatcher, or a SkillListMatcher together with skills.
+        :param skills: The reference skill list, or its SkillIndex, of a SkillListMatcher.
+        :param batch_size: Number of texts per NER batch.
+        """
+        if skills is None:
+            skill_lists = list(matcher.extract_many(texts, batch_size=batch_size))
+        else:
+            skills = matcher.compile(skills) if isinstance(skills, (list, tuple)) else skills
+            skill_lists = [matcher.extract(text, skills) for text in texts]
+
+        self.add(ids, skill_lists)
+
+
+    def delete(self, ids, flush=True):
+        """
+        Removes resumes from the query results. Their numbers are reclaimed by compact.
+        :param ids: List of resume ids.
+        :param flush: Write the index to disk.
+        """
+        for resume_id in ids:
+            number = self.__numbers.pop(resume_id, None)
+            if number is not None:
+                self.__deleted[number] = True
+
+        if flush:
+            self.flush()
+
+
+    def postings(self, skill):
+        """
+        The resumes having a skill, deleted resumes included.
+        :param skill: The skill.
+        :return: Sorted array of resume numbers.
+        """
+        skill = normalize_skill(skill)
+        postings = self.__postings.get(skill)
+        appended = self.__appended.pop(skill, None)
+        if appended is not None:
+            appended = np.asarray(appended, dtype=np.uint32)
+            postings = appended if postings is None else np.concatenate([postings, appended])
+            self.__postings[skill] = postings
+
+        return postings if postings is not None else np.zeros(0, dtype=np.uint32)
+
+
+    def query(self, query):
+        """
+        Finds the resumes matching a boolean skill query, such as python AND spark AND NOT junior.
+        Operators are AND, OR and NOT in any case, with parentheses. Consecutive words form one skill,
+        quotes keep operator words inside a skill, such as "research and development".
+        :param query: The query text.
+        :return: List of resume ids, in insertion order.
+        """
+        numbers = self.__evaluate(_QueryParser(query).parse())
+        return [self.__ids[number] for number in self.__live(numbers)]
+
+
+    def rank(self, job_skills, top_k=10, query=None):
+        """
+        Ranks the resumes by the share of the skills of a job description they have.
+        :param job_skills: The skills of the job description.
+        :param top_k: Number of resumes returned, all the resumes with a matching skill when None.
+        :param query: Optional boolean query the resumes must match.
+        :return: List of (resume id, match ratio, match string) tuples, best first.
+        """
+        job_skills = {normalize_skill(skill) for skill in job_skills}
+        if not job_skills or not self.__numbers:
+            return []
+
+        postings = [self.postings(skill) for skill in job_skills]
+        counts = np.bincount(np.concatenate(postings).astype(np.int64), minlength=len(self.__ids))
+        counts[self.__deleted] = 0
+
+        if query is not None:
+            allowed = np.zeros(len(self.__ids), dtype=bool)
+            allowed[self.__evaluate(_QueryParser(query).parse())] = True
+            counts[~allowed] = 0
+
+        numbers = np.flatnonzero(counts)
+        if top_k is not None and top_k < len(numbers):
+            # Resumes tied with the last one kept are taken in insertion order, like the ranking of every resume.
+            kth = np.partition(counts[numbers], len(numbers) - top_k)[len(numbers) - top_k]
+            above = numbers[counts[numbers] > kth]
+            tied = numbers[counts[numbers] == kth][:top_k - len(above)]
+            numbers = np.concatenate([above, tied])
+        numbers = numbers[np.lexsort((numbers, -counts[numbers]))]
+
+        total = len(job_skills)
+        return [
+            (self.__ids[number], int(counts[number]) / total, f"{int(counts[number])}/{total}") for number in numbers
+        ]
+
+
+    def compact(self):
+        """
+        Renumbers the resumes, dropping the deleted ones from the posting lists.
+        """
+        keep = np.flatnonzero(~self.__deleted)
+        renumber = np.full(len(self.__ids), -1, dtype=np.int64)
+        renumber[keep] = np.arange(len(keep))
+
+        postings = {}
+        for skill in self.skills:
+            live = renumber[self.postings(skill)]
+            live = live[live >= 0].astype(np.uint32)
+            if len(live):
+                postings[skill] = live
+
+        self.__ids = [self.__ids[number] for number in keep]
+        self.__numbers = {resume_id: number for number, resume_id in enumerate(self.__ids)}
+        self.__deleted = np.zeros(len(self.__ids), dtype=bool)
+        self.__postings, self.__appended = postings, {}
+
+        self.flush()
+
+
+    def flush(self):
+        """
+        Writes the posting lists and the resume ids to disk, as one concatenated array with the offset of every skill.
+        """
+        if self.path is None:
+            return
+
+        skills = self.skills
+        postings = [self.postings(skill) for skill in skills]
+        offsets = np.cumsum([0] + [len(posting) for posting in postings], dtype=np.int64)
+        values = np.concatenate(postings) if postings else np.zeros(0, dtype=np.uint32)
+
+        np.save(os.path.join(self.path, "postings.npy"), values.astype(np.uint32))
+        np.save(os.path.join(self.path, "offsets.npy"), offsets)
+        np.save(os.path.join(self.path, "deleted.npy"), self.__deleted)
+
+        metadata = {"ids": self.__ids, "skills": skills}
+        temporary_path = os.path.join(self.path, "skills.json.tmp")
+        with open(temporary_path, "w") as file:
+            json.dump(metadata, file)
+        os.replace(temporary_path, os.path.join(self.path, "skills.json"))
+
+
+    def __evaluate(self, tree):
+        """
+        Evaluates a query tree on the posting lists.
+        :param tree: A node of the query tree.
+        :return: Sorted array of resume numbers, deleted resumes included.
+        """
+        kind, value = tree
+        if kind == "skill":
+            return self.postings(value)
+
+        if kind == "not":
+            return np.setdiff1d(self.__all(), self.__evaluate(value), assume_unique=True)
+
+        if kind == "or":
+            result = self.__evaluate(value[0])
+            for child in value[1:]:
+                result = np.union1d(result, self.__evaluate(child))
+            return result
+
+        # NOT operands of an AND are subtracted instead of complemented, and the shortest lists are intersected first.
+        included = [self.__evaluate(child) for child in value if child[0] != "not"]
+        excluded = [self.__evaluate(child[1]) for child in value if child[0] == "not"]
+
+        included.sort(key=len)
+        result = included[0] if included else self.__all()
+        for postings in included[1:]:
+            result = np.intersect1d(result, postings, assume_unique=True)
+        for postings in excluded:
+            result = np.setdiff1d(result, postings, assume_unique=True)
+
+        return result
+
+
+    def __all(self):
+        """
+        Every resume number.
+        :return: Sorted array of resume numbers.
+        """
+        return np.arange(len(self.__ids), dtype=np.uint32)
+
+
+    def __live(self, numbers):
+        """
+        Drops the deleted resumes.
+        :param numbers: Array of resume numbers.
+        :return: The numbers of the resumes not deleted.
+        """
+        return numbers[~self.__deleted[numbers]] if len(numbers) else numbers
+
+
+    def __load(self):
+        """
+        Reads the posting lists and the resume ids of an existing index.
+        """
+        metadata_path = os.path.join(self.path, "skills.json")
+        if not os.path.exists(metadata_path):
+            return
+
+        with open(metadata_path) as file:
+            metadata = json.load(file)
+
+        values = np.load(os.path.join(self.path, "postings.npy"))
+        offsets = np.load(os.path.join(self.path, "offsets.npy"))
+
+        self.__ids = metadata["ids"]
+        self.__deleted = np.load(os.path.join(self.path, "deleted.npy"))
+        self.__numbers = {
+            resume_id: number for number, resume_id in enumerate(self.__ids) if not self.__deleted[number]
+        }
+        self.__postings = {
+            skill: values[offsets[position]:offsets[position + 1]] for position, skill in enumerate(metadata["skills"])
+        }
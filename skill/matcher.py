@@ -1,23 +1,66 @@
-import spacy
-from rapidfuzz import process
-from nltk import ngrams
-from nltk.tokenize import word_tokenize
-from huggingface_hub import snapshot_download
+import re
+from collections import OrderedDict
+from resources import load_spacy, lease_spacy, load_ner_model, lease_ner_model, LEMMATIZER_EXCLUDE
+from instrumentation import timed, TOKENS
+from .skill_index import SkillIndex
+
+
+# Ends of sentences and lines, where long texts are split for the NER model.
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def _sentence_chunks(text, max_chars):
+    """
+    Splits a text into chunks of at most max_chars characters, cutting between sentences when possible.
+    :param text: The input text.
+    :param max_chars: Longest chunk.
+    :return: Generator of chunks, at least one per text.
+    """
+    if len(text) <= max_chars:
+        yield text
+        return
+
+    chunk_start = last_end = 0
+    ends = [match.end() for match in _SENTENCE_END.finditer(text)] + [len(text)]
+    for end in ends:
+        if end - chunk_start > max_chars and last_end > chunk_start:
+            yield text[chunk_start:last_end]
+            chunk_start = last_end
+
+        # A single sentence longer than a chunk is cut at the size limit.
+        while end - chunk_start > max_chars:
+            yield text[chunk_start:chunk_start + max_chars]
+            chunk_start += max_chars
+
+        last_end = end
+
+    if chunk_start < len(text):
+        yield text[chunk_start:]
 
 
 class SkillListMatcher:
     """
     Provides methods to extract and match skills from text.
     """
-    def __init__(self, spacy_model= "en_core_web_sm"):
+    def __init__(self, spacy_model= "en_core_web_sm", max_compiled=8, pool=None):
         """
-        Initializes the matcher and loads the spaCy model.
+        Initializes the matcher, the spaCy model is shared and loaded on first use.
         :param spacy_model: Name of the spaCy model to load.
+        :param max_compiled: Number of compiled skill lists kept for reuse.
+        :param pool: The ModelPool holding the spaCy model, the process-wide pool when None.
         """
-        if not spacy.util.is_package(spacy_model):
-            spacy.cli.download(spacy_model)
+        self.spacy_model = spacy_model
+        self.max_compiled = max_compiled
+        self.pool = pool
+        self.__indexes = OrderedDict()
+
 
-        self.nlp = spacy.load(spacy_model)
+    @property
+    def nlp(self):
+        """
+        The shared spaCy pipeline, without the components the lemmatizer does not need.
+        """
+        return load_spacy(self.spacy_model, exclude=LEMMATIZER_EXCLUDE, pool=self.pool)
 
 
     def __lemmatization(self, skills):
@@ -27,41 +70,46 @@ class SkillListMatcher:
         :return: List of lemmatized skills.
         """
         new_skills = []
-        for i in range(len(skills)):
-            skill = skills[i]
-            doc = self.nlp(skill)
-            tokens = [token.lemma_ for token in doc]
-            new_skills.append(" ".join(tokens).lower().strip())
+        with lease_spacy(self.spacy_model, LEMMATIZER_EXCLUDE, self.pool) as nlp:
+            for doc in nlp.pipe(skills):
+                tokens = [token.lemma_ for token in doc]
+                new_skills.append(" ".join(tokens).lower().strip())
 
         return new_skills
 
 
+    def compile(self, skills):
+        """
+        Compiles a skill list into a SkillIndex, reusing the index of a recently compiled identical list.
+        :param skills: List of reference skill strings.
+        :return: The compiled SkillIndex.
+        """
+        key = tuple(skills)
+        index = self.__indexes.get(key)
+        if index is None:
+            with lease_spacy(self.spacy_model, LEMMATIZER_EXCLUDE, self.pool) as nlp:
+                index = SkillIndex(key, nlp)
+            self.__indexes[key] = index
+            if len(self.__indexes) > self.max_compiled:
+                self.__indexes.popitem(last=False)
+        else:
+            self.__indexes.move_to_end(key)
+
+        return index
+
+
     def extract(self, text, skills, threshold=95):
         """
         Extracts relevant skills from the given text.
         :param text: The input text.
-        :param skills: List of reference skill strings.
+        :param skills: List of reference skill strings, or a SkillIndex from compile.
         :param threshold: Threshold for matching skills.
         :return: List of matched skills found in the text.
         """
-        text = text.lower()
-        tokens = word_tokenize(text)
-
-        candidates = set()
-        for n in range(1, 5):
-            for gram in ngrams(tokens, n):
-                phrase = ' '.join(gram)
-                candidates.add(phrase)
-
-        new_skills = self.__lemmatization(skills)
+        if not isinstance(skills, SkillIndex):
+            skills = self.compile(skills)
 
-        found_skills = set()
-        for phrase in candidates:
-            match, score, _ = process.extractOne(phrase, new_skills)
-            if score >= threshold:
-                found_skills.add(match)
-
-        return list(found_skills)
+        return skills.extract(text, threshold=threshold)
 
 
     def match(self, main_skills, extract_skills):
@@ -74,11 +122,9 @@ class SkillListMatcher:
         main_skills = self.__lemmatization(main_skills)
         extract_skills = self.__lemmatization(extract_skills)
 
-        count = 0
-
-        for skill in extract_skills:
-            if skill in main_skills:
-                count += 1
+        # Each extracted skill found among the main skills counts, repeated ones included.
+        main_set = set(main_skills)
+        count = sum(skill in main_set for skill in extract_skills)
 
         return count / len(main_skills), f"{count}/{len(main_skills)}"
 
@@ -87,13 +133,24 @@ class SkillDynamicMatcher:
     """
     Extracts and matches skills using a trained spaCy NER model.
     """
-    def __init__(self, model_path="amjad-awad/skill-extractor"):
+    def __init__(self, model_path="amjad-awad/skill-extractor", max_chunk_chars=10000, pool=None):
         """
-        Initializes the NER model from the specified path.
+        Initializes the matcher, the NER model is shared and loaded on first use.
         :param model_path: Path to the trained NER model.
+        :param max_chunk_chars: Longest text run through the model at once, longer texts are split between sentences.
+        :param pool: The ModelPool holding the NER model, the process-wide pool when None.
         """
-        model_path = snapshot_download(model_path, repo_type="model")
-        self.ner_model = spacy.load(model_path)
+        self.model_path = model_path
+        self.max_chunk_chars = max_chunk_chars
+        self.pool = pool
+
+
+    @property
+    def ner_model(self):
+        """
+        The shared NER model.
+        """
+        return load_ner_model(self.model_path, pool=self.pool)
 
 
     def extract(self, text):
@@ -102,14 +159,39 @@ class SkillDynamicMatcher:
         :param text: The input text.
         :return: List of extracted skill entities.
         """
-        skills = []
-        doc = self.ner_model(text)
+        return next(self.extract_many([text]))
+
+
+    @timed("skill_ner", documents=True)
+    def extract_many(self, texts, batch_size=32, n_process=1):
+        """
+        Extracts skill entities from a stream of texts with nlp.pipe.
+        Texts longer than max_chunk_chars are split between sentences and their entities merged back.
+        :param texts: List or iterator of input texts.
+        :param batch_size: Number of chunks per spaCy batch.
+        :param n_process: Number of processes used by spaCy.
+        :return: Generator of the lists of extracted skill entities, in input order.
+        """
+        chunks = (
+            (chunk, index) for index, text in enumerate(texts) for chunk in _sentence_chunks(text, self.max_chunk_chars)
+        )
+        with lease_ner_model(self.model_path, self.pool) as ner_model:
+            docs = ner_model.pipe(chunks, as_tuples=True, batch_size=batch_size, n_process=n_process)
 
-        for ent in doc.ents:
-            if "SKILLS" in ent.label_:
-                skills.append(ent.text.lower())
+            current, skills = None, set()
+            for doc, index in docs:
+                TOKENS.inc(len(doc), stage="skill_ner")
+                if index != current:
+                    if current is not None:
+                        yield list(skills)
+                    current, skills = index, set()
 
-        return list(set(skills))
+                for ent in doc.ents:
+                    if "SKILLS" in ent.label_:
+                        skills.add(ent.text.lower())
+
+            if current is not None:
+                yield list(skills)
 
 
     def match(self, main_skills, extract_skills):
@@ -119,10 +201,8 @@ class SkillDynamicMatcher:
         :param extract_skills: List of extracted skill strings.
         :return: Tuple of match ratio and formatted match string.
         """
-        count = 0
-
-        for skill in extract_skills:
-            if skill in main_skills:
-                count += 1
+        # Each extracted skill found among the main skills counts, repeated ones included.
+        main_set = set(main_skills)
+        count = sum(skill in main_set for skill in extract_skills)
 
         return count / len(main_skills), f"{count}/{len(main_skills)}"
\ No newline at end of file
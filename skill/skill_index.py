@@ -0,0 +1,156 @@
+import numpy as np
+from rapidfuzz import process, fuzz
+from nltk import ngrams
+from nltk.tokenize import word_tokenize
+from instrumentation import timed, TOKENS
+
+
+class _End:
+    """
+    Key marking the end of a skill in the token trie. Unlike a string, it cannot collide with a token,
+    such as the empty token of a skill with a double space, and it stays the same object once unpickled.
+    """
+    def __reduce__(self):
+        return "_END"
+
+
+    def __repr__(self):
+        return "_END"
+
+
+_END = _End()
+
+
+class SkillIndex:
+    """
+    A skill list compiled once for repeated extraction. It keeps the lemmatized skills,
+    a token trie answering exact matches and a length index narrowing the fuzzy candidates.
+    """
+    def __init__(self, skills, nlp, max_ngram=4):
+        """
+        Lemmatizes the skills and builds the lookup structures.
+        :param skills: List of reference skill strings.
+        :param nlp: spaCy pipeline used for lemmatization.
+        :param max_ngram: Longest phrase, in tokens, compared against the skills.
+        """
+        self.skills = list(skills)
+        self.max_ngram = max_ngram
+        self.lemmas = [
+            " ".join(token.lemma_ for token in doc).lower().strip() for doc in nlp.pipe(self.skills)
+        ]
+
+        self.__trie = {}
+        for lemma in self.lemmas:
+            node = self.__trie
+            for token in lemma.split(" "):
+                node = node.setdefault(token, {})
+            node.setdefault(_END, lemma)
+
+        self.__lengths = np.array([len(lemma) for lemma in self.lemmas])
+
+
+    def __len__(self):
+        return len(self.lemmas)
+
+
+    @timed("skill_list", documents=True)
+    def extract(self, text, threshold=95, chunk_size=1024):
+        """
+        Extracts the skills found in a text. Returns the same skills as comparing every 1 to max_ngram token phrase
+        with process.extractOne, but exact phrases are answered by the trie and the other phrases are scored
+        in bulk with process.cdist.
+        :param text: The input text.
+        :param threshold: Threshold for matching skills.
+        :param chunk_size: Number of phrases scored per cdist call.
+        :return: List of matched skills found in the text.
+        """
+        if not self.lemmas:
+            return []
+
+        tokens = word_tokenize(text.lower())
+        TOKENS.inc(len(tokens), stage="skill_list")
+
+        found_skills = self.__exact(tokens)
+
+        candidates = set()
+        for n in range(1, self.max_ngram + 1):
+            for gram in ngrams(tokens, n):
+                candidates.add(' '.join(gram))
+        candidates = [phrase for phrase in candidates if phrase not in found_skills]
+
+        found_skills.update(self.__fuzzy(candidates, threshold, chunk_size))
+
+        return list(found_skills)
+
+
+    def __exact(self, tokens):
+        """
+        Walks the token trie from every position of the text.
+        :param tokens: The text tokens.
+        :return: Set of skills appearing verbatim in the text.
+        """
+        found = set()
+        for start in range(len(tokens)):
+            node = self.__trie
+            for token in tokens[start:start + self.max_ngram]:
+                node = node.get(token)
+                if node is None:
+                    break
+                if _END in node:
+                    found.add(node[_END])
+
+        return found
+
+
+    def __fuzzy(self, phrases, threshold, chunk_size):
+        """
+        Scores phrases against the skills with WRatio and keeps the best skill of each phrase above the threshold.
+        Above a threshold of 90, WRatio cannot match strings whose lengths differ by a factor of 1.5 or more,
+        so each phrase is only compared with the skills of a compatible length.
+        :param phrases: List of candidate phrases.
+        :param threshold: Threshold for matching skills.
+        :param chunk_size: Number of phrases scored per cdist call.
+        :return: Set of matched skills.
+        """
+        if not phrases:
+            return set()
+
+        if threshold <= 90:
+            return self.__best_matches(phrases, np.arange(len(self.lemmas)), threshold, chunk_size)
+
+        by_length = {}
+        for phrase in phrases:
+            by_length.setdefault(len(phrase), []).append(phrase)
+
+        found = set()
+        for length, group in by_length.items():
+            longer = np.maximum(self.__lengths, length)
+            shorter = np.minimum(self.__lengths, length)
+            choices = np.flatnonzero((shorter > 0) & (longer < 1.5 * shorter))
+            if len(choices):
+                found.update(self.__best_matches(group, choices, threshold, chunk_size))
+
+        return found
+
+
+    def __best_matches(self, phrases, choices, threshold, chunk_size):
+        """
+        Finds the best skill of each phrase, the first one on ties like process.extractOne.
+        :param phrases: List of candidate phrases.
+        :param choices: Sorted array of the skill positions to compare with.
+        :param threshold: Threshold for matching skills.
+        :param chunk_size: Number of phrases scored per cdist call.
+        :return: Set of matched skills.
+        """
+        lemmas = [self.lemmas[position] for position in choices]
+
+        found = set()
+        for start in range(0, len(phrases), chunk_size):
+            scores = process.cdist(
+                phrases[start:start + chunk_size], lemmas, scorer=fuzz.WRatio, score_cutoff=threshold, workers=-1
+            )
+            best = np.argmax(scores, axis=1)
+            matched = scores[np.arange(len(best)), best] >= threshold
+            found.update(lemmas[position] for position in best[matched])
+
+        return found
@@ -0,0 +1,134 @@
+import gc
+import json
+import random
+from collections import OrderedDict
+import numpy as np
+import pytest
+from similarity.cache import EmbeddingCache
+
+MODEL = "model"
+
+
+def _encode(texts):
+    return np.array([[len(text), sum(map(ord, text)) % 97, 1.0] for text in texts], dtype=np.float32)
+
+
+class _Reference:
+    """
+    The behaviour of the cache before the journal: an LRU of the vectors, every change written at once.
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get_or_encode(self, texts):
+        missing = []
+        for text in texts:
+            if text in self.entries:
+                self.entries.move_to_end(text)
+            elif text not in missing:
+                missing.append(text)
+
+        for text, vector in zip(missing, _encode(missing)):
+            if len(self.entries) >= self.max_entries:
+                self.entries.popitem(last=False)
+            self.entries[text] = vector
+
+        return np.stack([_encode([text])[0] for text in texts])
+
+
+def _batches(seed, count=200, vocabulary=40):
+    generator = random.Random(seed)
+    words = [f"text {position}" * (position % 3 + 1) for position in range(vocabulary)]
+    return [[generator.choice(words) for _ in range(generator.randint(1, 6))] for _ in range(count)]
+
+
+def _keys(cache, reference):
+    return [key for key in (EmbeddingCache.key(MODEL, text) for text in reference.entries) if key in cache]
+
+
+def test_lru_matches_the_reference(tmp_path):
+    cache, reference = EmbeddingCache(tmp_path, max_entries=16), _Reference(16)
+    encoded = []
+
+    def encode(texts):
+        encoded.append(list(texts))
+        return _encode(texts)
+
+    for texts in _batches(0):
+        assert np.array_equal(cache.get_or_encode(MODEL, texts, encode), reference.get_or_encode(texts))
+
+    assert len(cache) == len(reference.entries) == 16
+    assert len(_keys(cache, reference)) == 16
+    # Only the misses are encoded, once per distinct text of a batch.
+    assert all(len(texts) == len(set(texts)) for texts in encoded)
+    assert cache.stats()["evictions"] > 0
+
+
+def test_close_and_reload_keep_the_lru_order(tmp_path):
+    cache, reference = EmbeddingCache(tmp_path, max_entries=16), _Reference(16)
+    for texts in _batches(1, count=100):
+        cache.get_or_encode(MODEL, texts, _encode)
+        reference.get_or_encode(texts)
+    cache.close()
+
+    cache = EmbeddingCache(tmp_path, max_entries=16)
+    for texts in _batches(2, count=100):
+        assert np.array_equal(cache.get_or_encode(MODEL, texts, _encode), reference.get_or_encode(texts))
+    assert len(_keys(cache, reference)) == len(reference.entries)
+
+
+def test_journal_replay_after_a_crash(tmp_path):
+    cache, reference = EmbeddingCache(tmp_path, max_entries=16), _Reference(16)
+    for texts in _batches(3, count=20):
+        cache.get_or_encode(MODEL, texts, _encode)
+        reference.get_or_encode(texts)
+    cache.flush()
+
+    # Entries stored after the flush, evicting flushed ones, are only in the journal.
+    for texts in _batches(4, count=15):
+        cache.get_or_encode(MODEL, texts, _encode)
+        reference.get_or_encode(texts)
+    assert (tmp_path / "journal.jsonl").stat().st_size > 0
+
+    # Dropped without close, as by a crash, the index is not rewritten.
+    del cache
+    gc.collect()
+
+    cache = EmbeddingCache(tmp_path, max_entries=16)
+    assert len(cache) == len(reference.entries)
+    for text, vector in reference.entries.items():
+        assert np.array_equal(cache.get(MODEL, text), vector)
+    assert (tmp_path / "journal.jsonl").stat().st_size == 0
+
+
+def test_a_torn_journal_line_is_ignored(tmp_path):
+    cache = EmbeddingCache(tmp_path, max_entries=8)
+    cache.get_or_encode(MODEL, ["a", "b"], _encode)
+    del cache
+    gc.collect()
+
+    with open(tmp_path / "journal.jsonl", "a") as journal:
+        journal.write(json.dumps([EmbeddingCache.key(MODEL, "c"), 2])[:20])
+
+    cache = EmbeddingCache(tmp_path, max_entries=8)
+    assert len(cache) == 2
+    assert cache.get(MODEL, "c") is None
+    assert np.array_equal(cache.get(MODEL, "b"), _encode(["b"])[0])
+
+
+def test_a_second_embedding_size_is_rejected(tmp_path):
+    cache = EmbeddingCache(tmp_path)
+    cache.put(MODEL, "a", np.ones(3))
+    with pytest.raises(ValueError, match="other-model"):
+        cache.put("other-model", "a", np.ones(5))
+
+
+def test_a_directory_is_opened_once(tmp_path):
+    cache = EmbeddingCache(tmp_path)
+    with pytest.raises(RuntimeError):
+        EmbeddingCache(tmp_path)
+
+    cache.close()
+    with EmbeddingCache(tmp_path) as reopened:
+        assert len(reopened) == 0
@@ -0,0 +1,156 @@
+import random
+import pytest
+from skill.inverted_index import InvertedSkillIndex, normalize_skill
+
+SKILLS = ["python", "java", "sql", "spark", "machine learning", "research and development", "junior", "aws", "go"]
+
+
+class _Reference:
+    """
+    The scan the index replaces: every resume's skill set checked one by one, in insertion order.
+    """
+    def __init__(self):
+        self.resumes = {}
+
+    def add(self, ids, skill_lists):
+        for resume_id, skills in zip(ids, skill_lists):
+            self.resumes.pop(resume_id, None)
+            self.resumes[resume_id] = {normalize_skill(skill) for skill in skills}
+
+    def delete(self, ids):
+        for resume_id in ids:
+            self.resumes.pop(resume_id, None)
+
+    def query(self, predicate):
+        return [resume_id for resume_id, skills in self.resumes.items() if predicate(skills)]
+
+    def rank(self, job_skills, top_k=None, predicate=None):
+        job_skills = {normalize_skill(skill) for skill in job_skills}
+        ranked = []
+        for order, (resume_id, skills) in enumerate(self.resumes.items()):
+            count = len(job_skills & skills)
+            if count and (predicate is None or predicate(skills)):
+                ranked.append((-count, order, resume_id, count))
+        ranked.sort()
+        total = len(job_skills)
+        return [(resume_id, count / total, f"{count}/{total}") for _, _, resume_id, count in ranked][:top_k]
+
+
+def _random_query(generator, depth=0):
+    """
+    Builds a random query together with the same query as a Python predicate, whose not, and, or
+    precedence is the one of the query language.
+    :return: Tuple of the query text and the predicate source.
+    """
+    choice = generator.random()
+    if depth > 2 or choice < 0.35:
+        skill = generator.choice(SKILLS)
+        text = f'"{skill.upper()}"' if " and " in skill or generator.random() < 0.3 else skill
+        return text, f"({skill!r} in skills)"
+
+    if choice < 0.5:
+        text, source = _random_query(generator, depth + 1)
+        return f"{generator.choice(['NOT', 'not'])} {text}", f"not {source}"
+
+    if choice < 0.6:
+        text, source = _random_query(generator, depth + 1)
+        return f"({text})", f"({source})"
+
+    operator = generator.choice(["AND", "OR", "and", "Or"])
+    parts = [_random_query(generator, depth + 1) for _ in range(generator.randint(2, 3))]
+    return f" {operator} ".join(text for text, _ in parts), f" {operator.lower()} ".join(source for _, source in parts)
+
+
+def _predicate(source):
+    return eval(f"lambda skills: {source}")
+
+
+def _populate(index, reference, seed=0, count=60):
+    generator = random.Random(seed)
+    for start in range(0, count, 7):
+        ids = [f"r{generator.randrange(count)}" for _ in range(7)]
+        skill_lists = [generator.sample(SKILLS, generator.randint(0, 4)) for _ in ids]
+        index.add(ids, skill_lists)
+        reference.add(ids, skill_lists)
+
+    deleted = [f"r{generator.randrange(count)}" for _ in range(5)]
+    index.delete(deleted)
+    reference.delete(deleted)
+
+
+def _check(index, reference, seed=0):
+    generator = random.Random(seed)
+    assert len(index) == len(reference.resumes)
+    for _ in range(200):
+        text, source = _random_query(generator)
+        assert index.query(text) == reference.query(_predicate(source)), text
+
+    for _ in range(20):
+        job_skills = generator.sample(SKILLS, generator.randint(1, 5))
+        assert index.rank(job_skills, top_k=None) == reference.rank(job_skills)
+        assert index.rank(job_skills, top_k=3) == reference.rank(job_skills, top_k=3)
+        text, source = _random_query(generator)
+        expected = reference.rank(job_skills, predicate=_predicate(source))
+        assert index.rank(job_skills, top_k=None, query=text) == expected
+
+
+def test_queries_and_ranking_match_the_scan():
+    index, reference = InvertedSkillIndex(), _Reference()
+    _populate(index, reference)
+    _check(index, reference)
+
+
+def test_precedence_and_phrases():
+    index = InvertedSkillIndex()
+    index.add(["a", "b", "c", "d"], [
+        ["python", "spark"], ["java", "junior"], ["Machine  Learning"], ["research and development", "python"],
+    ])
+
+    assert index.query("python OR java AND junior") == ["a", "b", "d"]
+    assert index.query("(python OR java) AND NOT junior") == ["a", "d"]
+    assert index.query("NOT NOT python") == ["a", "d"]
+    assert index.query("machine learning") == ["c"]
+    assert index.query('"Research and Development" AND python') == ["d"]
+    assert index.query("research and development") == []
+
+
+@pytest.mark.parametrize("query", ["", "python AND", "(python", "python)", "AND python", "NOT"])
+def test_malformed_queries(query):
+    with pytest.raises(ValueError):
+        InvertedSkillIndex().query(query)
+
+
+def test_repeated_ids_keep_the_last_skills():
+    index = InvertedSkillIndex()
+    index.add(["a", "b", "a"], [["python"], ["java"], ["go"]])
+
+    assert len(index) == 2
+    assert index.query("python") == []
+    assert index.query("go OR java") == ["b", "a"]
+    assert index.rank(["go", "java"]) == [("b", 0.5, "1/2"), ("a", 0.5, "1/2")]
+
+
+def test_flush_reload_and_compact(tmp_path):
+    index, reference = InvertedSkillIndex(tmp_path), _Reference()
+    _populate(index, reference, seed=1)
+    index.flush()
+    _check(InvertedSkillIndex(tmp_path), reference, seed=1)
+
+    index.compact()
+    _check(index, reference, seed=2)
+    _check(InvertedSkillIndex(tmp_path), reference, seed=2)
+
+    # Adds after the compact keep the posting lists sorted and survive a flush.
+    index.add(["new", "r1"], [["python", "go"], ["aws"]])
+    reference.add(["new", "r1"], [["python", "go"], ["aws"]])
+    index.flush()
+    _check(InvertedSkillIndex(tmp_path), reference, seed=3)
+
+
+def test_adds_are_written_by_flush(tmp_path):
+    index = InvertedSkillIndex(tmp_path)
+    index.add(["a"], [["python"]])
+    assert len(InvertedSkillIndex(tmp_path)) == 0
+
+    index.flush()
+    assert InvertedSkillIndex(tmp_path).query("python") == ["a"]
@@ -0,0 +1,102 @@
+import re
+import pickle
+import random
+from types import SimpleNamespace
+import pytest
+from nltk import ngrams
+from rapidfuzz import process
+import skill.skill_index as skill_index
+from skill.skill_index import SkillIndex
+
+SKILLS = [
+    "python", "pyton", "java", "javascript", "machine learning", "machine  learning", "deep learning",
+    "data analysis", "data analytics", "sql", "nosql", "c", "c++", "go", "research & development",
+    "team collaboration", "problem solving", "natural language processing", "aws", "amazon web services",
+]
+
+WORDS = [
+    "python", "pythn", "java", "javascrpt", "machine", "learning", "learnin", "deep", "data", "analysis",
+    "analytic", "sql", "no", "c", "c++", "go", "research", "&", "development", "team", "collaboration",
+    "problem", "solving", "natural", "language", "processing", "aws", "amazon", "web", "services", "the",
+    "and", "with", ",", ".", "experience", "years", "",
+]
+
+
+class _Lemmatizer:
+    """
+    Stands for the spaCy pipeline: every space separated word is its own lemma.
+    """
+    def pipe(self, texts):
+        for text in texts:
+            yield [SimpleNamespace(lemma_=word) for word in text.split(" ")]
+
+
+def _tokenize(text):
+    return re.findall(r"[\w+&]+|[^\w\s]", text)
+
+
+def _baseline(text, lemmas, threshold, max_ngram=4):
+    """
+    The extraction SkillIndex replaces: every phrase of the text compared with process.extractOne.
+    """
+    tokens = skill_index.word_tokenize(text.lower())
+    candidates = {" ".join(gram) for n in range(1, max_ngram + 1) for gram in ngrams(tokens, n)}
+
+    found = set()
+    for phrase in candidates:
+        match, score, _ = process.extractOne(phrase, lemmas)
+        if score >= threshold:
+            found.add(match)
+    return found
+
+
+@pytest.fixture(autouse=True)
+def tokenizer(monkeypatch):
+    # Both extractions share the tokenizer, a regex one keeps the test free of NLTK data.
+    monkeypatch.setattr(skill_index, "word_tokenize", _tokenize)
+
+
+@pytest.fixture
+def index():
+    return SkillIndex(SKILLS, _Lemmatizer())
+
+
+def _texts(count, seed=0):
+    generator = random.Random(seed)
+    return [" ".join(generator.choice(WORDS) for _ in range(generator.randint(0, 40))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("threshold", [80, 90, 91, 95, 100])
+def test_extract_matches_extract_one(index, threshold):
+    for text in _texts(50):
+        assert set(index.extract(text, threshold=threshold)) == _baseline(text, index.lemmas, threshold), text
+
+
+def test_extract_matches_extract_one_across_chunks(index):
+    text = " ".join(_texts(20, seed=1))
+    assert set(index.extract(text, chunk_size=7)) == _baseline(text, index.lemmas, 95)
+
+
+def test_ties_keep_the_first_skill():
+    index = SkillIndex(["data analysis", "data analysis", "analysis data"], _Lemmatizer())
+    for text in ["data analysis", "analysis data", "data analysys", "data"]:
+        assert set(index.extract(text, threshold=80)) == _baseline(text, index.lemmas, 80)
+
+
+def test_exact_phrases_come_from_the_trie(index):
+    assert {"machine learning", "sql", "c++"} <= set(index.extract("machine learning with sql and c++", threshold=100))
+
+
+def test_empty_token_of_a_double_space_is_not_a_skill_end(index):
+    # "machine  learning" has an empty token, which a string end marker collided with.
+    assert "machine" not in index.extract("machine", threshold=100)
+
+
+def test_empty_skill_list():
+    assert SkillIndex([], _Lemmatizer()).extract("python") == []
+
+
+def test_pickled_index_still_matches(index):
+    restored = pickle.loads(pickle.dumps(index))
+    text = "python and machine learning"
+    assert set(restored.extract(text, threshold=100)) == set(index.extract(text, threshold=100))